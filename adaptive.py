@@ -0,0 +1,122 @@
+import os
+import csv
+import json
+import random
+import argparse
+
+from results_store import METRICS as SAR_METRICS, read_sar_csv
+from steady_state import in_window, load_window
+
+
+def cpu_mean(results_dir, suffix):
+    """Mean busy CPU % (100 - idle of the 'all' rows) of a run's sar CSV, over its steady window if recorded"""
+    sar_file = os.path.join(results_dir, f'sar_output_{suffix}.csv')
+    steady = load_window(results_dir, suffix)
+    if steady:
+        times, cpus, values = read_sar_csv(sar_file, 'epoch' if steady['time_base'] == 'epoch' else 'Timestamp')
+        selected = (cpus == -1) & in_window(times, steady)
+        if selected.any():
+            return float(100.0 - values[selected, SAR_METRICS.index('idle')].mean())
+    busy = []
+    with open(sar_file, newline='') as f:
+        for row in csv.DictReader(f):
+            if row['CPU'] == 'all':
+                busy.append(100.0 - float(row['idle']))
+    return sum(busy) / len(busy) if busy else None
+
+
+def _load_json(results_dir, suffix):
+    path = os.path.join(results_dir, f'load_{suffix}.json')
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def achieved_qps(results_dir, suffix):
+    """Achieved QPS of a run from its load JSON, over its steady window if recorded"""
+    data = _load_json(results_dir, suffix)
+    if not data:
+        return None
+    steady = data.get('steady_state')
+    if steady and 'qps' in steady['summary']:
+        return steady['summary']['qps']
+    return data['achieved_qps']
+
+
+def p99_ms(results_dir, suffix):
+    """p99 latency of a run in milliseconds from its load JSON (whole run: the histogram is not time-resolved)"""
+    data = _load_json(results_dir, suffix)
+    return data['latency']['p99'] * 1000 if data else None
+
+
+METRICS = {'cpu': cpu_mean, 'qps': achieved_qps, 'p99': p99_ms}
+
+
+def bootstrap_ci(values, confidence=0.95, resamples=2000, seed=0):
+    """
+    Percentile bootstrap confidence interval of the mean
+
+    Returns (mean, low, high). A fixed seed keeps the stopping decision
+    reproducible when a campaign is resumed.
+    """
+    mean = sum(values) / len(values)
+    if len(values) < 2:
+        return mean, mean, mean
+    rng = random.Random(seed)
+    n = len(values)
+    means = sorted(sum(rng.choices(values, k=n)) / n for _ in range(resamples))
+    tail = (1.0 - confidence) / 2
+    low = means[int(tail * (resamples - 1))]
+    high = means[int((1.0 - tail) * (resamples - 1))]
+    return mean, low, high
+
+
+def interval_summary(values, tolerance, confidence=0.95):
+    """
+    Bootstrap interval of the values and whether it is narrow enough
+
+    tolerance is the maximum half-width relative to the mean (0.02 = +/-2%).
+    """
+    mean, low, high = bootstrap_ci(values, confidence)
+    half_width = (high - low) / 2
+    return {
+        'runs': len(values),
+        'values': [round(value, 4) for value in values],
+        'mean': round(mean, 4),
+        'ci_low': round(low, 4),
+        'ci_high': round(high, 4),
+        'relative_half_width': round(half_width / abs(mean), 4) if mean else None,
+        'converged': len(values) >= 2 and half_width <= tolerance * abs(mean),
+    }
+
+
+def should_stop(values, tolerance, min_runs=3, max_runs=10, confidence=0.95):
+    """True once the interval is narrow enough (after min_runs) or max_runs is reached"""
+    if len(values) >= max_runs:
+        return True
+    if len(values) < min_runs:
+        return False
+    return interval_summary(values, tolerance, confidence)['converged']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bootstrap confidence interval of a metric across repeated runs')
+    parser.add_argument('results_dir', help='Directory with the runs')
+    parser.add_argument('suffixes', nargs='+', help='Run file suffixes, e.g. dnsfw_rpz_30_r1 dnsfw_rpz_30_r2')
+    parser.add_argument('--metric', choices=sorted(METRICS), default='cpu', help='Metric (default: cpu)')
+    parser.add_argument('--tolerance', type=float, default=0.02,
+                        help='Maximum CI half-width relative to the mean (default: 0.02)')
+    parser.add_argument('--confidence', type=float, default=0.95, help='Confidence level (default: 0.95)')
+    args = parser.parse_args()
+
+    values = [value for value in (METRICS[args.metric](args.results_dir, suffix) for suffix in args.suffixes)
+              if value is not None]
+    if not values:
+        print("No values found")
+        return
+    print(json.dumps(interval_summary(values, args.tolerance, args.confidence), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+import os
+import re
+import sys
+import json
+import time
+import shlex
+import hashlib
+import posixpath
+import argparse
+from collections import namedtuple
+from datetime import datetime
+
+from adaptive import METRICS, interval_summary, should_stop
+from dns_test import RESTART_COMMAND, execute_ssh_commands
+from dnsfw_emulator import Blocklist
+from ssh_session import LocalClient, SSHSession
+from workload import check_spec
+
+TEST_TYPES = ['dnsfw_no', 'dnsfw_rpz', 'dnsfw_xdp']
+PERCENTS = list(range(10, 100, 10))
+STATE_FILE = 'campaign.jsonl'
+RESOLVER_CONFIG = ['/etc/named.conf']
+# named.conf statements naming the files the resolver loads
+INCLUDE = re.compile(r'^\s*include\s+"([^"]+)"', re.MULTILINE)
+ZONE_FILE = re.compile(r'^\s*file\s+"([^"]+)"', re.MULTILINE)
+DIRECTORY = re.compile(r'^\s*directory\s+"([^"]+)"', re.MULTILINE)
+
+
+class Cell(namedtuple('Cell', ['test_type', 'percent', 'repetition', 'rate'])):
+    """One run of the matrix: test_type x percent x repetition x rate (QPS, 0 = unlimited)"""
+
+    @property
+    def suffix(self):
+        """File suffix of the run results, e.g. dnsfw_rpz_30_q20000_r2"""
+        rate = f'_q{self.rate}' if self.rate else ''
+        return f'{self.test_type}_{self.percent}{rate}_r{self.repetition}'
+
+    @property
+    def domain_file(self):
+        return f'output/domain_{self.percent}.txt'
+
+
+def build_matrix(test_types, percents, repetitions=1, rates=(0,)):
+    """All cells, grouped by test_type and rate so named restarts into one mode at a time"""
+    return [Cell(test_type, percent, repetition, rate)
+            for test_type in test_types
+            for rate in rates
+            for percent in percents
+            for repetition in range(1, repetitions + 1)]
+
+
+_file_digests = {}
+
+
+def file_digest(path):
+    """SHA-256 of a file, computed once per (path, size, mtime)"""
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    if key not in _file_digests:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        _file_digests[key] = digest.hexdigest()
+    return _file_digests[key]
+
+
+def _remote_output(ssh, command, paths, sudo):
+    result = ssh.run(command + ' ' + ' '.join(shlex.quote(path) for path in paths), sudo=sudo)
+    if result.status != 0:
+        print(f"Warning: could not read resolver files ({result.stderr.strip()})")
+    return result.stdout
+
+
+def resolver_digest(ssh, paths=RESOLVER_CONFIG, sudo=True):
+    """
+    SHA-256 of the resolver configuration on the DNS server
+
+    Covers the config files, the files they include and the zone files they
+    load (`file` statements, relative to the `directory` option), so editing
+    the RPZ zone changes the digest like editing named.conf does. Zone files
+    are hashed on the server with sha256sum instead of being copied.
+
+    Args:
+    sudo (bool): Read the files as root; False for a local target
+    """
+    configs = list(paths)
+    text = ''
+    while configs:
+        chunk = _remote_output(ssh, 'cat', configs, sudo)
+        text += chunk
+        configs = [path for path in INCLUDE.findall(chunk) if path not in paths]
+        paths = list(paths) + configs
+    directory = DIRECTORY.search(text)
+    base = directory.group(1) if directory else '/var/named'
+    zones = sorted({posixpath.join(base, path) for path in ZONE_FILE.findall(text)})
+    digest = hashlib.sha256(text.encode())
+    if zones:
+        digest.update(_remote_output(ssh, 'sha256sum', zones, sudo).encode())
+    return digest.hexdigest()
+
+
+def input_hash(cell, domain_digest, config_digest, params):
+    """Content hash of everything that determines a cell's results, repetition excluded"""
+    inputs = {
+        'test_type': cell.test_type,
+        'percent': cell.percent,
+        'rate': cell.rate,
+        'domain_file': domain_digest,
+        'resolver_config': config_digest,
+        'load': params,
+    }
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+
+class CampaignState:
+    """
+    Append-only log of cell attempts in results_dir/campaign.jsonl
+
+    Each line records one state change; the last line of a cell wins, so an
+    interrupted campaign leaves its running cell as 'running' and it is simply
+    run again on resume.
+    """
+
+    def __init__(self, results_dir):
+        self.path = os.path.join(results_dir, STATE_FILE)
+        self.cells = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Line cut short by an interruption
+                        continue
+                    self.cells[record['cell']] = record
+
+    def record(self, cell, inputs, status, **extra):
+        record = {'cell': cell.suffix, 'inputs': inputs, 'status': status,
+                  'time': datetime.now().isoformat(timespec='seconds'), **extra}
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self.cells[cell.suffix] = record
+        return record
+
+    def is_done(self, cell, inputs):
+        record = self.cells.get(cell.suffix)
+        return record is not None and record['status'] == 'done' and record['inputs'] == inputs
+
+
+def results_exist(results_dir, cell):
+    return os.path.exists(os.path.join(results_dir, f'sar_output_{cell.suffix}.csv'))
+
+
+def run_one(cell, label, run_cell, state, results_dir, cell_inputs, retries=1, dry_run=False):
+    """
+    Run a cell unless it is already done with the same inputs
+
+    Returns 'skipped', 'ran', 'failed' or, with dry_run, 'pending'.
+    """
+    inputs = cell_inputs(cell)
+    if state.is_done(cell, inputs) and results_exist(results_dir, cell):
+        print(f"[{label}] {cell.suffix}: done, skipping")
+        return 'skipped'
+    if dry_run:
+        previous = state.cells.get(cell.suffix)
+        reason = 'inputs changed' if previous and previous['inputs'] != inputs else (
+            previous['status'] if previous else 'new')
+        print(f"[{label}] {cell.suffix}: would run ({reason})")
+        return 'pending'
+    for attempt in range(1, retries + 2):
+        print(f"\n[{label}] {cell.suffix}: attempt {attempt}")
+        state.record(cell, inputs, 'running', attempt=attempt)
+        start = time.monotonic()
+        ok = run_cell(cell)
+        state.record(cell, inputs, 'done' if ok else 'failed', attempt=attempt,
+                     seconds=round(time.monotonic() - start, 1))
+        if ok:
+            return 'ran'
+    return 'failed'
+
+
+def run_campaign(cells, run_cell, state, results_dir, cell_inputs, retries=1, dry_run=False):
+    """
+    Run every cell that is not already done with the same inputs
+
+    Args:
+    run_cell (callable): Runs one cell and returns True on success
+    cell_inputs (callable): Returns the input hash of a cell
+    retries (int): Extra attempts for a failing cell
+
+    Returns (ran, skipped, failed cells).
+    """
+    ran = skipped = 0
+    failed = []
+    for index, cell in enumerate(cells, 1):
+        outcome = run_one(cell, f'{index}/{len(cells)}', run_cell, state, results_dir, cell_inputs,
+                          retries, dry_run)
+        if outcome == 'ran':
+            ran += 1
+        elif outcome == 'skipped':
+            skipped += 1
+        elif outcome == 'failed':
+            failed.append(cell)
+    return ran, skipped, failed
+
+
+def run_adaptive(cells, run_cell, state, results_dir, cell_inputs, metric, tolerance,
+                 min_runs=3, max_runs=10, retries=1, dry_run=False):
+    """
+    Repeat each test_type/rate/percent until the metric's bootstrap CI is narrow enough
+
+    Repetitions already on disk count towards the interval, so a resumed
+    campaign makes the same stopping decisions. The per-cell intervals are
+    written to results_dir/adaptive_{metric}.json.
+
+    Returns (ran, skipped, failed cells).
+    """
+    groups = list(dict.fromkeys(cell._replace(repetition=0) for cell in cells))
+    ran = skipped = 0
+    failed = []
+    summaries = {}
+    for index, group in enumerate(groups, 1):
+        values = []
+        name = group.suffix.rsplit('_r', 1)[0]
+        for repetition in range(1, max_runs + 1):
+            cell = group._replace(repetition=repetition)
+            outcome = run_one(cell, f'{index}/{len(groups)} run {repetition}', run_cell, state, results_dir,
+                              cell_inputs, retries, dry_run)
+            if outcome == 'pending':
+                break
+            if outcome == 'failed':
+                failed.append(cell)
+                continue
+            ran += outcome == 'ran'
+            skipped += outcome == 'skipped'
+            value = METRICS[metric](results_dir, cell.suffix)
+            if value is not None:
+                values.append(value)
+            if should_stop(values, tolerance, min_runs, max_runs):
+                break
+        if values:
+            summaries[name] = interval_summary(values, tolerance)
+            summary = summaries[name]
+            print(f"{name}: {metric} {summary['mean']} [{summary['ci_low']}, {summary['ci_high']}] "
+                  f"after {summary['runs']} runs{'' if summary['converged'] else ' (not converged)'}")
+    if summaries and not dry_run:
+        with open(os.path.join(results_dir, f'adaptive_{metric}.json'), 'w') as f:
+            json.dump(summaries, f, indent=2)
+    return ran, skipped, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Resumable DNS test campaign over test_type x percent x repetition x rate')
+    parser.add_argument('--test-types', nargs='+', choices=TEST_TYPES, default=TEST_TYPES,
+                        help='Test types to run (default: all)')
+    parser.add_argument('--percents', nargs='+', type=int, default=PERCENTS,
+                        help='Malicious percentages (default: 10..90)')
+    parser.add_argument('--repetitions', type=int, default=1, help='Runs per cell (default: 1)')
+    parser.add_argument('--adaptive', choices=sorted(METRICS), default=None,
+                        help='Repeat each cell until the bootstrap CI of this metric is narrow enough')
+    parser.add_argument('--tolerance', type=float, default=0.02,
+                        help='Adaptive: maximum CI half-width relative to the mean (default: 0.02)')
+    parser.add_argument('--min-repetitions', type=int, default=3, help='Adaptive: minimum runs per cell (default: 3)')
+    parser.add_argument('--max-repetitions', type=int, default=10, help='Adaptive: maximum runs per cell (default: 10)')
+    parser.add_argument('--rates', nargs='+', type=int, default=[0],
+                        help='Load rates in QPS, 0 = unlimited (default: 0)')
+    parser.add_argument('--results-dir', default=None,
+                        help='Campaign directory; reuse it to resume (default: results_YYYYMMDD)')
+    parser.add_argument('--retries', type=int, default=1, help='Extra attempts for a failing cell (default: 1)')
+    parser.add_argument('--resolver-config', nargs='+', default=RESOLVER_CONFIG,
+                        help='Resolver config files on the server included in the input hash')
+    parser.add_argument('--engine', choices=['native', 'dnspyre'], default='native',
+                        help='Load generator to use (default: native)')
+    parser.add_argument('--workers', type=int, default=1, help='Native load worker processes (default: 1)')
+    parser.add_argument('--proc-interval', type=float, default=None,
+                        help='Also sample remote /proc at this interval in seconds')
+    parser.add_argument('--iface', default=None, help='Server network interface to sample NIC counters from')
+    parser.add_argument('--xdp-map', action='append', default=[], help='XDP stats map (repeatable)')
+    parser.add_argument('--max-error-rate', type=float, default=None,
+                        help='Abort dnspyre cells whose failure rate exceeds this (e.g. 0.2)')
+    parser.add_argument('--server', default='192.168.0.72', help='DNS server under test, reached over SSH too')
+    parser.add_argument('--port', type=int, default=53, help='DNS server port (default: 53)')
+    parser.add_argument('--local', action='store_true',
+                        help='Collect server samples on this machine and skip the named restart (dnsfw_emulator.py)')
+    parser.add_argument('--blocklist', default=None,
+                        help='Blocked names (e.g. blackbook.txt.2) to break native replies down by source list')
+    parser.add_argument('--workload', default=None,
+                        help='Workload spec (JSON, see workload.py) built from each cell\'s domain file')
+    parser.add_argument('--dry-run', action='store_true', help='Only show which cells would run')
+    args = parser.parse_args()
+
+    # Connection parameters
+    hostname = args.server # DNS Server
+    username = "user"
+    password = "pass"
+
+    error = check_spec(args.workload, args.engine) if args.workload else None
+    if error:
+        print(f"Error: workload {args.workload}: {error}")
+        sys.exit(1)
+
+    results_dir = args.results_dir or f'results_{datetime.now().strftime("%Y%m%d")}'
+    os.makedirs(results_dir, exist_ok=True)
+    cells = build_matrix(args.test_types, args.percents, args.repetitions, args.rates)
+    # Every option that changes what a cell measures; file options by content
+    params = {'engine': args.engine, 'workers': args.workers, 'duration': 60, 'concurrency': 60000,
+              'target': {'server': args.server, 'port': args.port, 'local': args.local},
+              'proc_interval': args.proc_interval, 'iface': args.iface, 'xdp_map': args.xdp_map,
+              'max_error_rate': args.max_error_rate,
+              'blocklist': file_digest(args.blocklist) if args.blocklist else None,
+              'workload': file_digest(args.workload) if args.workload else None}
+
+    blocklist = Blocklist.from_file(args.blocklist) if args.blocklist else None
+    with SSHSession(hostname, username, password,
+                    client_factory=LocalClient if args.local else None) as session:
+        config_digest = resolver_digest(session, args.resolver_config, sudo=not args.local)
+
+        def cell_inputs(cell):
+            return input_hash(cell, file_digest(cell.domain_file), config_digest, params)
+
+        def run_cell(cell):
+            return execute_ssh_commands(session, cell.test_type, cell.percent, args.engine, args.workers,
+                                        args.proc_interval, args.iface, args.xdp_map,
+                                        results_dir=results_dir, file_suffix=cell.suffix, qps=cell.rate,
+                                        max_error_rate=args.max_error_rate, port=args.port,
+                                        restart_command=None if args.local else RESTART_COMMAND,
+                                        blocklist=blocklist, workload=args.workload)
+
+        state = CampaignState(results_dir)
+        if args.adaptive:
+            print(f"Adaptive campaign on {args.adaptive}: up to {args.max_repetitions} runs per cell in {results_dir}")
+        else:
+            print(f"Campaign of {len(cells)} cells in {results_dir}")
+        if args.adaptive:
+            ran, skipped, failed = run_adaptive(cells, run_cell, state, results_dir, cell_inputs, args.adaptive,
+                                                args.tolerance, args.min_repetitions, args.max_repetitions,
+                                                args.retries, args.dry_run)
+        else:
+            ran, skipped, failed = run_campaign(cells, run_cell, state, results_dir, cell_inputs,
+                                                args.retries, args.dry_run)
+
+    print(f"\n{'='*60}")
+    print(f"Cells run: {ran}  skipped (already done): {skipped}  failed: {len(failed)}")
+    if failed:
+        print(f"Failed cells: {[cell.suffix for cell in failed]}")
+        print(f"Run the same command with --results-dir {results_dir} to retry them")
+    print('='*60)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
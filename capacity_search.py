@@ -0,0 +1,226 @@
+import os
+import csv
+import math
+import time
+import argparse
+from datetime import datetime
+
+from dns_load import run_native_load, run_sharded_load
+from dnsfw_emulator import Blocklist
+from response_class import SOURCES, TIMEOUT, label_index_path
+
+
+def step_passes(stats, planned, max_loss, max_p99, drops_blocked=False, expected_drop=0.0):
+    """
+    Check one fixed-rate step against the loss and p99 latency thresholds
+
+    Loss is the share of the sent queries that timed out, so it judges the
+    server only. Queries the client could not send on schedule are its own
+    limit: their share of the planned queries is returned as the shortfall,
+    and a step whose shortfall exceeds max_loss fails as client-bound. The
+    p99 comes from the coordinated-omission-corrected histogram.
+
+    When the server drops blocked names on purpose (dnsfw_xdp, drops_blocked),
+    their timeouts are not loss: labelled runs leave the blocked source out
+    exactly, otherwise the expected_drop share (0-1) of the queries is allowed
+    and loss is measured on the remainder, like RequestLogMonitor does.
+
+    Returns (passed, loss, p99, shortfall).
+    """
+    timeouts = stats.timeouts
+    sent = stats.sent
+    shortfall = stats.unsent / planned if planned > 0 else 1.0
+    blocked = SOURCES.index('blocked')
+    if drops_blocked and stats.responses.sources == SOURCES:
+        timeouts -= stats.responses.counts[blocked][TIMEOUT]
+        sent -= sum(stats.responses.counts[blocked])
+        expected_drop = 0.0
+    if sent <= 0:
+        loss = 1.0
+    elif drops_blocked and 0 < expected_drop < 1:
+        loss = max(timeouts / sent - expected_drop, 0.0) / (1.0 - expected_drop)
+    else:
+        loss = timeouts / sent
+    histogram = stats.corrected_latency or stats.latency
+    p99 = histogram.percentile(99)
+    return loss <= max_loss and p99 <= max_p99 and shortfall <= max_loss, loss, p99, shortfall
+
+
+def find_capacity(run_step, low, high, max_loss=0.01, max_p99=0.1, tolerance=0.05):
+    """
+    Binary search for the highest QPS whose step stays under both thresholds
+
+    Args:
+    run_step (callable): run_step(qps) -> (passed, loss, p99, shortfall) for one fixed-rate step
+    low (int): Starting rate, expected to pass
+    high (int): Upper bound on the search
+    tolerance (float): Stop when the band is narrower than this fraction of its top
+
+    Returns a dict with the capacity (highest passing rate), the confidence band
+    [highest pass, lowest fail], the list of steps run and client_bound: True
+    when a step failed because the load generator fell short of its rate, so
+    the capacity is the generator's limit (a lower bound for the server), not
+    a server figure.
+    """
+    steps = []
+
+    def probe(qps):
+        passed, loss, p99, shortfall = run_step(qps)
+        client_bound = shortfall > max_loss
+        steps.append({'qps': qps, 'passed': passed, 'loss': loss, 'p99': p99, 'shortfall': shortfall,
+                      'client_bound': client_bound})
+        outcome = 'pass' if passed else 'CLIENT-BOUND' if client_bound else 'FAIL'
+        print(f"  {qps:>8} QPS: {outcome}  loss {loss * 100:.2f}%  p99 {p99 * 1000:.3f}ms  "
+              f"unsent {shortfall * 100:.2f}%")
+        return passed
+
+    passing = 0
+    failing = None
+    qps = low
+    # Grow geometrically until a step fails or the upper bound passes
+    while qps <= high:
+        if not probe(qps):
+            failing = qps
+            break
+        passing = qps
+        if qps == high:
+            break
+        qps = min(qps * 2, high)
+
+    if failing is not None:
+        while failing - passing > max(1, tolerance * failing):
+            middle = (passing + failing) // 2
+            if probe(middle):
+                passing = middle
+            else:
+                failing = middle
+
+    return {
+        'capacity': passing,
+        'band_low': passing,
+        'band_high': failing if failing is not None else high,
+        'steps': steps,
+        'client_bound': any(step['client_bound'] for step in steps),
+    }
+
+
+def plan_seconds(low, high, step_duration, tolerance, timeout=1.0):
+    """
+    Upper bound on the length of a search whose capacity lies between low and high
+
+    Doubling from low reaches high in ceil(log2(high / low)) + 1 steps and
+    bisecting the band [failing / 2, failing] takes at most
+    ceil(log2(1 / tolerance)) + 1 more; every step lasts its duration plus up
+    to two timeouts (late sends and the final drain).
+    """
+    steps = (math.ceil(math.log2(max(high / low, 1))) + 1
+             + math.ceil(math.log2(1 / max(tolerance, 1e-6))) + 1)
+    return steps * (step_duration + 2 * timeout)
+
+
+def search_domain_file(server, domain_file, low, high, step_duration, max_loss, max_p99,
+                       tolerance, workers=1, timeout=1.0, port=53, drops_blocked=False, expected_drop=0.0,
+                       blocklist=None):
+    """
+    Run a capacity search with open-loop fixed-rate steps over one domain file
+
+    drops_blocked and expected_drop describe a server that drops blocked
+    names (see step_passes); the source labels come from the blocklist or
+    the domain file's make_domainfile label index.
+    """
+
+    def run_step(qps):
+        options = {'port': port, 'qps': qps, 'duration': step_duration,
+                   'concurrency': max(1000, qps), 'timeout': timeout, 'open_loop': True,
+                   'blocklist': blocklist}
+        if workers > 1:
+            stats, _ = run_sharded_load(server, domain_file, workers, **options)
+        else:
+            stats = run_native_load(server, domain_file, **options)
+        return step_passes(stats, int(qps * step_duration), max_loss, max_p99, drops_blocked, expected_drop)
+
+    return find_capacity(run_step, low, high, max_loss, max_p99, tolerance)
+
+
+def save_capacity(rows, output_file):
+    """Write one capacity row per percentage to CSV"""
+    headers = ['test_type', 'percent', 'capacity_qps', 'band_low', 'band_high', 'steps', 'client_bound', 'elapsed']
+    with open(output_file, 'w', newline='') as f:
+        csv_writer = csv.writer(f)
+        csv_writer.writerow(headers)
+        for row in rows:
+            csv_writer.writerow([row[header] for header in headers])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Search the maximum sustainable QPS of the DNS server')
+    parser.add_argument('test_type', choices=['dnsfw_no', 'dnsfw_rpz', 'dnsfw_xdp'],
+                        help='Firewall mode currently active on the server (labels the results)')
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--percent', type=int, choices=range(10, 100, 10),
+                       help='Percentage of malicious domains (uses output/domain_N.txt)')
+    group.add_argument('--all-percents', action='store_true',
+                       help='Search every percentage from 10 to 90')
+    group.add_argument('--domain-file', help='Search a single query file (e.g. query_file.txt)')
+    parser.add_argument('--server', default='192.168.0.72', help='DNS server address')
+    parser.add_argument('--port', type=int, default=53, help='DNS server port')
+    parser.add_argument('--low', type=int, default=5000, help='Starting rate in QPS')
+    parser.add_argument('--high', type=int, default=400000, help='Highest rate to try in QPS')
+    parser.add_argument('--step-duration', type=float, default=5, help='Seconds per fixed-rate step')
+    parser.add_argument('--max-loss', type=float, default=1.0, help='Maximum loss in percent')
+    parser.add_argument('--max-p99', type=float, default=100, help='Maximum p99 latency in ms')
+    parser.add_argument('--tolerance', type=float, default=5,
+                        help='Stop when the band is narrower than this percent of its top')
+    parser.add_argument('-w', '--workers', type=int, default=1, help='Load worker processes')
+    parser.add_argument('--blocklist', default=None,
+                        help='Blocked names (domain list or RPZ zone) to tell dnsfw_xdp drops from loss')
+    args = parser.parse_args()
+
+    if args.domain_file:
+        targets = [('file', args.domain_file)]
+        # A query file has no known malicious share to discount
+        if (args.test_type == 'dnsfw_xdp' and not args.blocklist
+                and not os.path.exists(label_index_path(args.domain_file))):
+            parser.error('dnsfw_xdp with --domain-file needs --blocklist, or its intended drops count as loss')
+    elif args.all_percents:
+        targets = [(percent, f'output/domain_{percent}.txt') for percent in range(10, 100, 10)]
+    else:
+        percent = args.percent or 10
+        targets = [(percent, f'output/domain_{percent}.txt')]
+
+    local_results_dir = f'results_{datetime.now().strftime("%Y%m%d")}'
+    if not os.path.exists(local_results_dir):
+        os.makedirs(local_results_dir)
+
+    blocklist = Blocklist.from_file(args.blocklist) if args.blocklist else None
+    drops_blocked = args.test_type == 'dnsfw_xdp'
+
+    rows = []
+    sweep_start = time.time()
+    for percent, domain_file in targets:
+        print(f"\nCapacity search for {args.test_type} with {domain_file}")
+        start = time.time()
+        # Without source labels, XDP drops are expected for the malicious share of the file
+        expected_drop = percent / 100 if drops_blocked and percent != 'file' else 0.0
+        result = search_domain_file(args.server, domain_file, args.low, args.high,
+                                    args.step_duration, args.max_loss / 100, args.max_p99 / 1000,
+                                    args.tolerance / 100, args.workers, port=args.port,
+                                    drops_blocked=drops_blocked, expected_drop=expected_drop,
+                                    blocklist=blocklist)
+        elapsed = time.time() - start
+        print(f"Capacity: {result['capacity']} QPS  band [{result['band_low']}, {result['band_high']}]  "
+              f"({len(result['steps'])} steps, {elapsed:.0f}s)")
+        if result['client_bound']:
+            print("Client-bound: the load generator could not keep up, so this is its limit, not the server's")
+        rows.append({'test_type': args.test_type, 'percent': percent,
+                     'capacity_qps': result['capacity'], 'band_low': result['band_low'],
+                     'band_high': result['band_high'], 'steps': len(result['steps']),
+                     'client_bound': result['client_bound'], 'elapsed': round(elapsed, 1)})
+
+    output_file = os.path.join(local_results_dir, f'capacity_{args.test_type}.csv')
+    save_capacity(rows, output_file)
+    print(f"\nSweep finished in {time.time() - sweep_start:.0f}s. Results saved to {output_file}")
+
+
+if __name__ == "__main__":
+    main()
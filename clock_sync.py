@@ -0,0 +1,124 @@
+import re
+import sys
+import json
+import time
+import shlex
+import calendar
+import argparse
+
+from ssh_session import LocalClient, SSHSession
+
+# Agent executed on the DNS server with `python3 -c`: prints the server's UTC
+# offset, then answers every line read on stdin with its epoch time.
+AGENT_SOURCE = r'''
+import sys, time
+out = sys.stdout
+out.write('%d\n' % time.localtime().tm_gmtoff)
+out.flush()
+for line in sys.stdin:
+    out.write(repr(time.time()) + '\n')
+    out.flush()
+'''
+
+# Date in the sar header: ISO (S_TIME_FORMAT=ISO) or the pt_BR dd/mm/yyyy
+ISO_DATE = re.compile(r'\b(\d{4})-(\d{2})-(\d{2})\b')
+BR_DATE = re.compile(r'\b(\d{2})/(\d{2})/(\d{4})\b')
+
+
+def _text(line):
+    return line.decode() if isinstance(line, bytes) else line
+
+
+def estimate_clock(ssh, samples=10, python='python3'):
+    """
+    Estimate the server clock offset and RTT over one SSH exec channel
+
+    Sends `samples` NTP-style ping-pongs to a tiny agent and keeps the one
+    with the lowest RTT: offset = server time - midpoint of the round trip.
+    Returns a dict with 'offset' (server - client, seconds), 'rtt', the
+    server's 'utc_offset' and the client epoch of the measurement.
+    """
+    stdin, stdout, stderr = ssh.exec_command(' '.join(shlex.quote(arg) for arg in [python, '-c', AGENT_SOURCE]))
+    try:
+        utc_offset = int(_text(stdout.readline()))
+        best = None
+        for _ in range(samples):
+            sent = time.time()
+            stdin.write('\n')
+            stdin.flush()
+            server = float(_text(stdout.readline()))
+            received = time.time()
+            rtt = received - sent
+            if best is None or rtt < best[0]:
+                best = (rtt, server - (sent + received) / 2, received)
+    finally:
+        stdin.close()
+    rtt, offset, measured = best
+    return {'offset': round(offset, 6), 'rtt': round(rtt, 6), 'utc_offset': utc_offset,
+            'measured_at': round(measured, 6), 'samples': samples}
+
+
+def parse_sar_date(line):
+    """Date of a sar header line as (year, month, day), or None"""
+    match = ISO_DATE.search(line)
+    if match:
+        return tuple(int(value) for value in match.groups())
+    match = BR_DATE.search(line)
+    if match:
+        day, month, year = (int(value) for value in match.groups())
+        return year, month, day
+    return None
+
+
+class SarTimeline:
+    """
+    Convert sar's server wall-clock HH:MM:SS stamps to client epoch time
+
+    Uses the date from the sar header, the server's UTC offset and the
+    estimated clock offset; a timestamp going back by more than 12 hours
+    means the run crossed midnight.
+
+    Args:
+    date (tuple): (year, month, day) from parse_sar_date
+    clock (dict): Result of estimate_clock
+    """
+
+    def __init__(self, date, clock):
+        self.midnight = calendar.timegm((date[0], date[1], date[2], 0, 0, 0))
+        self.utc_offset = clock['utc_offset']
+        self.offset = clock['offset']
+        self.previous = None
+
+    def epoch(self, timestamp):
+        hours, minutes, seconds = timestamp.split(':')
+        second_of_day = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+        if self.previous is not None and second_of_day < self.previous - 43200:
+            self.midnight += 86400
+        self.previous = second_of_day
+        return self.midnight + second_of_day - self.utc_offset - self.offset
+
+
+def to_client_time(server_epoch, clock):
+    """Rebase a server epoch timestamp onto the client clock"""
+    return server_epoch - clock['offset']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Estimate client/server clock offset and RTT')
+    parser.add_argument('--host', default='192.168.0.72', help='SSH server')
+    parser.add_argument('--user', default='user', help='SSH user')
+    parser.add_argument('--password', default='pass', help='SSH password')
+    parser.add_argument('-n', '--samples', type=int, default=10, help='Ping-pong samples (default: 10)')
+    parser.add_argument('--local', action='store_true', help='Measure against this machine (no SSH)')
+    args = parser.parse_args()
+
+    with SSHSession(args.host, args.user, args.password,
+                    client_factory=LocalClient if args.local else None) as session:
+        clock = estimate_clock(session, args.samples)
+    print(json.dumps(clock, indent=2))
+    print(f"Server clock is {clock['offset'] * 1000:+.3f}ms from this host (RTT {clock['rtt'] * 1000:.3f}ms)",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+import os
+import re
+import sys
+import time
+import struct
+import argparse
+
+import numpy as np
+
+ZONE = 'rpz.local'
+TTL = 300
+# Keys file: magic, key size, count, then `count` sorted keys of `key size` bytes
+KEYS_MAGIC = b'DNSFWKEY'
+KEYS_HEADER = struct.Struct('<8sII')
+KEY_SIZE = 64
+# Sink addresses of hosts-format lists ("0.0.0.0 example.com")
+HOSTS_ADDRESSES = (b'0.0.0.0', b'127.0.0.1', b'::', b'::1')
+VALID_NAME = re.compile(rb'^(\*\.)?([a-z0-9_]([a-z0-9_-]{0,61}[a-z0-9_])?\.)*[a-z0-9_]([a-z0-9_-]{0,61}[a-z0-9_])?$')
+
+
+def normalize(line):
+    """
+    Blocked name of one input line, lowercased without the trailing dot
+
+    Accepts plain domain lists, hosts-format lines and the owner names of an
+    RPZ zone. Returns b'' for comments and blank lines and None for names
+    that are not valid DNS names.
+    """
+    fields = line.split()
+    if not fields or fields[0][:1] in (b'#', b';', b'$', b'@'):
+        return b''
+    name = fields[1] if len(fields) > 1 and fields[0] in HOSTS_ADDRESSES else fields[0]
+    if b'SOA' in fields[1:] or b'NS' in fields[1:]:
+        return b''
+    name = name.rstrip(b'.').lower()
+    if name in HOSTS_ADDRESSES or name == b'localhost':
+        return b''
+    if len(name) > 253 or not VALID_NAME.match(name):
+        return None
+    return name
+
+
+def read_names(input_files):
+    """
+    Deduplicated, normalized names of the input lists in a single streaming pass
+
+    Returns (names, counts) with names a set of bytes and counts the lines
+    read, duplicates and invalid names.
+    """
+    names = set()
+    counts = {'lines': 0, 'duplicates': 0, 'invalid': 0}
+    for input_file in input_files:
+        with open(input_file, 'rb') as f:
+            for line in f:
+                counts['lines'] += 1
+                name = normalize(line)
+                if name is None:
+                    counts['invalid'] += 1
+                elif name:
+                    if name in names:
+                        counts['duplicates'] += 1
+                    else:
+                        names.add(name)
+    return names, counts
+
+
+def wire_key(name, key_size=KEY_SIZE):
+    """Lowercased wire-format name as stored in the XDP map, or None when it does not fit the key"""
+    wire = b''.join(bytes((len(label),)) + label for label in name.split(b'.')) + b'\x00'
+    return wire if len(wire) <= key_size else None
+
+
+def build_keys(names, key_size=KEY_SIZE):
+    """
+    Sorted array of fixed-size XDP keys
+
+    The XDP program matches exact names on the query's wire-format QNAME, so
+    wildcards and names longer than the key stay in the RPZ zone only.
+    Returns (keys, skipped).
+    """
+    keys = []
+    skipped = 0
+    for name in names:
+        key = wire_key(name, key_size) if not name.startswith(b'*.') else None
+        if key is None:
+            skipped += 1
+        else:
+            keys.append(key)
+    # 'S' arrays are zero padded to key_size and sort bytewise
+    return np.sort(np.array(keys, dtype=f'S{key_size}')), skipped
+
+
+def write_keys(path, keys, key_size=KEY_SIZE):
+    with open(path, 'wb') as f:
+        f.write(KEYS_HEADER.pack(KEYS_MAGIC, key_size, len(keys)))
+        keys.tofile(f)
+
+
+def read_keys(path):
+    """Keys of a keys file as an 'S' array"""
+    with open(path, 'rb') as f:
+        magic, key_size, count = KEYS_HEADER.unpack(f.read(KEYS_HEADER.size))
+        if magic != KEYS_MAGIC:
+            raise ValueError(f"{path} is not a keys file")
+        return np.fromfile(f, dtype=f'S{key_size}', count=count)
+
+
+def read_zone(path):
+    """
+    Serial and blocked names of a zone written by this script
+
+    Returns (serial, names) or (0, set()) when there is no previous build.
+    """
+    if not os.path.exists(path):
+        return 0, set()
+    serial = 0
+    names = set()
+    with open(path, 'rb') as f:
+        for line in f:
+            fields = line.split()
+            if b'SOA' in fields:
+                serial = int(fields[fields.index(b'SOA') + 3])
+                continue
+            name = normalize(line)
+            if name:
+                names.add(name)
+    return serial, names
+
+
+def write_zone(path, names, zone=ZONE, ttl=TTL, serial=1):
+    """
+    Write the RPZ zone, one 'name CNAME .' (NXDOMAIN) rule per name in sorted order
+
+    The SOA is kept on a single line so domain-list readers such as
+    dnsfw_emulator.Blocklist can read the zone too.
+    """
+    with open(path, 'w', encoding='ascii') as f:
+        f.write(f"$TTL {ttl}\n")
+        f.write(f"@ IN SOA localhost. root.localhost. {serial} 3600 600 86400 {ttl}\n")
+        f.write("@ IN NS localhost.\n")
+        for name in sorted(names):
+            f.write(f"{name.decode('ascii')} CNAME .\n")
+
+
+def write_nsupdate(path, added, removed, zone=ZONE, ttl=TTL, server='127.0.0.1'):
+    """
+    nsupdate script applying the diff to a dynamic RPZ zone in named
+
+    Updates are sent in batches so a large diff does not build one huge message.
+    """
+    with open(path, 'w', encoding='ascii') as f:
+        f.write(f"server {server}\nzone {zone}\n")
+        pending = 0
+        for action, names in (('delete', removed), ('add', added)):
+            for name in sorted(names):
+                record = f"{name.decode('ascii')}.{zone}."
+                f.write(f"update {action} {record} {ttl} CNAME .\n" if action == 'add'
+                        else f"update delete {record} CNAME\n")
+                pending += 1
+                if pending == 1000:
+                    f.write("send\n")
+                    pending = 0
+        if pending:
+            f.write("send\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compile domain lists into an RPZ zone and an XDP keys file')
+    parser.add_argument('input_files', nargs='+', help='Domain lists, hosts files or RPZ zones')
+    parser.add_argument('-o', '--output', default='blocklist.rpz', help='RPZ zone to write (default: blocklist.rpz)')
+    parser.add_argument('--keys', help='XDP keys file (default: output with .keys)')
+    parser.add_argument('--key-size', type=int, default=KEY_SIZE,
+                        help=f'Bytes per XDP key, wire-format name zero padded (default: {KEY_SIZE})')
+    parser.add_argument('--zone', default=ZONE, help=f'RPZ zone name (default: {ZONE})')
+    parser.add_argument('--ttl', type=int, default=TTL, help=f'TTL of the rules (default: {TTL})')
+    parser.add_argument('--wildcard', action='store_true', help='Also block every subdomain (*.name rules)')
+    parser.add_argument('--server', default='127.0.0.1', help='named address in the nsupdate script (default: 127.0.0.1)')
+    parser.add_argument('--no-diff', action='store_true', help='Do not compare with the previous build')
+    args = parser.parse_args()
+
+    for input_file in args.input_files:
+        if not os.path.exists(input_file):
+            print(f"Error: input file '{input_file}' does not exist")
+            sys.exit(1)
+    keys_file = args.keys or os.path.splitext(args.output)[0] + '.keys'
+    base = os.path.splitext(args.output)[0]
+
+    start = time.perf_counter()
+    names, counts = read_names(args.input_files)
+    if args.wildcard:
+        names |= {b'*.' + name for name in names if not name.startswith(b'*.')}
+    print(f"{counts['lines']} lines, {len(names)} names ({counts['duplicates']} duplicates, "
+          f"{counts['invalid']} invalid) in {time.perf_counter() - start:.2f}s")
+
+    serial, previous = (0, set()) if args.no_diff else read_zone(args.output)
+    previous_keys = None
+    if not args.no_diff and os.path.exists(keys_file):
+        previous_keys = read_keys(keys_file)
+    write_zone(args.output, names, args.zone, args.ttl, max(serial + 1, int(time.time())))
+    keys, skipped = build_keys(names, args.key_size)
+    write_keys(keys_file, keys, args.key_size)
+    print(f"{args.output}: {len(names)} rules; {keys_file}: {len(keys)} keys of {args.key_size} bytes "
+          f"({skipped} wildcard or oversize names left to RPZ)")
+
+    if previous or previous_keys is not None:
+        added, removed = names - previous, previous - names
+        write_nsupdate(f'{base}.nsupdate', added, removed, args.zone, args.ttl, args.server)
+        print(f"RPZ diff: +{len(added)} -{len(removed)} -> {base}.nsupdate")
+        if previous_keys is not None and previous_keys.dtype == keys.dtype:
+            # Both key arrays are sorted and unique
+            added_keys = np.setdiff1d(keys, previous_keys, assume_unique=True)
+            removed_keys = np.setdiff1d(previous_keys, keys, assume_unique=True)
+            write_keys(f'{base}.keys.add', added_keys, args.key_size)
+            write_keys(f'{base}.keys.del', removed_keys, args.key_size)
+            print(f"XDP diff: +{len(added_keys)} -{len(removed_keys)} -> {base}.keys.add / {base}.keys.del")
+        elif previous_keys is not None:
+            print("XDP key size changed, no key diff written: load the full keys file")
+    print(f"Done in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
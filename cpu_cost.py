@@ -0,0 +1,149 @@
+import os
+import csv
+import glob
+import json
+import argparse
+from datetime import datetime
+
+import numpy as np
+
+from results_store import METRICS, TEST_TYPES, parse_run_name, read_sar_csv
+
+COST_FIELDS = ['usr', 'sys', 'soft', 'irq']
+HEADERS = (['test_type', 'percent', 'rate', 'repetition', 'seconds', 'qps']
+           + [f'{field}_us' for field in COST_FIELDS] + ['total_us'])
+
+
+def client_series(load_file, epoch=False):
+    """
+    Per-second answered counts of a native load run
+
+    Returns (seconds, answered) arrays, seconds being client epoch seconds or,
+    without epoch, seconds of day; None for runs saved before the load stats
+    carried a series.
+    """
+    with open(load_file) as f:
+        series = json.load(f).get('series')
+    if not series or not series['second']:
+        return None
+    seconds = series['second'] if epoch else [_second_of_day(second) for second in series['second']]
+    return np.array(seconds, dtype=np.int64), np.array(series['answered'], dtype=np.float64)
+
+
+def _second_of_day(epoch):
+    moment = datetime.fromtimestamp(epoch)
+    return moment.hour * 3600 + moment.minute * 60 + moment.second
+
+
+def has_epoch(sar_file):
+    """True for sar CSVs stamped with client epoch times (clock_sync)"""
+    with open(sar_file, newline='') as f:
+        return 'epoch' in next(csv.reader(f), [])
+
+
+def server_cpu_seconds(sar_file, epoch=False):
+    """
+    CPU-seconds spent per second by each sar category, summed over the per-CPU rows
+
+    Returns (seconds, {field: cpu-seconds per second}), seconds being client
+    epoch seconds (rounded) or, without epoch, seconds of day.
+    """
+    times, cpus, values = read_sar_csv(sar_file, 'epoch' if epoch else 'Timestamp')
+    per_cpu = cpus >= 0
+    seconds = (np.round(times[per_cpu]) if epoch else np.floor(times[per_cpu])).astype(np.int64)
+    unique, inverse = np.unique(seconds, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    # Sub-second samplers (proc_sampler) write several rows per CPU and second: average them
+    samples = np.bincount(inverse, minlength=len(unique)) / max(len(np.unique(cpus[per_cpu])), 1)
+    usage = {}
+    for field in COST_FIELDS:
+        column = values[per_cpu, METRICS.index(field)].astype(np.float64) / 100.0
+        usage[field] = np.bincount(inverse, weights=column, minlength=len(unique)) / np.maximum(samples, 1)
+    return unique, usage
+
+
+def cost_per_query(load_file, sar_file, min_answered=1, steady=None):
+    """
+    CPU-microseconds per answered query, split into usr/sys/soft/irq
+
+    Client and server seconds are joined on the client epoch when the sar CSV
+    was stamped with a clock estimate, otherwise on the time of day (which
+    assumes synchronized clocks in the same time zone); only seconds with
+    at least `min_answered` answers count, and each figure is the ratio of
+    sums over them (CPU time / queries), not a mean of per-second ratios.
+    With a steady window (steady_state.detect_run) only its seconds count.
+    Returns None when the run has no per-second client series or no overlap.
+    """
+    epoch = has_epoch(sar_file)
+    series = client_series(load_file, epoch)
+    if series is None:
+        return None
+    client_seconds, answered = series
+    server_seconds, usage = server_cpu_seconds(sar_file, epoch)
+    common, client_index, server_index = np.intersect1d(client_seconds, server_seconds, return_indices=True)
+    keep = answered[client_index] >= min_answered
+    if steady:
+        keep &= (common >= np.floor(steady['start'])) & (common <= np.ceil(steady['end']))
+    queries = answered[client_index][keep].sum()
+    if not len(common) or not queries or not keep.any():
+        return None
+    result = {'seconds': int(keep.sum()), 'qps': round(queries / keep.sum(), 1)}
+    total = 0.0
+    for field in COST_FIELDS:
+        cost = usage[field][server_index][keep].sum() * 1e6 / queries
+        result[f'{field}_us'] = round(cost, 3)
+        total += cost
+    result['total_us'] = round(total, 3)
+    return result
+
+
+def analyze(results_dir):
+    """Cost per query of every run in a results directory that has both a load JSON and a sar CSV"""
+    rows = []
+    for load_file in sorted(glob.glob(os.path.join(results_dir, 'load_*.json'))):
+        suffix = os.path.basename(load_file)[len('load_'):-len('.json')]
+        sar_file = os.path.join(results_dir, f'sar_output_{suffix}.csv')
+        run = parse_run_name(sar_file)
+        if run is None or not os.path.exists(sar_file):
+            continue
+        with open(load_file) as f:
+            steady = json.load(f).get('steady_state')
+        cost = cost_per_query(load_file, sar_file, steady=steady)
+        if cost is None:
+            print(f"{suffix}: no per-second client series overlapping the sar samples, skipped")
+            continue
+        rows.append(dict(test_type=run['test_type'], percent=run['percent'], rate=run['rate'],
+                         repetition=run['repetition'], **cost))
+    rows.sort(key=lambda row: (TEST_TYPES.index(row['test_type']), row['percent'], row['rate'], row['repetition']))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CPU-microseconds per query per test type and malicious percentage')
+    parser.add_argument('results_dir', help='Results directory (e.g. results_20250416)')
+    parser.add_argument('-o', '--output', help='CSV output (default: results_dir/cpu_cost.csv)')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.results_dir):
+        print(f"Error: Results directory '{args.results_dir}' does not exist")
+        return
+    rows = analyze(args.results_dir)
+    if not rows:
+        print("No runs with both a load JSON series and a sar CSV")
+        return
+    output_file = args.output or os.path.join(args.results_dir, 'cpu_cost.csv')
+    with open(output_file, 'w', newline='') as f:
+        csv_writer = csv.DictWriter(f, HEADERS)
+        csv_writer.writeheader()
+        csv_writer.writerows(rows)
+
+    print(f"{'test_type':<10}{'%':>4}{'rate':>8}{'rep':>4}{'qps':>10}"
+          + ''.join(f"{field + ' us':>10}" for field in COST_FIELDS) + f"{'total us':>10}")
+    for row in rows:
+        print(f"{row['test_type']:<10}{row['percent']:>4}{row['rate']:>8}{row['repetition']:>4}{row['qps']:>10.0f}"
+              + ''.join(f"{row[field + '_us']:>10.2f}" for field in COST_FIELDS) + f"{row['total_us']:>10.2f}")
+    print(f"\nCPU cost per query saved to {output_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,734 @@
+import asyncio
+import socket
+import time
+import json
+import argparse
+import os
+import multiprocessing
+from collections import deque
+
+from dns_wire import HEADER, build_query
+from dnsfw_emulator import Blocklist
+from latency_hist import LatencyHistogram
+from query_cache import QueryCache, read_query_file
+from response_class import SOURCES, ResponseStats, label_queries, read_label_index
+
+# Paced sends wait the last SPIN seconds before their scheduled time by polling
+# the reply sockets: the event loop only wakes with millisecond granularity
+SPIN = 0.002
+
+
+class LoadStats:
+    """Counters collected by the load generator during a run"""
+
+    def __init__(self):
+        self.sent = 0
+        self.answered = 0
+        self.timeouts = 0
+        self.send_errors = 0
+        self.unexpected = 0
+        self.max_outstanding = 0
+        self.start_time = 0.0
+        self.end_time = 0.0
+        self.latency = LatencyHistogram()
+        # Open-loop runs also measure latency from the scheduled send time
+        self.corrected_latency = None
+        self.unsent = 0
+        # Epoch second -> [sent, answered] during the second ending there, like sar's timestamps
+        self.series = {}
+        # Replies and timeouts per source list and response class
+        self.responses = ResponseStats()
+
+    @property
+    def elapsed(self):
+        return max(self.end_time - self.start_time, 0.0)
+
+    @property
+    def achieved_qps(self):
+        return self.answered / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self):
+        return {
+            'sent': self.sent,
+            'answered': self.answered,
+            'timeouts': self.timeouts,
+            'send_errors': self.send_errors,
+            'unexpected': self.unexpected,
+            'max_outstanding': self.max_outstanding,
+            'start_time': self.start_time,
+            'end_time': self.end_time,
+            'elapsed': self.elapsed,
+            'achieved_qps': self.achieved_qps,
+            'latency': self.latency.percentiles(),
+            'corrected_latency': (self.corrected_latency.percentiles()
+                                  if self.corrected_latency else None),
+            'unsent': self.unsent,
+            'responses': self.responses.as_dict(),
+            'series': {
+                'second': sorted(self.series),
+                'sent': [self.series[second][0] for second in sorted(self.series)],
+                'answered': [self.series[second][1] for second in sorted(self.series)],
+            },
+        }
+
+    def merge(self, other):
+        """Fold the stats of another worker into this one"""
+        if not self.sent and self.responses.sources != other.responses.sources:
+            self.responses = ResponseStats(other.responses.sources)
+        if not self.start_time or (other.start_time and other.start_time < self.start_time):
+            self.start_time = other.start_time
+        self.end_time = max(self.end_time, other.end_time)
+        self.sent += other.sent
+        self.answered += other.answered
+        self.timeouts += other.timeouts
+        self.send_errors += other.send_errors
+        self.unexpected += other.unexpected
+        self.max_outstanding += other.max_outstanding
+        self.unsent += other.unsent
+        self.latency.merge(other.latency)
+        self.responses.merge(other.responses)
+        for second, (sent, answered) in other.series.items():
+            counts = self.series.setdefault(second, [0, 0])
+            counts[0] += sent
+            counts[1] += answered
+        if other.corrected_latency is not None:
+            if self.corrected_latency is None:
+                self.corrected_latency = LatencyHistogram()
+            self.corrected_latency.merge(other.corrected_latency)
+        return self
+
+    def summary(self):
+        lost = self.timeouts / self.sent * 100 if self.sent else 0.0
+        return (f"Sent: {self.sent}  Answered: {self.answered}  Timeouts: {self.timeouts} ({lost:.2f}%)  "
+                f"Send errors: {self.send_errors}  Max outstanding: {self.max_outstanding}  "
+                f"Achieved QPS: {self.achieved_qps:.0f}"
+                + (f"  Unsent: {self.unsent}" if self.unsent and not self.corrected_latency else '')
+                + f"\nLatency {self.latency.summary()}"
+                + (f"\nCorrected latency {self.corrected_latency.summary()}  Unsent: {self.unsent}"
+                   if self.corrected_latency else '')
+                + (f"\n{self.responses.summary()}" if self.sent else ''))
+
+
+class LoadGenerator:
+    """
+    Native asyncio UDP DNS load generator
+
+    Args:
+    server (str): Address of the DNS server under test
+    queries (QueryCache or list): Precompiled queries or plain names, sent in
+                                  order and repeated as needed
+    port (int): DNS server port
+    qps (int): Target queries per second, 0 sends as fast as the window allows
+    concurrency (int): Maximum number of outstanding queries, at most 65535 per socket
+    duration (float): Sending time in seconds
+    sockets (int): Number of UDP sockets the queries are spread over
+    timeout (float): Seconds before an unanswered query counts as timed out
+    open_loop (bool): Schedule query i at start + i/qps and also measure its
+                      latency from that intended send time, so resolver stalls
+                      are not hidden by coordinated omission (requires qps)
+    labels (array): Source list of each query (0 benign, 1 blocked), so replies
+                    are also broken down by list; see response_class.label_queries
+    """
+
+    def __init__(self, server, queries, port=53, qps=0, concurrency=60000, duration=60,
+                 sockets=64, timeout=2.0, open_loop=False, labels=None):
+        if open_loop and not qps:
+            raise ValueError("Open-loop mode needs a target QPS")
+        if not isinstance(queries, QueryCache):
+            queries = QueryCache.from_queries((name, 1) for name in queries)
+        if not len(queries):
+            raise ValueError("No domains to query")
+        if labels is not None and len(labels) != len(queries):
+            raise ValueError("Labels do not match the queries")
+        if concurrency > 0xFFFF * sockets:
+            raise ValueError(f"Concurrency {concurrency} exceeds the query ids of {sockets} sockets "
+                             f"({0xFFFF * sockets}); use more sockets")
+        self.server = server
+        self.port = port
+        self.queries = queries
+        self.qps = qps
+        self.concurrency = concurrency
+        self.duration = duration
+        self.sockets = sockets
+        self.timeout = timeout
+        self.open_loop = open_loop
+        self.stats = LoadStats()
+        if open_loop:
+            self.stats.corrected_latency = LatencyHistogram()
+        self.labels = labels
+        if labels is not None:
+            self.stats.responses = ResponseStats(SOURCES)
+        # key -> source list of the query, labelled runs only
+        self.sources = {}
+        # key -> scheduled send time, open-loop only
+        self.scheduled = {}
+        self.start = 0.0
+        self.socks = []
+        self.next_id = []
+        # Position in the query stream; failed sends advance it but are not counted as sent
+        self.position = 0
+        # (socket index << 16 | query id) -> send time
+        self.pending = {}
+        self.expiry = deque()
+        self.window_open = None
+
+    def on_response(self, index, data):
+        if len(data) < HEADER.size:
+            self.stats.unexpected += 1
+            return
+        key = (index << 16) | (data[0] << 8 | data[1])
+        sent_at = self.pending.pop(key, None)
+        if sent_at is None:
+            self.stats.unexpected += 1
+            return
+        now = time.monotonic()
+        self.stats.answered += 1
+        # Recorded per class only; the overall histogram is merged from them at the end
+        source = self.sources.pop(key, 0) if self.labels is not None else 0
+        self.stats.responses.record(source, data, now - sent_at)
+        if self.open_loop:
+            self.stats.corrected_latency.record(now - self.scheduled.pop(key, sent_at))
+        self.window_open.set()
+
+    def expire(self, now):
+        """Count queries older than the timeout as lost"""
+        expiry = self.expiry
+        while expiry and expiry[0][0] <= now:
+            _, key, sent_at = expiry.popleft()
+            if self.pending.get(key) == sent_at:
+                del self.pending[key]
+                self.scheduled.pop(key, None)
+                self.stats.timeouts += 1
+                self.stats.responses.timeout(self.sources.pop(key, 0))
+        if len(self.pending) < self.concurrency:
+            self.window_open.set()
+
+    def drain(self, index):
+        """
+        Read every reply queued on socket `index`
+
+        An asyncio datagram transport reads one datagram per socket per loop
+        pass, which falls behind the sender; reading until the socket is empty
+        keeps replies from piling up in the kernel buffer and timing out.
+        """
+        recv = self.socks[index].recv
+        while True:
+            try:
+                data = recv(4096)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                # ICMP errors (e.g. port unreachable) are reported on the next read
+                self.stats.send_errors += 1
+                continue
+            self.on_response(index, data)
+
+    def drain_all(self):
+        for index in range(len(self.socks)):
+            self.drain(index)
+
+    def send_batch(self, now, count):
+        """
+        Send up to `count` queries round-robin over the sockets
+
+        Only queries the socket accepted are counted as sent and wait for a
+        reply; a full socket buffer ends the batch and the query is retried.
+        A query whose socket has every id outstanding is skipped and counted
+        as unsent. Returns the number of queries sent.
+        """
+        stats = self.stats
+        pending = self.pending
+        expiry = self.expiry
+        next_id = self.next_id
+        sends = [sock.send for sock in self.socks]
+        packet = self.queries.packet
+        total = len(self.queries)
+        sockets = self.sockets
+        expires = now + self.timeout
+        labels = self.labels
+        sources = self.sources
+        position = self.position
+        end = position + count
+        sent = 0
+        while position < end:
+            index = position % sockets
+            query_id = next_id[index]
+            key = (index << 16) | query_id
+            # Skip ids that are still waiting for an answer on this socket
+            while key in pending:
+                query_id = (query_id + 1) & 0xFFFF
+                key = (index << 16) | query_id
+                if query_id == next_id[index]:
+                    break
+            if key in pending:
+                stats.unsent += 1
+                position += 1
+                continue
+            try:
+                sends[index](packet(position % total, query_id))
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                stats.send_errors += 1
+                position += 1
+                continue
+            next_id[index] = (query_id + 1) & 0xFFFF
+            pending[key] = now
+            expiry.append((expires, key, now))
+            if labels is not None:
+                sources[key] = labels[position % total]
+            if self.open_loop:
+                self.scheduled[key] = self.start + position / self.qps
+            position += 1
+            sent += 1
+        self.position = position
+        stats.sent += sent
+        return sent
+
+    def open_sockets(self):
+        loop = asyncio.get_running_loop()
+        for index in range(self.sockets):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.setblocking(False)
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4 * 1024 * 1024)
+            except OSError:
+                pass
+            sock.connect((self.server, self.port))
+            self.socks.append(sock)
+            self.next_id.append(index * 977 & 0xFFFF)
+            loop.add_reader(sock.fileno(), self.drain, index)
+
+    def record_second(self, second, previous):
+        """Store the counts since `previous` (sent, answered) under epoch `second`"""
+        stats = self.stats
+        counts = stats.series.setdefault(second, [0, 0])
+        counts[0] += stats.sent - previous[0]
+        counts[1] += stats.answered - previous[1]
+        return stats.sent, stats.answered
+
+    async def sample_series(self):
+        """Snapshot the counters on every whole epoch second for the per-second series"""
+        previous = (self.stats.sent, self.stats.answered)
+        try:
+            while True:
+                now = time.time()
+                second = int(now) + 1
+                await asyncio.sleep(second - now)
+                previous = self.record_second(second, previous)
+        except asyncio.CancelledError:
+            self.record_second(int(time.time()) + 1, previous)
+            raise
+
+    async def wait_until(self, when):
+        """
+        Wait until the monotonic time `when`, reading replies meanwhile
+
+        Sleeping alone would send each paced query up to a loop tick after
+        its scheduled time, and open-loop runs would count that delay of the
+        client itself in the corrected latency.
+        """
+        clock = time.monotonic
+        await asyncio.sleep(max(when - clock() - SPIN, 0))
+        while clock() < when:
+            self.drain_all()
+
+    async def run(self):
+        """Run the load for the configured duration and return the collected stats"""
+        self.window_open = asyncio.Event()
+        self.open_sockets()
+        stats = self.stats
+        clock = time.monotonic
+        tick = 0.001
+        batch = 512
+        try:
+            start = self.start = clock()
+            stats.start_time = time.time()
+            sampler = asyncio.ensure_future(self.sample_series())
+            deadline = start + self.duration
+            planned = int(self.qps * self.duration)
+            now = start
+            # Open-loop runs keep sending queries that fell behind schedule
+            # for up to one timeout past the deadline
+            while now < deadline or (self.open_loop and self.position < planned
+                                     and now < deadline + self.timeout):
+                # Hold the next batch back until the replies already queued are read
+                self.drain_all()
+                self.expire(now)
+                room = self.concurrency - len(self.pending)
+                if room <= 0:
+                    self.window_open.clear()
+                    try:
+                        await asyncio.wait_for(self.window_open.wait(), tick)
+                    except asyncio.TimeoutError:
+                        pass
+                    now = clock()
+                    continue
+                if self.qps:
+                    due = min(int((now - start) * self.qps) + 1, planned) - self.position
+                else:
+                    due = batch
+                count = min(due, room, batch)
+                if count > 0:
+                    self.send_batch(now, count)
+                if len(self.pending) > stats.max_outstanding:
+                    stats.max_outstanding = len(self.pending)
+                # Yield to the event loop so responses are processed between batches;
+                # paced runs resume exactly when the next query is scheduled
+                if self.qps and due <= batch:
+                    await self.wait_until(start + self.position / self.qps)
+                else:
+                    await asyncio.sleep(0)
+                now = clock()
+            if self.open_loop:
+                stats.unsent += max(planned - self.position, 0)
+            # Drain answers still in flight
+            drain_deadline = clock() + self.timeout
+            while self.pending and clock() < drain_deadline:
+                await asyncio.sleep(tick)
+                self.expire(clock())
+            stats.timeouts += len(self.pending)
+            for key in self.pending:
+                stats.responses.timeout(self.sources.get(key, 0))
+            self.pending.clear()
+            self.scheduled.clear()
+            self.sources.clear()
+            stats.latency = stats.responses.combined()
+            stats.end_time = time.time()
+            sampler.cancel()
+            try:
+                await sampler
+            except asyncio.CancelledError:
+                pass
+        finally:
+            loop = asyncio.get_running_loop()
+            for sock in self.socks:
+                loop.remove_reader(sock.fileno())
+                sock.close()
+        return stats
+
+
+def domain_labels(domain_file, blocklist, count):
+    """
+    Source list of every query of a domain file
+
+    Names are looked up in the blocklist when one is given; otherwise the
+    label index written by make_domainfile is used when it matches the
+    file's `count` queries. Returns None when neither is available.
+    """
+    if blocklist is None:
+        return read_label_index(domain_file, count)
+    return label_queries((query[0] for query in read_query_file(domain_file)), blocklist)
+
+
+def run_native_load(server, domain_file, port=53, qps=0, concurrency=60000, duration=60,
+                    sockets=64, timeout=2.0, open_loop=False, blocklist=None):
+    """
+    Load the domain file and run the native load generator to completion
+
+    With a blocklist (dnsfw_emulator.Blocklist) or a make_domainfile label
+    index the response classes are also broken down into blocked and benign
+    names.
+    """
+    queries = QueryCache.from_file(domain_file)
+    generator = LoadGenerator(server, queries, port=port, qps=qps, concurrency=concurrency,
+                              duration=duration, sockets=sockets, timeout=timeout,
+                              open_loop=open_loop, labels=domain_labels(domain_file, blocklist, len(queries)))
+    return asyncio.run(generator.run())
+
+
+class _ProbeProtocol(asyncio.DatagramProtocol):
+    """Datagram endpoint for one closed-loop worker with a single query in flight"""
+
+    def __init__(self):
+        self.waiter = None
+        self.query_id = -1
+
+    def datagram_received(self, data, addr):
+        waiter = self.waiter
+        if (waiter is not None and not waiter.done() and len(data) >= HEADER.size
+                and (data[0] << 8 | data[1]) == self.query_id):
+            waiter.set_result(data)
+
+
+async def _probe_worker(server, port, queries, worker, requests, delay, timeout, stats):
+    loop = asyncio.get_running_loop()
+    transport, protocol = await loop.create_datagram_endpoint(
+        _ProbeProtocol, remote_addr=(server, port), family=socket.AF_INET)
+    try:
+        for number in range(requests):
+            query_id = (worker * requests + number) & 0xFFFF
+            protocol.query_id = query_id
+            protocol.waiter = loop.create_future()
+            sent_at = time.monotonic()
+            transport.sendto(queries.packet((worker + number) % len(queries), query_id))
+            stats.sent += 1
+            try:
+                data = await asyncio.wait_for(protocol.waiter, timeout)
+                latency = time.monotonic() - sent_at
+                stats.answered += 1
+                stats.latency.record(latency)
+                stats.responses.record(0, data, latency)
+            except asyncio.TimeoutError:
+                stats.timeouts += 1
+                stats.responses.timeout(0)
+            if delay:
+                await asyncio.sleep(delay)
+    finally:
+        transport.close()
+
+
+def run_latency_probe(server, domain_file, port=53, workers=5, requests=200, delay=1.0, timeout=2.0):
+    """
+    Closed-loop latency measurement, the native equivalent of `dnspyre -n -c --request-delay`
+
+    Each worker keeps one query in flight, waits for its answer (or timeout),
+    sleeps `delay` seconds and repeats `requests` times. Every answer is
+    recorded in the stats latency histogram.
+    """
+    queries = QueryCache.from_file(domain_file)
+    stats = LoadStats()
+
+    async def probe():
+        stats.max_outstanding = workers
+        stats.start_time = time.time()
+        await asyncio.gather(*(_probe_worker(server, port, queries, worker, requests, delay,
+                                             timeout, stats)
+                               for worker in range(workers)))
+        stats.end_time = time.time()
+
+    asyncio.run(probe())
+    return stats
+
+
+async def wait_for_dns(server, port=53, name='localhost', timeout=30.0, interval=0.2):
+    """
+    Readiness probe: send a canary query until the server answers it
+
+    Any response with the canary's ID counts, NXDOMAIN or REFUSED included,
+    since it only has to prove the server is serving. Returns the seconds
+    waited, or None if the server did not answer within `timeout`.
+    """
+    loop = asyncio.get_running_loop()
+    transport, protocol = await loop.create_datagram_endpoint(
+        _ProbeProtocol, remote_addr=(server, port), family=socket.AF_INET)
+    start = time.monotonic()
+    try:
+        query_id = 0
+        while time.monotonic() - start < timeout:
+            query_id = (query_id + 1) & 0xFFFF
+            protocol.query_id = query_id
+            protocol.waiter = loop.create_future()
+            transport.sendto(build_query(name, query_id))
+            try:
+                await asyncio.wait_for(protocol.waiter, interval)
+                return time.monotonic() - start
+            except asyncio.TimeoutError:
+                pass
+        return None
+    finally:
+        transport.close()
+
+
+def _run_worker(task):
+    """Run one shard of a sharded load inside a worker process"""
+    worker, core, server, queries, options = task
+    if core is not None and hasattr(os, 'sched_setaffinity'):
+        try:
+            os.sched_setaffinity(0, {core})
+        except OSError as e:
+            print(f"Worker {worker}: could not pin to core {core}: {e}")
+    generator = LoadGenerator(server, queries, **options)
+    return asyncio.run(generator.run())
+
+
+def verify_merge(merged, parts):
+    """
+    Check that the merged stats equal the sum of the per-worker stats
+
+    Returns a list of mismatch descriptions, empty when everything adds up.
+    """
+    errors = []
+    for field in ('sent', 'answered', 'timeouts', 'send_errors', 'unexpected'):
+        expected = sum(getattr(part, field) for part in parts)
+        if getattr(merged, field) != expected:
+            errors.append(f"{field}: merged {getattr(merged, field)} != workers {expected}")
+    for index, count in enumerate(merged.latency.counts):
+        expected = sum(part.latency.counts[index] for part in parts)
+        if count != expected:
+            errors.append(f"latency bucket {index}: merged {count} != workers {expected}")
+    if merged.latency.total != merged.answered:
+        errors.append(f"latency samples {merged.latency.total} != answered {merged.answered}")
+    classified = sum(sum(counts) for counts in merged.responses.counts)
+    if classified != merged.sent:
+        errors.append(f"classified replies and timeouts {classified} != sent {merged.sent}")
+    for worker, part in enumerate(parts):
+        if part.sent != part.answered + part.timeouts:
+            errors.append(f"worker {worker}: sent {part.sent} != answered + timeouts "
+                          f"{part.answered + part.timeouts}")
+    return errors
+
+
+def run_sharded_load(server, domain_file, workers, port=53, qps=0, concurrency=60000, duration=60,
+                     sockets=64, timeout=2.0, open_loop=False, blocklist=None):
+    """
+    Shard the query stream across worker processes pinned to separate cores
+
+    Each worker gets every Nth name of the domain file and an equal share of the
+    target QPS, concurrency and sockets. Returns the merged stats and the
+    per-worker stats.
+    """
+    queries = QueryCache.from_file(domain_file)
+    labels = domain_labels(domain_file, blocklist, len(queries))
+    if hasattr(os, 'sched_getaffinity'):
+        cores = sorted(os.sched_getaffinity(0))
+    else:
+        cores = []
+    options = {
+        'port': port,
+        'qps': max(1, qps // workers) if qps else 0,
+        'concurrency': max(1, concurrency // workers),
+        'duration': duration,
+        'sockets': max(1, sockets // workers),
+        'timeout': timeout,
+        'open_loop': open_loop,
+    }
+    tasks = []
+    for worker in range(workers):
+        core = cores[worker % len(cores)] if cores else None
+        sharded = len(queries) >= workers
+        shard = queries.shard(worker, workers) if sharded else queries
+        if labels is not None:
+            # Same stride as QueryCache.shard, so labels stay aligned with their queries
+            options = dict(options, labels=labels[worker::workers] if sharded else labels)
+        tasks.append((worker, core, server, shard, options))
+    with multiprocessing.Pool(workers) as pool:
+        parts = pool.map(_run_worker, tasks)
+    merged = LoadStats()
+    for part in parts:
+        merged.merge(part)
+    return merged, parts
+
+
+def save_stats(stats, output_file, extra=None):
+    """
+    Save the load stats as JSON and the latency histogram next to it (.hdr)
+
+    Args:
+    stats (LoadStats): Stats of the run
+    output_file (str): Path to the JSON file
+    extra (dict): Other per-run results joined into the same JSON (e.g. process samples)
+    """
+    data = stats.as_dict()
+    if extra:
+        data.update(extra)
+    with open(output_file, 'w') as f:
+        json.dump(data, f, indent=2)
+    base_name = os.path.splitext(output_file)[0]
+    stats.latency.save(base_name + '.hdr')
+    if stats.corrected_latency is not None:
+        stats.corrected_latency.save(base_name + '_corrected.hdr')
+
+
+class _EchoResponder(asyncio.DatagramProtocol):
+    """Minimal local responder: returns each query with the QR bit set"""
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        if len(data) >= HEADER.size:
+            reply = bytearray(data)
+            reply[2] |= 0x80
+            self.transport.sendto(reply, addr)
+
+
+async def serve_echo(host, port):
+    """Run the local echo responder until cancelled"""
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(_EchoResponder, local_addr=(host, port))
+    print(f"Echo responder listening on {host}:{port}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        transport.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Native asyncio UDP DNS load generator')
+    parser.add_argument('domain_file', nargs='?', help='File with one domain per line')
+    parser.add_argument('--server', default='192.168.0.72', help='DNS server address')
+    parser.add_argument('--port', type=int, default=53, help='DNS server port')
+    parser.add_argument('-d', '--duration', type=float, default=60, help='Sending time in seconds')
+    parser.add_argument('-c', '--concurrency', type=int, default=60000,
+                        help='Maximum outstanding queries')
+    parser.add_argument('--qps', type=int, default=0, help='Target QPS (0 = unlimited)')
+    parser.add_argument('--sockets', type=int, default=64, help='Number of UDP sockets')
+    parser.add_argument('--timeout', type=float, default=2.0, help='Query timeout in seconds')
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help='Number of worker processes, each pinned to its own core')
+    parser.add_argument('--verify', action='store_true',
+                        help='Check the merged totals against the per-worker totals')
+    parser.add_argument('--open-loop', action='store_true',
+                        help='Schedule queries at fixed intervals and correct for coordinated omission')
+    parser.add_argument('--latency', action='store_true',
+                        help='Closed-loop latency probe instead of throughput load')
+    parser.add_argument('--probe-workers', type=int, default=5,
+                        help='Latency probe workers, one query in flight each')
+    parser.add_argument('-n', '--requests', type=int, default=200,
+                        help='Requests per latency probe worker')
+    parser.add_argument('--request-delay', type=float, default=1.0,
+                        help='Seconds between requests of a latency probe worker')
+    parser.add_argument('-o', '--output', help='Save the run stats as JSON (histogram as .hdr)')
+    parser.add_argument('--blocklist',
+                        help='Blocked names (domain list or RPZ zone) to break replies down by source list')
+    parser.add_argument('--serve', metavar='HOST:PORT',
+                        help='Run a local echo responder instead of generating load')
+    args = parser.parse_args()
+
+    if args.serve:
+        host, _, port = args.serve.rpartition(':')
+        try:
+            asyncio.run(serve_echo(host or '127.0.0.1', int(port)))
+        except KeyboardInterrupt:
+            pass
+        return
+
+    if not args.domain_file:
+        parser.error('domain_file is required unless --serve is used')
+    if args.concurrency > 0xFFFF * args.sockets:
+        parser.error(f'--concurrency exceeds the 65535 query ids of each of the {args.sockets} sockets')
+    blocklist = Blocklist.from_file(args.blocklist) if args.blocklist else None
+
+    if args.latency:
+        stats = run_latency_probe(args.server, args.domain_file, port=args.port,
+                                  workers=args.probe_workers, requests=args.requests,
+                                  delay=args.request_delay, timeout=args.timeout)
+    elif args.workers > 1:
+        stats, parts = run_sharded_load(args.server, args.domain_file, args.workers, port=args.port,
+                                        qps=args.qps, concurrency=args.concurrency,
+                                        duration=args.duration, sockets=args.sockets,
+                                        timeout=args.timeout, open_loop=args.open_loop,
+                                        blocklist=blocklist)
+        for worker, part in enumerate(parts):
+            print(f"Worker {worker}: {part.summary()}")
+        if args.verify:
+            errors = verify_merge(stats, parts)
+            for error in errors:
+                print(f"Verification failed: {error}")
+            if not errors:
+                print(f"Verification passed: merged totals match {len(parts)} workers")
+    else:
+        stats = run_native_load(args.server, args.domain_file, port=args.port, qps=args.qps,
+                                concurrency=args.concurrency, duration=args.duration,
+                                sockets=args.sockets, timeout=args.timeout,
+                                open_loop=args.open_loop, blocklist=blocklist)
+    print(stats.summary())
+    if args.output:
+        save_stats(stats, args.output)
+        print(f"Load stats saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,38 @@
 import paramiko
 import time
-import subprocess
+import asyncio
 from datetime import datetime
 import os
 import sys
 import argparse
+import json
+
+from clock_sync import estimate_clock
+from dnsfw_emulator import Blocklist
+from dns_load import run_native_load, run_sharded_load, save_stats, wait_for_dns
+from net_sampler import start_remote_net_sampler
+from pid_sampler import start_remote_pid_sampler
+from proc_sampler import start_remote_proc_sampler
+from readiness import wait_for_drain, wait_for_samples
+from sar_stream import start_remote_sar
+from steady_state import record_run
+from ssh_session import LocalClient, SSHSession
+from tool_output import DnspyreParser, RequestLogMonitor, save_record, stream_command
+from workload import check_spec, prepare
+
+RESTART_COMMAND = 'systemctl restart named'
+
+# Load length and the bounds of what surrounds it: the readiness probes before
+# the load, the late replies it still waits for and the drain after it
+LOAD_SECONDS = 60
+DNS_TIMEOUT = 30.0
+SAMPLES_TIMEOUT = 15.0
+REPLY_TIMEOUT = 5.0
+DRAIN_TIMEOUT = 10.0
+
+def collector_seconds(load_seconds=LOAD_SECONDS):
+    """Seconds a collector must be able to run to cover the readiness lead, the load and the drain"""
+    return int(DNS_TIMEOUT + SAMPLES_TIMEOUT + load_seconds + REPLY_TIMEOUT + DRAIN_TIMEOUT)
 
 def parse_arguments():
     """Parse command line arguments"""
@@ -19,8 +47,29 @@ def parse_arguments():
     group.add_argument('--all-percents', action='store_true',
                       help='Run tests for all percentages (10-90 in steps of 10)')
     
-    parser.add_argument('--wait-time', type=int, default=10,
-                       help='Wait time in seconds between sequential tests (default: 10)')
+    parser.add_argument('--wait-time', type=int, default=0,
+                       help='Extra wait in seconds between sequential tests; readiness probes make it optional (default: 0)')
+    parser.add_argument('--engine', choices=['native', 'dnspyre'], default='native',
+                       help='Load generator to use (default: native)')
+    parser.add_argument('--workers', type=int, default=1,
+                       help='Native load worker processes, one per core (default: 1)')
+    parser.add_argument('--proc-interval', type=float, default=None,
+                       help='Also sample remote /proc at this interval in seconds (e.g. 0.05)')
+    parser.add_argument('--iface', default=None,
+                       help='Server network interface to sample NIC counters from (e.g. ens18)')
+    parser.add_argument('--xdp-map', action='append', default=[],
+                       help='XDP stats map read with bpftool on dnsfw_xdp runs (repeatable)')
+    parser.add_argument('--max-error-rate', type=float, default=None,
+                       help='Abort dnspyre runs whose failure rate exceeds this (e.g. 0.2); enables its request log')
+    parser.add_argument('--server', default='192.168.0.72',
+                       help='DNS server under test, also reached over SSH for the collectors (default: 192.168.0.72)')
+    parser.add_argument('--port', type=int, default=53, help='DNS server port (default: 53)')
+    parser.add_argument('--local', action='store_true',
+                       help='Collect server samples on this machine and skip the named restart (dnsfw_emulator.py)')
+    parser.add_argument('--blocklist', default=None,
+                       help='Blocked names (e.g. blackbook.txt.2) to break native replies down by source list')
+    parser.add_argument('--workload', default=None,
+                       help='Workload spec (JSON, see workload.py) for the qtype, EDNS and repeated-name mix')
     
     return parser.parse_args()
 
@@ -30,148 +79,243 @@ def get_process_pid(ssh, process_name):
     pid = stdout.read().decode().strip()
     return pid if pid else None
 
-def execute_local_command(command):
-    """Execute command on local machine with better encoding handling"""
+def get_process_pids(ssh, process_name):
+    """Get every PID matching a process name as a list of ints"""
+    pid = get_process_pid(ssh, process_name)
+    return [int(value) for value in pid.split()] if pid else []
+
+def execute_local_command(command, output_file=None, parser=None, monitor=None):
+    """Execute command on local machine, streaming its output to a file, a parser and an abort monitor"""
     try:
-        process = subprocess.Popen(
-            command,
-            shell=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            encoding='latin-1'
-        )
-        stdout, stderr = process.communicate()
-        if process.returncode != 0:
-            print(f"Error executing local command: {stderr}")
+        result = stream_command(command, output_file, parser, monitor)
+        if result.aborted:
+            print(f"Aborted local command: {result.aborted}")
+            return False
+        if result.status != 0:
+            print("Error executing local command: " + "\n".join(result.tail[-5:]))
             return False
         return True
     except Exception as e:
         print(f"Error executing local command: {e}")
         return False
 
-def parse_sar_file(results_dir, sar_filename, output_suffix):
-    """Execute SAR parser script on the downloaded file"""
-    try:
-        sar_input = os.path.join(results_dir, sar_filename)
-        sar_output = os.path.join(results_dir, f'sar_output_{output_suffix}.csv')
-        parser_cmd = f'python3 sar_parse.py {sar_input} -o {sar_output}'
-        
-        print("\nExecuting SAR parser...")
-        if execute_local_command(parser_cmd):
-            print(f"SAR parsing completed successfully. CSV output saved to {sar_output}")
-        else:
-            print("Failed to parse SAR output")
-    except Exception as e:
-        print(f"Error during SAR parsing: {e}")
+async def start_collectors(ssh, test_type, results_dir, file_suffix, proc_interval=None, iface=None, xdp_maps=(),
+                           clock=None, port=53):
+    """
+    Start every collector concurrently while probing named with a canary query
+
+    Returns the collectors once named answers and each of them has emitted its
+    first sample, so no load is sent before sampling has begun. They are sized
+    by collector_seconds() and stopped by finish_collectors() after the drain.
+    """
+    span = collector_seconds()
+
+    async def pid_sampler():
+        # Sample named and the XDP userspace daemon from /proc/<pid>
+        targets = {'named': await asyncio.to_thread(get_process_pids, ssh, 'named')}
+        if test_type == 'dnsfw_xdp':
+            targets['dnsfw'] = await asyncio.to_thread(get_process_pids, ssh, 'dnsfw')
+        print(f"Sampling processes: {targets}")
+        return await asyncio.to_thread(start_remote_pid_sampler, ssh, results_dir, file_suffix, targets,
+                                       interval=1.0, duration=span, clock=clock)
+
+    async def nothing():
+        return None
 
-def execute_ssh_commands(hostname, username, password, test_type, malicious_percent):
-    """Execute the SSH commands for a single test"""
+    print("Executing SAR command...")
+    if proc_interval:
+        print(f"Starting /proc sampler every {proc_interval * 1000:.0f}ms...")
+    if iface:
+        print(f"Sampling NIC counters on {iface}...")
+    waited, sar, proc, pid, net = await asyncio.gather(
+        wait_for_dns(ssh.hostname, port, timeout=DNS_TIMEOUT),
+        asyncio.to_thread(start_remote_sar, ssh, results_dir, file_suffix, count=span, clock=clock),
+        asyncio.to_thread(start_remote_proc_sampler, ssh, results_dir, file_suffix,
+                          interval=proc_interval, duration=span, clock=clock) if proc_interval else nothing(),
+        pid_sampler(),
+        asyncio.to_thread(start_remote_net_sampler, ssh, results_dir, file_suffix, iface,
+                          interval=1.0, duration=span,
+                          xdp_maps=xdp_maps if test_type == 'dnsfw_xdp' else (), clock=clock) if iface else nothing())
+    if waited is None:
+        raise RuntimeError(f"named on {ssh.hostname} did not answer the canary query")
+    print(f"named answering after {waited:.2f}s")
+    if not await wait_for_samples([sar, proc, pid, net], timeout=SAMPLES_TIMEOUT):
+        print("Warning: not every collector produced a sample before the load started")
+    return sar, proc, pid, net
+
+async def finish_collectors(ssh, collectors, timeout=10, port=53):
+    """
+    Wait for the server sockets to drain, then stop every collector
+
+    Each collector still writes the sample it is taking, so the drain is
+    covered; `timeout` bounds the wait for them to end.
+    """
+    drained = await wait_for_drain(ssh, port, timeout=DRAIN_TIMEOUT)
+    if drained is None:
+        print("Warning: server UDP queues still busy after the load")
+    collectors = [collector for collector in collectors if collector is not None]
+    for collector in collectors:
+        collector.stop()
+    await asyncio.gather(*(asyncio.to_thread(collector.join, timeout=timeout) for collector in collectors))
+
+def execute_ssh_commands(ssh, test_type, malicious_percent, engine='native', workers=1,
+                         proc_interval=None, iface=None, xdp_maps=(), results_dir=None, file_suffix=None, qps=0,
+                         max_error_rate=None, port=53, restart_command=RESTART_COMMAND, blocklist=None,
+                         workload=None):
+    """
+    Execute the SSH commands for a single test over an open SSHSession
+
+    The session's host is the DNS server under test, answering on `port`;
+    restart_command restarts the resolver before the run (None skips it).
+    blocklist (dnsfw_emulator.Blocklist) labels native queries as blocked or benign.
+    workload is a workload.py spec built from the domain file into the query
+    file of the run.
+
+    results_dir and file_suffix default to results_YYYYMMDD and
+    {test_type}_{malicious_percent}; qps limits the load rate (0 = unlimited).
+    With max_error_rate, dnspyre runs whose failure rate exceeds it (beyond
+    the names dnsfw_xdp is expected to drop) are stopped early.
+    Returns True only when the load ran and the SAR stream completed.
+    """
     try:
-        # Initialize SSH client
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        
-        print(f"Connecting to {hostname}...")
-        
-        # Connect to remote host
-        ssh.connect(
-            hostname=hostname,
-            username=username,
-            password=password,
-            timeout=10
-        )
-        
-        print("Successfully connected!")
-        
         # Create timestamp for file naming (only date)
         timestamp = datetime.now().strftime("%Y%m%d")
 
         # Create local directory for results if it doesn't exist
-        local_results_dir = f'results_{timestamp}'
+        local_results_dir = results_dir or f'results_{timestamp}'
         if not os.path.exists(local_results_dir):
             os.makedirs(local_results_dir)
 
-        # Create a new channel for interactive shell
-        channel = ssh.invoke_shell()
-        time.sleep(1)
-        
-        # Become root
-        print("Elevating to root privileges...")
-        channel.send('sudo su -\n')
-        time.sleep(2)
-        channel.send(password + '\n')
-        time.sleep(2)
-
-        # Restarting named
-        print("Restarting named...")
-        channel.send('systemctl restart named\n')
-        time.sleep(5)
+        # Restarting named as root on its own exec channel
+        if restart_command:
+            print("Restarting named...")
+            result = ssh.run(restart_command, sudo=True)
+            if result.status != 0:
+                print(f"Failed to restart named (exit status {result.status}): {result.stderr.strip()}")
+                return False
     
         # Create suffix for file names
-        file_suffix = f"{test_type}_{malicious_percent}"
-
-        # Execute SAR command in background - with unique filename
-        sar_output = f'/tmp/sar_output_{file_suffix}.txt'
-        print("Executing SAR command...")
-        channel.send(f'sar -u ALL -P ALL 1 -t 60 > {sar_output} &\n')
-        time.sleep(3)
-
-        # Start local dnspyre command
-        print("Starting local dnspyre command...throughput")
-        try:
-            dnspyre_cmd = f'dnspyre -d 60s -c 60000 --server 192.168.0.72 --request-delay="1ms" --separate-worker-connections @output/domain_{malicious_percent}.txt'
-            if not execute_local_command(dnspyre_cmd):
-                print("Failed to execute dnspyre command")
-        except Exception as e:
-            print(f"Error during dnspyre execution: {e}")
-
-        time.sleep(5)
-
-        # Move requests.log to directory
-        print("Moving requests.log latency to directory...")
-        try:
-            if not os.path.exists(local_results_dir):
-                os.makedirs(local_results_dir)
-            if not execute_local_command(f'mv requests_c_{file_suffix}.log {local_results_dir}/'):
-                print(f"Failed to move requests.log to {local_results_dir}")
-        except Exception as e:
-            print(f"Error moving requests.log: {e}")
-
-        time.sleep(1)  
-        
-        # Change permissions of output files
-        channel.send(f'chmod 644 {sar_output}\n')
-        time.sleep(1)
-        
-        # Use SCP to copy files from remote to local
-        print("\nCopying result files from remote host...")
-        
-        # Create SFTP client
-        sftp = ssh.open_sftp()
-        
-        # List of files to copy with new names including test type
-        remote_files = [
-            (sar_output, f'{local_results_dir}/sar_output_{file_suffix}.txt')
-        ]
-        
-        # Copy each file
-        for remote_path, local_path in remote_files:
+        file_suffix = file_suffix or f"{test_type}_{malicious_percent}"
+
+        # Queries of the run: the domain file as is, or the workload mix built from it
+        domain_file = f'output/domain_{malicious_percent}.txt'
+        tool_options = ''
+        if workload:
+            domain_file, tool_options = prepare(workload, domain_file, local_results_dir, file_suffix, engine)
+
+        # Put the server clock on this host's timeline, so sar and sampler rows get client epoch stamps
+        clock = estimate_clock(ssh)
+        print(f"Server clock offset {clock['offset'] * 1000:+.3f}ms (RTT {clock['rtt'] * 1000:.3f}ms)")
+
+        # Stream SAR and the samplers over exec channels straight into the results directory,
+        # starting the load only once named answers and every collector is sampling
+        collectors = asyncio.run(start_collectors(ssh, test_type, local_results_dir, file_suffix,
+                                                  proc_interval, iface, xdp_maps, clock, port))
+        sar_collector, proc_collector, pid_collector, net_collector = collectors
+
+        # Start local load generator
+        load_stats = None
+        load_ok = False
+        if engine == 'native':
+            print("Starting native load generator...throughput")
             try:
-                sftp.get(remote_path, local_path)
-                print(f"Successfully copied {remote_path} to {local_path}")
+                if workers > 1:
+                    load_stats, _ = run_sharded_load(ssh.hostname, domain_file, workers, port=port,
+                                                     qps=qps, duration=LOAD_SECONDS, concurrency=60000,
+                                                     blocklist=blocklist)
+                else:
+                    load_stats = run_native_load(ssh.hostname, domain_file, port=port,
+                                                 qps=qps, duration=LOAD_SECONDS, concurrency=60000,
+                                                 blocklist=blocklist)
+                print(load_stats.summary())
+                load_ok = True
             except Exception as e:
-                print(f"Error copying {remote_path}: {e}")
-        
-        # Close SFTP client
-        sftp.close()
-        
-        # Clean up remote temporary files
-        print("\nCleaning up remote temporary files...")
-        channel.send(f'rm -f {sar_output}\n')
-        
-        # Execute SAR parser on the downloaded file
-        parse_sar_file(local_results_dir, f'sar_output_{file_suffix}.txt', file_suffix)
+                print(f"Error during native load execution: {e}")
+        else:
+            print("Starting local dnspyre command...throughput")
+            try:
+                rate_limit = f' --rate-limit={qps}' if qps else ''
+                server = ssh.hostname if port == 53 else f'{ssh.hostname}:{port}'
+                request_log = f'requests_c_{file_suffix}.log'
+                log_requests = f' --log-requests --log-requests-path="{request_log}"' if max_error_rate is not None else ''
+                dnspyre_cmd = f'dnspyre -d {LOAD_SECONDS}s -c 60000 --server {server} --request-delay="1ms"{rate_limit}{log_requests} --separate-worker-connections{tool_options} @{domain_file}'
+                # Capture the summary next to the sar CSV; dnsfw_xdp drops the blocked share on purpose
+                dnspyre_parser = DnspyreParser()
+                monitor = None
+                if max_error_rate is not None:
+                    expected = malicious_percent / 100 if test_type == 'dnsfw_xdp' else 0.0
+                    monitor = RequestLogMonitor(request_log, max_error_rate, expected=expected)
+                load_ok = execute_local_command(dnspyre_cmd, f'{local_results_dir}/dnspyre_{file_suffix}.txt',
+                                                dnspyre_parser, monitor)
+                record = save_record(f'{local_results_dir}/dnspyre_{file_suffix}.json', dnspyre_cmd,
+                                     load_ok, dnspyre_parser, monitor)
+                summary = record['summary']
+                print(f"dnspyre: {summary.get('total_requests', 0)} requests  {summary.get('qps', 0)} QPS  "
+                      f"error rate {summary.get('error_rate')}")
+                if not load_ok:
+                    print("Failed to execute dnspyre command")
+            except Exception as e:
+                print(f"Error during dnspyre execution: {e}")
+
+        if os.path.exists(f'requests_c_{file_suffix}.log'):
+            # Move requests.log to directory
+            print("Moving requests.log latency to directory...")
+            try:
+                if not execute_local_command(f'mv requests_c_{file_suffix}.log {local_results_dir}/'):
+                    print(f"Failed to move requests.log to {local_results_dir}")
+            except Exception as e:
+                print(f"Error moving requests.log: {e}")
+
+        # Wait for the server to drain and the SAR stream and samplers to finish
+        print("\nWaiting for SAR output...")
+        asyncio.run(finish_collectors(ssh, collectors, port=port))
+        sar_ok = sar_collector.join(timeout=0)
+        if sar_ok:
+            print(f"SAR streaming completed. CSV output saved to {sar_collector.csv_file}")
+        else:
+            print("Failed to stream SAR output")
+        if proc_collector is not None:
+            if proc_collector.join(timeout=0):
+                print(f"/proc sampling completed. CSV output saved to {proc_collector.csv_file}")
+            else:
+                print("Failed to sample /proc")
+        if not pid_collector.join(timeout=0):
+            print("Failed to sample processes")
+        for name, process in pid_collector.summary.items():
+            print(f"{name} {process['pids']}: cpu {process['cpu_mean']}% (usr {process['usr_mean']}% "
+                  f"sys {process['sys_mean']}%)  rss {process['rss_kb_max']} kB  threads {process['threads_max']}  "
+                  f"cswch/s {process['cswch_per_s']}  nvcswch/s {process['nvcswch_per_s']}")
+
+        run_results = {'processes': pid_collector.summary, 'clock': clock,
+                       'sar_date': '%04d-%02d-%02d' % sar_collector.date if sar_collector.date else None}
+        if net_collector is not None:
+            if not net_collector.join(timeout=0):
+                print("Failed to sample NIC counters")
+            network = net_collector.summary(sar_collector.csv_file)
+            print(f"NIC: in {network.get('rx_packets/s', 0)} pps  out {network.get('tx_packets/s', 0)} pps  "
+                  f"dropped {network.get('rx_dropped/s', 0)} pps  XDP drop {network.get('xdp_drop/s', 0)} pps  "
+                  f"packets per CPU-second {network.get('packets_per_cpu_second')}")
+            run_results['network'] = network
+
+        # Join the process and network samples into the per-run results
+        if load_stats is not None:
+            save_stats(load_stats, f'{local_results_dir}/load_{file_suffix}.json', extra=run_results)
+        else:
+            with open(f'{local_results_dir}/process_{file_suffix}.json', 'w') as f:
+                json.dump(run_results, f, indent=2)
+        if sar_ok:
+            # Trim warm-up and cool-down; the window is stored as 'steady_state' in the results JSON
+            steady = record_run(local_results_dir, file_suffix)
+            if steady is None:
+                print("No steady state found; statistics use the whole run")
+            else:
+                print(f"Steady state: warm-up {steady['warmup_seconds']:g}s, cool-down {steady['cooldown_seconds']:g}s, "
+                      f"busy {steady['summary']['busy']}%")
         
+        if not (load_ok and sar_ok):
+            print(f"\nTest {file_suffix} did not complete; partial results are in '{local_results_dir}'")
+            return False
+
         print("\nAll commands executed successfully!")
         print(f"Results have been saved in the '{local_results_dir}' directory")
         
@@ -186,29 +330,29 @@ def execute_ssh_commands(hostname, username, password, test_type, malicious_perc
     except Exception as e:
         print(f"An error occurred: {e}")
         return False
-    finally:
-        try:
-            ssh.close()
-            print("SSH connection closed.")
-        except:
-            pass
-
-def run_single_test(test_type, percent, hostname, username, password):
+
+def run_single_test(test_type, percent, session, engine='native', workers=1,
+                    proc_interval=None, iface=None, xdp_maps=(), max_error_rate=None, port=53,
+                    restart_command=RESTART_COMMAND, blocklist=None, workload=None):
     """Run a test with a specific percentage"""
     print(f"\n{'='*60}")
     print(f"Starting test for {test_type} with {percent}% malicious domains")
     print(f"Start time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print('='*60)
     
-    success = execute_ssh_commands(hostname, username, password, test_type, percent)
+    success = execute_ssh_commands(session, test_type, percent, engine, workers,
+                                   proc_interval, iface, xdp_maps, max_error_rate=max_error_rate, port=port,
+                                   restart_command=restart_command, blocklist=blocklist, workload=workload)
     
     print(f"\nCompleted test for {test_type} with {percent}% malicious domains")
     print(f"End time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     
     return success
 
-def run_all_tests(test_type, hostname, username, password, wait_time):
-    """Run tests for all percentages from 10 to 90"""
+def run_all_tests(test_type, session, wait_time, engine='native', workers=1,
+                  proc_interval=None, iface=None, xdp_maps=(), max_error_rate=None, port=53,
+                  restart_command=RESTART_COMMAND, blocklist=None, workload=None):
+    """Run tests for all percentages from 10 to 90 over one SSH session"""
     percentages = list(range(10, 100, 10))  # 10, 20, 30, ..., 90
     
     print(f"\nStarting test sequence for {test_type}")
@@ -219,14 +363,16 @@ def run_all_tests(test_type, hostname, username, password, wait_time):
     failed_tests = []
     
     for percent in percentages:
-        if run_single_test(test_type, percent, hostname, username, password):
+        if run_single_test(test_type, percent, session, engine, workers,
+                           proc_interval, iface, xdp_maps, max_error_rate, port, restart_command,
+                           blocklist, workload):
             successful_tests += 1
             print(f"\nSuccessfully completed {successful_tests}/{len(percentages)} tests")
         else:
             failed_tests.append(percent)
         
-        # Wait a bit between tests to ensure all processes are properly closed
-        if percent != percentages[-1]:  # Don't wait after the last test
+        # The next test waits for named and the collectors itself; any extra pause is optional
+        if wait_time and percent != percentages[-1]:  # Don't wait after the last test
             print(f"\nWaiting {wait_time} seconds before starting next test...")
             time.sleep(wait_time)
     
@@ -234,6 +380,7 @@ def run_all_tests(test_type, hostname, username, password, wait_time):
     print("Test sequence completed!")
     print(f"Overall end time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print(f"Successful tests: {successful_tests}/{len(percentages)}")
+    print(f"SSH connections opened: {session.connects}")
     if failed_tests:
         print(f"Failed tests for percentages: {failed_tests}")
     print('='*60)
@@ -244,15 +391,28 @@ if __name__ == "__main__":
     args = parse_arguments()
     
     # Connection parameters
-    hostname = "192.168.0.72" # DNS Server
+    hostname = args.server # DNS Server
     username = "user"
     password = "pass"
+    restart_command = None if args.local else RESTART_COMMAND
+    error = check_spec(args.workload, args.engine) if args.workload else None
+    if error:
+        print(f"Error: workload {args.workload}: {error}")
+        sys.exit(1)
+    blocklist = Blocklist.from_file(args.blocklist) if args.blocklist else None
     
-    if args.all_percents:
-        # Run tests for all percentages
-        success = run_all_tests(args.test_type, hostname, username, password, args.wait_time)
-        sys.exit(0 if success else 1)
-    else:
-        # Run a single test with the specified percentage
-        success = run_single_test(args.test_type, args.percent, hostname, username, password)
-        sys.exit(0 if success else 1)
\ No newline at end of file
+    # Authenticate once; every test reuses the session and reconnects if it drops
+    with SSHSession(hostname, username, password,
+                    client_factory=LocalClient if args.local else None) as session:
+        if args.all_percents:
+            # Run tests for all percentages
+            success = run_all_tests(args.test_type, session, args.wait_time, args.engine, args.workers,
+                                    args.proc_interval, args.iface, args.xdp_map, args.max_error_rate,
+                                    args.port, restart_command, blocklist, args.workload)
+        else:
+            # Run a single test with the specified percentage
+            success = run_single_test(args.test_type, args.percent, session, args.engine, args.workers,
+                                      args.proc_interval, args.iface, args.xdp_map, args.max_error_rate,
+                                      args.port, restart_command, blocklist, args.workload)
+    print("SSH connection closed.")
+    sys.exit(0 if success else 1)
\ No newline at end of file
@@ -0,0 +1,63 @@
+import struct
+
+# DNS header: id, flags, qdcount, ancount, nscount, arcount
+HEADER = struct.Struct('!HHHHHH')
+QUESTION_TAIL = struct.Struct('!HH')
+FLAG_RD = 0x0100
+QCLASS_IN = 1
+# EDNS0 OPT pseudo-RR: root name, type 41, UDP payload size as class, flags in the TTL, no options
+OPT_RR = struct.Struct('!BHHIH')
+QTYPE_OPT = 41
+FLAG_DO = 0x8000
+EDNS_BUFSIZE = 1232
+
+QTYPES = {
+    'A': 1, 'NS': 2, 'CNAME': 5, 'SOA': 6, 'PTR': 12, 'MX': 15, 'TXT': 16,
+    'AAAA': 28, 'SRV': 33, 'NAPTR': 35, 'DS': 43, 'RRSIG': 46, 'DNSKEY': 48,
+    'SVCB': 64, 'HTTPS': 65, 'CAA': 257, 'ANY': 255,
+}
+QTYPE_A = QTYPES['A']
+
+
+def parse_qtype(text):
+    """Convert a qtype mnemonic (A, AAAA, TYPE65...) to its numeric code"""
+    text = text.upper()
+    if text in QTYPES:
+        return QTYPES[text]
+    if text.startswith('TYPE') and text[4:].isdigit():
+        return int(text[4:])
+    raise ValueError(f"Unknown query type: {text}")
+
+
+def encode_name(name):
+    """Encode a domain name in DNS wire format"""
+    wire = bytearray()
+    for label in name.rstrip('.').split('.'):
+        if label:
+            data = label.encode('idna')
+            wire.append(len(data))
+            wire += data
+    wire.append(0)
+    return bytes(wire)
+
+
+def qtype_name(qtype):
+    """Mnemonic of a numeric qtype (TYPEnnn for codes without one)"""
+    for text, code in QTYPES.items():
+        if code == qtype:
+            return text
+    return f"TYPE{qtype}"
+
+
+def build_query(name, query_id, qtype=QTYPE_A, bufsize=0, dnssec=False):
+    """
+    Build a DNS query packet for a single name
+
+    A non-zero bufsize adds an EDNS0 OPT record advertising that UDP payload
+    size; dnssec also sets its DO bit.
+    """
+    packet = encode_name(name) + QUESTION_TAIL.pack(qtype, QCLASS_IN)
+    if not bufsize:
+        return HEADER.pack(query_id, FLAG_RD, 1, 0, 0, 0) + packet
+    return (HEADER.pack(query_id, FLAG_RD, 1, 0, 0, 1) + packet
+            + OPT_RR.pack(0, QTYPE_OPT, bufsize, FLAG_DO if dnssec else 0, 0))
@@ -0,0 +1,298 @@
+import json
+import time
+import socket
+import signal
+import struct
+import asyncio
+import argparse
+import multiprocessing
+
+from dns_wire import HEADER
+
+MODES = ['dnsfw_no', 'dnsfw_rpz', 'dnsfw_xdp']
+COUNTERS = ['queries', 'answered', 'blocked', 'dropped', 'malformed']
+FLAG_QR = 0x8000
+FLAG_RD = 0x0100
+FLAG_RA = 0x0080
+RCODE_NXDOMAIN = 3
+QTYPE_A_WIRE = b'\x00\x01'
+# Answer RR for an A question: name pointer to the question (0xC00C), type, class, TTL, rdlength, address
+ANSWER_A = struct.Struct('!HHHIH4s')
+
+
+def normalize_name(name):
+    """Lowercase dotted name without the trailing dot, as bytes"""
+    if isinstance(name, str):
+        name = name.encode('idna')
+    return name.strip().rstrip(b'.').lower()
+
+
+class Blocklist:
+    """
+    Set of blocked names with RPZ-style wildcards
+
+    A name is blocked when it is listed itself, or when one of its parent
+    domains is listed as '*.parent'. Names are bytes, so lookups work directly
+    on the labels taken from the query buffer.
+    """
+
+    def __init__(self, names=(), wildcards=()):
+        self.names = set(normalize_name(name) for name in names)
+        self.wildcards = set(normalize_name(name) for name in wildcards)
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Load a domain list (one name per line) or an RPZ zone file
+
+        Comments (';', '#'), directives ('$ORIGIN', '$TTL'), the apex ('@') and
+        SOA/NS records are skipped; the owner name of every other line is taken.
+        """
+        blocklist = cls()
+        with open(path, 'rb') as f:
+            for line in f:
+                fields = line.split()
+                if not fields or fields[0][:1] in (b';', b'#', b'$', b'@'):
+                    continue
+                if b'SOA' in fields[1:] or b'NS' in fields[1:]:
+                    continue
+                name = normalize_name(fields[0])
+                if name.startswith(b'*.'):
+                    blocklist.wildcards.add(name[2:])
+                elif name:
+                    blocklist.names.add(name)
+        return blocklist
+
+    def __len__(self):
+        return len(self.names) + len(self.wildcards)
+
+    def __contains__(self, name):
+        if name in self.names:
+            return True
+        if self.wildcards:
+            dot = name.find(b'.')
+            while dot >= 0:
+                name = name[dot + 1:]
+                if name in self.wildcards:
+                    return True
+                dot = name.find(b'.')
+        return False
+
+
+def parse_question(data):
+    """
+    Question of a query buffer as (lowercased dotted name, end offset of the question)
+
+    Returns None for truncated packets and compressed question names.
+    """
+    labels = []
+    offset = HEADER.size
+    size = len(data)
+    while offset < size:
+        length = data[offset]
+        if length == 0:
+            offset += 5
+            return (b'.'.join(labels).lower(), offset) if offset <= size else None
+        if length & 0xC0:
+            return None
+        labels.append(data[offset + 1:offset + 1 + length])
+        offset += 1 + length
+    return None
+
+
+def spin(seconds):
+    """Burn CPU for the given time, like a policy lookup would (sleeping would not cost CPU)"""
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+class _Responder(asyncio.DatagramProtocol):
+    """
+    Answers queries the way the resolver does in one test_type mode
+
+    dnsfw_no answers every A query with the configured address (other types
+    get an empty NOERROR); dnsfw_rpz answers blocked names with NXDOMAIN and
+    spends `cost` seconds of CPU on every lookup; dnsfw_xdp drops blocked
+    names without a reply.
+    """
+
+    def __init__(self, mode, blocklist, cost=0.0, address='192.0.2.1', ttl=300):
+        self.mode = mode
+        self.blocklist = blocklist
+        self.cost = cost if mode == 'dnsfw_rpz' else 0.0
+        self.answer = ANSWER_A.pack(0xC00C, 1, 1, ttl, 4, socket.inet_aton(address))
+        self.counts = [0] * len(COUNTERS)
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        counts = self.counts
+        counts[0] += 1
+        question = parse_question(data) if len(data) > HEADER.size and not data[2] & 0x80 else None
+        if question is None:
+            counts[4] += 1
+            return
+        name, end = question
+        if self.cost:
+            spin(self.cost)
+        blocked = self.mode != 'dnsfw_no' and name in self.blocklist
+        if blocked and self.mode == 'dnsfw_xdp':
+            counts[3] += 1
+            return
+        query_id, flags = struct.unpack_from('!HH', data)
+        flags = FLAG_QR | FLAG_RA | (flags & FLAG_RD)
+        if blocked:
+            counts[2] += 1
+            reply = HEADER.pack(query_id, flags | RCODE_NXDOMAIN, 1, 0, 0, 0) + data[HEADER.size:end]
+        elif data[end - 4:end - 2] == QTYPE_A_WIRE:
+            counts[1] += 1
+            reply = HEADER.pack(query_id, flags, 1, 1, 0, 0) + data[HEADER.size:end] + self.answer
+        else:
+            counts[1] += 1
+            reply = HEADER.pack(query_id, flags, 1, 0, 0, 0) + data[HEADER.size:end]
+        self.transport.sendto(reply, addr)
+
+
+def _open_socket(host, port):
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_DGRAM)
+    # Every worker binds the same port; the kernel spreads flows across them
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 8 * 1024 * 1024)
+    sock.bind((host, port))
+    return sock
+
+
+async def _serve(worker, host, port, mode, blocklist, options, counters, ready):
+    loop = asyncio.get_running_loop()
+    transport, responder = await loop.create_datagram_endpoint(
+        lambda: _Responder(mode, blocklist, **options), sock=_open_socket(host, port))
+    stop = asyncio.Event()
+    loop.add_signal_handler(signal.SIGTERM, stop.set)
+    base = worker * len(COUNTERS)
+    ready.release()
+    try:
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), 1.0)
+            except asyncio.TimeoutError:
+                pass
+            # Publish once a second instead of touching shared memory per packet
+            counters[base:base + len(COUNTERS)] = responder.counts
+    finally:
+        counters[base:base + len(COUNTERS)] = responder.counts
+        transport.close()
+
+
+def _run_worker(worker, host, port, mode, blocklist, options, counters, ready):
+    # The parent stops the workers with SIGTERM; Ctrl-C is handled there
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_serve(worker, host, port, mode, blocklist, options, counters, ready))
+
+
+def _terminate(signum, frame):
+    raise KeyboardInterrupt
+
+
+def totals(counters, workers):
+    """Sum of the per-worker counters as a dict"""
+    return {name: sum(counters[worker * len(COUNTERS) + index] for worker in range(workers))
+            for index, name in enumerate(COUNTERS)}
+
+
+def serve(host, port, mode, blocklist, workers=1, cost=0.0, address='192.0.2.1', ttl=300,
+          stats_interval=0, duration=0):
+    """
+    Run the emulator in worker processes sharing the port until interrupted
+
+    Args:
+    host, port: Listen address
+    mode (str): dnsfw_no, dnsfw_rpz or dnsfw_xdp
+    blocklist (Blocklist): Names blocked in the rpz and xdp modes
+    workers (int): Processes, each with its own event loop and SO_REUSEPORT socket
+    cost (float): CPU seconds spent per lookup in dnsfw_rpz mode
+    stats_interval (float): Print the counters this often (0 = only at the end)
+    duration (float): Stop after this many seconds (0 = until Ctrl-C or SIGTERM)
+
+    Returns the counter totals.
+    """
+    counters = multiprocessing.Array('Q', workers * len(COUNTERS), lock=False)
+    ready = multiprocessing.Semaphore(0)
+    options = {'cost': cost, 'address': address, 'ttl': ttl}
+    processes = [multiprocessing.Process(target=_run_worker, daemon=True,
+                                         args=(worker, host, port, mode, blocklist, options, counters, ready))
+                 for worker in range(workers)]
+    for process in processes:
+        process.start()
+    previous_handler = signal.signal(signal.SIGTERM, _terminate)
+    start = time.monotonic()
+    try:
+        for process in processes:
+            while not ready.acquire(timeout=0.5):
+                if not all(process.is_alive() for process in processes):
+                    raise RuntimeError(f"a worker failed to bind {host}:{port}")
+        print(f"{mode} emulator listening on {host}:{port} with {workers} workers "
+              f"({len(blocklist)} blocked names)", flush=True)
+        last, last_time = totals(counters, workers), time.monotonic()
+        tick = stats_interval or 0.5
+        deadline = start + duration if duration else None
+        while deadline is None or time.monotonic() < deadline:
+            time.sleep(max(0.0, min(tick, deadline - time.monotonic())) if deadline else tick)
+            if stats_interval:
+                current, now = totals(counters, workers), time.monotonic()
+                print(f"{(current['queries'] - last['queries']) / (now - last_time):.0f} qps  "
+                      + '  '.join(f"{name} {current[name]}" for name in COUNTERS), flush=True)
+                last, last_time = current, now
+    except KeyboardInterrupt:
+        pass
+    finally:
+        signal.signal(signal.SIGTERM, previous_handler)
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join(timeout=5)
+    return totals(counters, workers)
+
+
+def parse_listen(text):
+    """'HOST:PORT' (or '[v6]:PORT') to (host, port)"""
+    host, _, port = text.rpartition(':')
+    return host.strip('[]') or '127.0.0.1', int(port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local DNS firewall emulator for the dnsfw_* test modes')
+    parser.add_argument('mode', choices=MODES, help='Resolver behaviour to emulate')
+    parser.add_argument('--blocklist', help='Blocked names: domain list or RPZ zone (required for rpz/xdp)')
+    parser.add_argument('--listen', default='127.0.0.1:5353', help='HOST:PORT to answer on (default: 127.0.0.1:5353)')
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help='Worker processes sharing the port with SO_REUSEPORT (default: 1)')
+    parser.add_argument('--lookup-cost-us', type=float, default=0.0,
+                        help='CPU microseconds spent per lookup in dnsfw_rpz mode (default: 0)')
+    parser.add_argument('--address', default='192.0.2.1', help='Address returned for A queries (default: 192.0.2.1)')
+    parser.add_argument('--ttl', type=int, default=300, help='TTL of the answers (default: 300)')
+    parser.add_argument('--stats-interval', type=float, default=0, help='Print counters every N seconds')
+    parser.add_argument('-d', '--duration', type=float, default=0, help='Stop after N seconds (default: run until Ctrl-C)')
+    parser.add_argument('-o', '--output', help='Save the final counters as JSON')
+    args = parser.parse_args()
+
+    if args.mode != 'dnsfw_no' and not args.blocklist:
+        parser.error(f'--blocklist is required for {args.mode}')
+    blocklist = Blocklist.from_file(args.blocklist) if args.blocklist else Blocklist()
+    host, port = parse_listen(args.listen)
+    counts = serve(host, port, args.mode, blocklist, args.workers, args.lookup_cost_us / 1e6,
+                   args.address, args.ttl, args.stats_interval, args.duration)
+    print(json.dumps(counts))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(dict(counts, mode=args.mode, workers=args.workers,
+                           lookup_cost_us=args.lookup_cost_us), f, indent=2)
+        print(f"Counters saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+import re
+import struct
+import zlib
+import argparse
+from array import array
+
+MAGIC = b'DNSH'
+FILE_HEADER = struct.Struct('!4sBBBQQQ')
+VERSION = 1
+
+# dnspyre --log-requests: "... rcode:[NOERROR] ... duration:[1.234567ms]"
+DURATION_PATTERN = re.compile(r'duration:\[?\s*([0-9.]+)\s*(ns|us|µs|ms|s|m)\]?')
+DURATION_UNITS = {'ns': 1e-9, 'us': 1e-6, 'µs': 1e-6, 'ms': 1e-3, 's': 1.0, 'm': 60.0}
+
+
+class LatencyHistogram:
+    """
+    Fixed-memory log-bucketed latency histogram (HDR style)
+
+    Values are stored in microseconds. Each power-of-two range is split into
+    2^SUB_BITS linear sub-buckets, so recorded values keep a relative
+    precision better than 1/2^SUB_BITS (under 1% with the default of 7 bits)
+    from 1us up to MAX_BITS (about 268 seconds). Recording is O(1) and two
+    histograms merge by adding their counts. Minimum and maximum are kept
+    exactly.
+    """
+
+    SUB_BITS = 7
+    MAX_BITS = 28
+
+    def __init__(self, sub_bits=SUB_BITS, max_bits=MAX_BITS):
+        self.sub_bits = sub_bits
+        self.max_bits = max_bits
+        self.sub_count = 1 << sub_bits
+        size = 2 * self.sub_count + (max_bits - sub_bits - 1) * self.sub_count
+        self.counts = array('Q', bytes(8 * size))
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    def _index(self, micros):
+        if micros < 2 * self.sub_count:
+            return micros
+        shift = micros.bit_length() - self.sub_bits - 1
+        if shift > self.max_bits - self.sub_bits - 1:
+            return len(self.counts) - 1
+        return self.sub_count * shift + (micros >> shift)
+
+    def _highest(self, index):
+        """Largest value in microseconds that falls in bucket `index`"""
+        if index < 2 * self.sub_count:
+            return index
+        shift = index // self.sub_count - 1
+        mantissa = index - self.sub_count * shift
+        return ((mantissa + 1) << shift) - 1
+
+    def record(self, seconds):
+        """Record one latency given in seconds"""
+        self.record_micros(int(seconds * 1000000))
+
+    def record_micros(self, micros, count=1):
+        """Record `count` occurrences of a latency given in microseconds"""
+        if micros < 0:
+            micros = 0
+        self.counts[self._index(micros)] += count
+        if not self.total or micros < self.min:
+            self.min = micros
+        if micros > self.max:
+            self.max = micros
+        self.total += count
+
+    def merge(self, other):
+        """Add the counts of another histogram into this one"""
+        if (other.sub_bits, other.max_bits) != (self.sub_bits, self.max_bits):
+            raise ValueError("Cannot merge histograms with different bucket layouts")
+        counts = self.counts
+        for index, count in enumerate(other.counts):
+            if count:
+                counts[index] += count
+        if other.total:
+            if not self.total or other.min < self.min:
+                self.min = other.min
+            self.max = max(self.max, other.max)
+        self.total += other.total
+        return self
+
+    def percentile(self, percent):
+        """Return the latency in seconds at the given percentile"""
+        if not self.total:
+            return 0.0
+        target = max(1, int(self.total * percent / 100.0 + 0.5))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(max(self._highest(index), self.min), self.max) / 1000000.0
+        return self.max / 1000000.0
+
+    def percentiles(self, percents=(50, 90, 99, 99.9)):
+        """Return a dict of percentile -> seconds, plus the exact max"""
+        result = {f'p{p:g}': self.percentile(p) for p in percents}
+        result['max'] = self.max / 1000000.0
+        return result
+
+    def summary(self):
+        values = self.percentiles()
+        text = '  '.join(f"{name}: {value * 1000:.3f}ms" for name, value in values.items())
+        return f"Samples: {self.total}  {text}"
+
+    def to_bytes(self):
+        """Serialize to a compact binary form"""
+        header = FILE_HEADER.pack(MAGIC, VERSION, self.sub_bits, self.max_bits,
+                                  self.total, self.min, self.max)
+        return header + zlib.compress(self.counts.tobytes())
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, version, sub_bits, max_bits, total, minimum, maximum = FILE_HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a latency histogram file")
+        histogram = cls(sub_bits, max_bits)
+        counts = array('Q')
+        counts.frombytes(zlib.decompress(data[FILE_HEADER.size:]))
+        if len(counts) != len(histogram.counts):
+            raise ValueError("Histogram file has an unexpected bucket count")
+        histogram.counts = counts
+        histogram.total = total
+        histogram.min = minimum
+        histogram.max = maximum
+        return histogram
+
+    def save(self, output_file):
+        with open(output_file, 'wb') as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, input_file):
+        with open(input_file, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+
+def import_request_log(input_file, histogram=None):
+    """
+    Feed the durations of a dnspyre --log-requests file into a histogram
+
+    Args:
+    input_file (str): Path to a requests_l_*.log or requests_c_*.log file
+    histogram (LatencyHistogram): Histogram to add to, a new one if omitted
+    """
+    if histogram is None:
+        histogram = LatencyHistogram()
+    with open(input_file, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            match = DURATION_PATTERN.search(line)
+            if match:
+                histogram.record(float(match.group(1)) * DURATION_UNITS[match.group(2)])
+    return histogram
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build, merge and inspect latency histograms')
+    parser.add_argument('inputs', nargs='+',
+                        help='Histogram files (.hdr) or dnspyre request logs (.log)')
+    parser.add_argument('-o', '--output', help='Save the merged histogram to this file')
+    args = parser.parse_args()
+
+    merged = LatencyHistogram()
+    for input_file in args.inputs:
+        if input_file.endswith('.log'):
+            histogram = import_request_log(input_file)
+        else:
+            histogram = LatencyHistogram.load(input_file)
+        print(f"{input_file}: {histogram.summary()}")
+        merged.merge(histogram)
+
+    if len(args.inputs) > 1:
+        print(f"Merged: {merged.summary()}")
+    if args.output:
+        merged.save(args.output)
+        print(f"Histogram saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import os
+import argparse
+
+from latency_hist import LatencyHistogram
+
+TEST_TYPES = ['dnsfw_no', 'dnsfw_rpz', 'dnsfw_xdp']
+PERCENTS = (50, 90, 99, 99.9)
+
+
+def load_histograms(results_dir, test_type, prefix='latency_l'):
+    """
+    Load the uncorrected and corrected latency histograms of one test type
+
+    Returns (uncorrected, corrected); either is None when its file is missing.
+    """
+    base_name = os.path.join(results_dir, f'{prefix}_{test_type}')
+    histograms = []
+    for path in (f'{base_name}.hdr', f'{base_name}_corrected.hdr'):
+        histograms.append(LatencyHistogram.load(path) if os.path.exists(path) else None)
+    return tuple(histograms)
+
+
+def format_row(label, histogram):
+    if histogram is None:
+        return f"{label:<12}" + ''.join(f"{'-':>11}" for _ in range(len(PERCENTS) + 1))
+    values = histogram.percentiles(PERCENTS)
+    return f"{label:<12}" + ''.join(f"{value * 1000:>9.3f}ms" for value in values.values())
+
+
+def print_report(results_dir, prefix='latency_l'):
+    """Print corrected and uncorrected percentiles side by side for each test type"""
+    header = f"{'':<12}" + ''.join(f"{f'p{p:g}':>11}" for p in PERCENTS) + f"{'max':>11}"
+    for test_type in TEST_TYPES:
+        uncorrected, corrected = load_histograms(results_dir, test_type, prefix)
+        if uncorrected is None and corrected is None:
+            continue
+        print(f"\n{test_type}")
+        print(header)
+        print(format_row('uncorrected', uncorrected))
+        print(format_row('corrected', corrected))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compare corrected and uncorrected latency percentiles per test type')
+    parser.add_argument('results_dir', help='Results directory (e.g. results_20250416)')
+    parser.add_argument('--prefix', default='latency_l',
+                        help='Histogram file prefix (default: latency_l)')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.results_dir):
+        print(f"Error: Results directory '{args.results_dir}' does not exist")
+        return
+    print_report(args.results_dir, args.prefix)
+
+
+if __name__ == "__main__":
+    main()
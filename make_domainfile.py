@@ -0,0 +1,186 @@
+import os
+import sys
+import json
+import mmap
+import time
+import argparse
+
+import numpy as np
+
+from response_class import label_index_path
+
+MALICIOUS_FILE = 'blackbook.txt.2'
+BENIGN_FILE = 'benign_domains.txt'
+DISTRIBUTIONS = ['uniform', 'zipf']
+CHUNK = 65536
+
+
+class LineIndex:
+    """
+    Memory-mapped list of names with the offsets of every usable line
+
+    The file is never read into Python objects: newline positions are found
+    with NumPy on the mapping, blank lines and '#' comments are skipped and
+    names are sliced out only when written.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                raise ValueError(f"{path} is empty")
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        data = np.frombuffer(self.map, dtype=np.uint8)
+        newlines = np.flatnonzero(data == ord('\n'))
+        starts = np.concatenate(([0], newlines + 1))
+        ends = np.concatenate((newlines, [len(data)]))
+        # Drop the '\r' of CRLF files
+        crlf = (ends > starts) & (data[np.maximum(ends - 1, 0)] == ord('\r'))
+        ends = ends - crlf
+        keep = ends > starts
+        keep[keep] &= data[starts[keep]] != ord('#')
+        self.starts = starts[keep]
+        self.ends = ends[keep]
+        del data
+
+    def __len__(self):
+        return len(self.starts)
+
+    def names(self, indexes):
+        """The names at the given line indexes, as bytes"""
+        view = self.map
+        starts = self.starts[indexes].tolist()
+        ends = self.ends[indexes].tolist()
+        return [view[start:end].strip() for start, end in zip(starts, ends)]
+
+    def close(self):
+        self.starts = self.ends = None
+        self.map.close()
+
+
+def spread_labels(count, malicious, group, rng):
+    """
+    Exactly `malicious` ones among `count` labels, evenly spread
+
+    Every run of `group` labels holds its share of malicious names (the
+    original groups of 10), shuffled inside the group so the position of
+    the malicious names is not predictable.
+    """
+    index = np.arange(count, dtype=np.int64)
+    labels = ((index + 1) * malicious // count - index * malicious // count).astype(np.uint8)
+    full = count // group * group
+    if full:
+        labels[:full] = rng.permuted(labels[:full].reshape(-1, group), axis=1).reshape(-1)
+    if full < count:
+        labels[full:] = rng.permutation(labels[full:])
+    return labels
+
+
+def pick(size, count, distribution, rng, zipf_s=1.0):
+    """
+    Line indexes of `count` names drawn from a list of `size`
+
+    uniform draws without replacement while the list is large enough (every
+    name unique, cache busting) and with replacement beyond; zipf ranks the
+    list in a seeded random order and draws rank r with weight 1/r^s, so a
+    few names repeat often like real popularity.
+    """
+    if distribution == 'uniform':
+        if count <= size:
+            return rng.choice(size, count, replace=False)
+        return rng.integers(0, size, count)
+    ranking = rng.permutation(size)
+    weights = 1.0 / np.arange(1, size + 1, dtype=np.float64) ** zipf_s
+    cdf = np.cumsum(weights)
+    cdf /= cdf[-1]
+    ranks = np.minimum(np.searchsorted(cdf, rng.random(count), side='right'), size - 1)
+    return ranking[ranks]
+
+
+def write_workload(output_file, label_file, malicious, benign, count, percent, group=10,
+                   distribution='uniform', zipf_s=1.0, seed=0):
+    """
+    Write one domain file and its label index (one byte per name: 1 blocked, 0 benign)
+
+    The random stream depends only on the seed and the percentage, so each
+    file is reproducible on its own. Returns the number of malicious names.
+    """
+    rng = np.random.default_rng([seed, percent])
+    malicious_count = count * percent // 100
+    labels = spread_labels(count, malicious_count, group, rng)
+    order = {1: pick(len(malicious), malicious_count, distribution, rng, zipf_s),
+             0: pick(len(benign), count - malicious_count, distribution, rng, zipf_s)}
+    sources = {1: malicious, 0: benign}
+    # Position of each name within its own source's draw
+    position = np.empty(count, dtype=np.int64)
+    for label in (0, 1):
+        selected = labels == label
+        position[selected] = np.arange(int(selected.sum()))
+
+    with open(output_file, 'wb') as f:
+        for start in range(0, count, CHUNK):
+            chunk_labels = labels[start:start + CHUNK]
+            chunk_position = position[start:start + CHUNK]
+            names = [None] * len(chunk_labels)
+            for label in (0, 1):
+                selected = np.flatnonzero(chunk_labels == label)
+                if len(selected):
+                    drawn = sources[label].names(order[label][chunk_position[selected]])
+                    for slot, name in zip(selected.tolist(), drawn):
+                        names[slot] = name
+            f.write(b'\n'.join(names) + b'\n')
+    labels.tofile(label_file)
+    return malicious_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate domain_{percent}.txt workloads with exact malicious ratios')
+    parser.add_argument('--malicious', default=MALICIOUS_FILE, help=f'Malicious names (default: {MALICIOUS_FILE})')
+    parser.add_argument('--benign', default=BENIGN_FILE, help=f'Benign names (default: {BENIGN_FILE})')
+    parser.add_argument('-o', '--output-dir', default='output', help='Output directory (default: output)')
+    parser.add_argument('-n', '--count', type=int, default=1000, help='Names per file (default: 1000)')
+    parser.add_argument('--percents', nargs='+', type=int, default=list(range(10, 100, 10)),
+                        help='Malicious percentages (default: 10 20 ... 90)')
+    parser.add_argument('--group', type=int, default=10,
+                        help='Each run of this many names holds its exact share of malicious names (default: 10)')
+    parser.add_argument('--distribution', choices=DISTRIBUTIONS, default='uniform',
+                        help='Name popularity: uniform (unique while possible) or zipf (default: uniform)')
+    parser.add_argument('--zipf-s', type=float, default=1.0, help='Zipf exponent (default: 1.0)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    args = parser.parse_args()
+
+    for path in (args.malicious, args.benign):
+        if not os.path.exists(path):
+            print(f"Error: input file '{path}' does not exist")
+            sys.exit(1)
+    if any(not 0 <= percent <= 100 for percent in args.percents):
+        parser.error('percentages must be between 0 and 100')
+
+    start = time.perf_counter()
+    malicious = LineIndex(args.malicious)
+    benign = LineIndex(args.benign)
+    print(f"{len(malicious)} malicious and {len(benign)} benign names indexed in "
+          f"{time.perf_counter() - start:.2f}s")
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    manifest = {'malicious': args.malicious, 'benign': args.benign, 'count': args.count, 'group': args.group,
+                'distribution': args.distribution, 'zipf_s': args.zipf_s, 'seed': args.seed, 'files': {}}
+    for percent in args.percents:
+        file_start = time.perf_counter()
+        output_file = os.path.join(args.output_dir, f'domain_{percent}.txt')
+        label_file = label_index_path(output_file)
+        malicious_count = write_workload(output_file, label_file, malicious, benign, args.count, percent,
+                                         args.group, args.distribution, args.zipf_s, args.seed)
+        manifest['files'][os.path.basename(output_file)] = {'names': args.count, 'malicious': malicious_count}
+        print(f"{output_file}: {args.count} names, {malicious_count} malicious "
+              f"({time.perf_counter() - file_start:.2f}s)")
+    malicious.close()
+    benign.close()
+
+    with open(os.path.join(args.output_dir, 'domain_manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    print(f"Done in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
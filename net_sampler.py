@@ -0,0 +1,299 @@
+import os
+import csv
+import json
+import argparse
+import threading
+from datetime import datetime
+
+from clock_sync import to_client_time
+from proc_sampler import close_agent, start_agent_local, start_agent_remote
+
+# Agent executed on the DNS server with `python3 -c`. Arguments: sysfs root,
+# interface, interval, sample count, comma-separated XDP map names ('' for
+# none) and 1/0 to read per-queue counters with `ethtool -S`. Writes one JSON
+# line per sample with cumulative counters. The header line lists the maps
+# bpftool could not read under 'xdp_unavailable', with bpftool's stderr.
+AGENT_SOURCE = r'''
+import os, re, sys, json, time, subprocess
+sysfs, iface, interval, count = sys.argv[1], sys.argv[2], float(sys.argv[3]), int(sys.argv[4])
+maps = [name for name in sys.argv[5].split(',') if name]
+use_ethtool = sys.argv[6] == '1'
+stats_dir = os.path.join(sysfs, 'class', 'net', iface, 'statistics')
+FIELDS = ['rx_packets', 'tx_packets', 'rx_dropped', 'tx_dropped', 'rx_bytes', 'tx_bytes', 'rx_missed_errors']
+QUEUE = re.compile(r'^\s*(?:rx_queue_(\d+)_packets|rx(\d+)_packets|rx-(\d+)\.packets):\s*(\d+)')
+ACTIONS = {0: 'aborted', 1: 'drop', 2: 'pass', 3: 'tx', 4: 'redirect'}
+def number(value):
+    if isinstance(value, list):
+        return int.from_bytes(bytes(int(v, 16) for v in value), 'little')
+    return int(value)
+def read_stats():
+    counters = {}
+    for field in FIELDS:
+        try:
+            with open(os.path.join(stats_dir, field)) as f:
+                counters[field] = int(f.read())
+        except (OSError, ValueError):
+            pass
+    return counters
+def read_queues():
+    queues = {}
+    try:
+        output = subprocess.run(['ethtool', '-S', iface], capture_output=True, text=True, timeout=2).stdout
+    except (OSError, subprocess.SubprocessError):
+        return queues
+    for line in output.splitlines():
+        match = QUEUE.match(line)
+        if match:
+            queue = next(group for group in match.groups()[:3] if group is not None)
+            queues['rxq%s' % queue] = int(match.group(4))
+    return queues
+xdp_errors = {}
+def read_xdp():
+    counters = {}
+    for name in maps:
+        try:
+            result = subprocess.run(['bpftool', '-j', 'map', 'dump', 'name', name],
+                                    capture_output=True, text=True, timeout=2)
+            if result.returncode != 0:
+                xdp_errors[name] = result.stderr.strip() or 'bpftool exited with status %d' % result.returncode
+                continue
+            entries = json.loads(result.stdout or '[]')
+        except (OSError, subprocess.SubprocessError, ValueError) as e:
+            xdp_errors[name] = str(e)
+            continue
+        for entry in entries:
+            entry = entry.get('formatted', entry)
+            key = number(entry.get('key', 0))
+            if 'values' in entry:
+                value = sum(number(cpu['value']) for cpu in entry['values'])
+            else:
+                value = number(entry.get('value', 0))
+            counters['xdp_%s' % ACTIONS.get(key, key)] = counters.get('xdp_%s' % ACTIONS.get(key, key), 0) + value
+    return counters
+out = sys.stdout
+header = {'iface': iface, 'interval': interval, 'maps': maps}
+if maps:
+    read_xdp()
+if xdp_errors:
+    header['xdp_unavailable'] = xdp_errors
+    for name, error in xdp_errors.items():
+        sys.stderr.write('bpftool map %s: %s\n' % (name, error))
+out.write(json.dumps(header) + '\n')
+out.flush()
+deadline = time.monotonic()
+sent = 0
+while count <= 0 or sent < count:
+    sample = read_stats()
+    if use_ethtool:
+        sample.update(read_queues())
+    if maps:
+        sample.update(read_xdp())
+    sample['t'] = time.time()
+    out.write(json.dumps(sample) + '\n')
+    out.flush()
+    sent += 1
+    deadline += interval
+    delay = deadline - time.monotonic()
+    if delay > 0:
+        time.sleep(delay)
+'''
+
+RATE_FIELDS = ['rx_packets', 'tx_packets', 'rx_dropped', 'tx_dropped', 'rx_missed_errors',
+               'xdp_drop', 'xdp_pass', 'xdp_tx', 'xdp_redirect', 'xdp_aborted']
+
+
+def agent_args(iface, interval, count, sysfs='/sys', xdp_maps=(), ethtool=False):
+    """Command line arguments of the agent"""
+    return [sysfs, iface, str(interval), str(count), ','.join(xdp_maps), '1' if ethtool else '0']
+
+
+def iter_rates(stream, clock=None, on_header=None, on_sample=None, stop=None):
+    """
+    Turn the agent's cumulative counters into per-interval rates (per second)
+
+    Yields dicts with 'Timestamp', 'time' and a '<counter>/s' entry for every
+    counter present in both samples, plus the client 'epoch' with a clock
+    estimate. on_header receives the agent's header dict and on_sample is
+    called for every frame read, including the first one, which yields no
+    rates. A set stop Event ends it after the next sample.
+    """
+    line = stream.readline()
+    if not line:
+        raise RuntimeError("agent exited before writing its header")
+    header = json.loads(line.decode())
+    if on_header is not None:
+        on_header(header)
+    previous = None
+    for line in stream:
+        sample = json.loads(line.decode())
+        if on_sample is not None:
+            on_sample()
+        if previous is not None:
+            elapsed = sample['t'] - previous['t']
+            if elapsed > 0:
+                rates = {'Timestamp': datetime.fromtimestamp(sample['t']).strftime('%H:%M:%S.%f')[:-3],
+                         'time': sample['t']}
+                if clock is not None:
+                    rates['epoch'] = round(to_client_time(sample['t'], clock), 3)
+                for key, value in sample.items():
+                    if key != 't' and key in previous:
+                        rates[f'{key}/s'] = round(max(value - previous[key], 0) / elapsed, 1)
+                yield rates
+        previous = sample
+        if stop is not None and stop.is_set():
+            break
+
+
+def rate_columns(first):
+    """CSV columns for a sample: fixed counters first, then per-queue ones"""
+    columns = ['Timestamp'] + [f'{field}/s' for field in RATE_FIELDS if f'{field}/s' in first]
+    columns += sorted(key for key in first if key.startswith('rxq'))
+    if 'epoch' in first:
+        columns.append('epoch')
+    return columns
+
+
+def cpu_seconds(sar_csv_file):
+    """
+    CPU-seconds consumed over a run from a sar-schema CSV
+
+    Each 'all' row contributes (100 - idle)% of every CPU for one interval;
+    the interval is 1s for sar and derived from timestamps for sub-second CSVs.
+    Returns (cpu_seconds, duration in seconds).
+    """
+    rows = []
+    cpus = set()
+    with open(sar_csv_file, newline='') as f:
+        for row in csv.DictReader(f):
+            if row['CPU'] == 'all':
+                rows.append((row['Timestamp'], float(row['idle'])))
+            else:
+                cpus.add(row['CPU'])
+    if not rows:
+        return 0.0, 0.0
+    interval = 1.0
+    if len(rows) > 1 and '.' in rows[0][0]:
+        first = datetime.strptime(rows[0][0], '%H:%M:%S.%f')
+        last = datetime.strptime(rows[-1][0], '%H:%M:%S.%f')
+        interval = max((last - first).total_seconds() / (len(rows) - 1), 0.001)
+    used = sum((100.0 - idle) / 100.0 * len(cpus) * interval for _, idle in rows)
+    return used, interval * len(rows)
+
+
+def summarize(rows, sar_csv_file=None):
+    """
+    Mean packet rates over the run and, with a sar CSV of the same run, packets per CPU-second
+
+    Packets in counts everything the NIC received, including what XDP dropped
+    in the kernel, so the efficiency figure charges XDP for its real work.
+    """
+    if not rows:
+        return {}
+    summary = {}
+    for key in rows[0]:
+        if key.endswith('/s'):
+            summary[key] = round(sum(row.get(key, 0) for row in rows) / len(rows), 1)
+    duration = rows[-1]['time'] - rows[0]['time'] + (rows[1]['time'] - rows[0]['time'] if len(rows) > 1 else 0)
+    summary['duration'] = round(duration, 3)
+    if sar_csv_file and os.path.exists(sar_csv_file):
+        used, cpu_duration = cpu_seconds(sar_csv_file)
+        cpu_rate = used / cpu_duration if cpu_duration else 0.0
+        summary['cpu_seconds_per_second'] = round(cpu_rate, 3)
+        summary['packets_per_cpu_second'] = (round(summary.get('rx_packets/s', 0) / cpu_rate, 1)
+                                             if cpu_rate else None)
+    return summary
+
+
+class NetCollector:
+    """Write NIC/XDP rates to CSV in a background thread and keep the rows for the summary"""
+
+    def __init__(self, stream, csv_file, clock=None):
+        self.stream = stream
+        self.csv_file = csv_file
+        self.clock = clock
+        self.header = {}
+        self.rows = []
+        self.error = None
+        self.first_sample = threading.Event()
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def _run(self):
+        try:
+            with open(self.csv_file, 'w', newline='') as f:
+                csv_writer = None
+                for rates in iter_rates(self.stream, self.clock, self._on_header, self.first_sample.set,
+                                        self.stopping):
+                    if csv_writer is None:
+                        csv_writer = csv.DictWriter(f, rate_columns(rates), extrasaction='ignore')
+                        csv_writer.writeheader()
+                    csv_writer.writerow(rates)
+                    f.flush()
+                    self.rows.append(rates)
+        except Exception as e:
+            self.error = e
+            print(f"Error while sampling network counters: {e}")
+        if self.stopping.is_set():
+            close_agent(self.stream)
+
+    def stop(self):
+        """End sampling after the next sample and close the agent"""
+        self.stopping.set()
+
+    def _on_header(self, header):
+        self.header = header
+        for name, error in header.get('xdp_unavailable', {}).items():
+            print(f"Warning: XDP map {name} unavailable, no xdp_* counters: {error}")
+
+    def join(self, timeout=None):
+        """Wait for the agent to finish; True when it ended without errors"""
+        self.thread.join(timeout)
+        return not self.thread.is_alive() and self.error is None
+
+    def summary(self, sar_csv_file=None):
+        """summarize() of the rows, with the agent's 'xdp_unavailable' maps when bpftool failed"""
+        result = summarize(self.rows, sar_csv_file)
+        if 'xdp_unavailable' in self.header:
+            result['xdp_unavailable'] = self.header['xdp_unavailable']
+        return result
+
+
+def start_remote_net_sampler(ssh, results_dir, file_suffix, iface, interval=1.0, duration=60,
+                             xdp_maps=(), ethtool=True, clock=None):
+    """
+    Sample NIC and XDP counters into results_dir/net_{file_suffix}.csv
+
+    Reading BPF maps needs root, so with xdp_maps the agent runs through sudo.
+    """
+    args = agent_args(iface, interval, int(duration / interval) + 1, xdp_maps=xdp_maps, ethtool=ethtool)
+    stream = start_agent_remote(ssh, AGENT_SOURCE, args, sudo=bool(xdp_maps))
+    return NetCollector(stream, os.path.join(results_dir, f'net_{file_suffix}.csv'), clock).start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='NIC and XDP packet/drop counter sampler')
+    parser.add_argument('iface', help='Network interface (e.g. eth0)')
+    parser.add_argument('-i', '--interval', type=float, default=1.0, help='Sampling interval in seconds')
+    parser.add_argument('-n', '--count', type=int, default=10, help='Number of samples')
+    parser.add_argument('--sysfs', default='/sys', help='sysfs root to read (a fake tree for tests)')
+    parser.add_argument('--xdp-map', action='append', default=[],
+                        help='XDP stats map name read with bpftool (repeatable)')
+    parser.add_argument('--ethtool', action='store_true', help='Read per-queue counters with ethtool -S')
+    parser.add_argument('--sar-csv', help='sar-schema CSV of the same run, for packets per CPU-second')
+    parser.add_argument('-o', '--output', default='net_local.csv', help='Output CSV file')
+    args = parser.parse_args()
+
+    stream = start_agent_local(AGENT_SOURCE, agent_args(args.iface, args.interval, args.count, args.sysfs,
+                                                        args.xdp_map, args.ethtool))
+    collector = NetCollector(stream, args.output).start()
+    collector.join()
+    print(json.dumps(collector.summary(args.sar_csv), indent=2))
+    print(f"Network samples saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+import os
+import csv
+import json
+import argparse
+import threading
+from datetime import datetime
+
+from proc_sampler import close_agent, epoch_column, start_agent_local, start_agent_remote
+
+DEFAULT_PROCESSES = ['named', 'dnsfw']
+
+# Agent executed on the DNS server with `python3 -c`. Arguments: proc root,
+# interval, sample count and one "name" or "name=pid,pid" spec per process.
+# Names without pids are resolved from /proc/<pid>/comm. Writes one JSON line
+# per sample with the cumulative counters of every process.
+AGENT_SOURCE = r'''
+import os, sys, json, time
+proc, interval, count = sys.argv[1], float(sys.argv[2]), int(sys.argv[3])
+hz = os.sysconf('SC_CLK_TCK')
+page_kb = os.sysconf('SC_PAGE_SIZE') // 1024
+def resolve(name):
+    pids = []
+    for entry in os.listdir(proc):
+        if entry.isdigit():
+            try:
+                with open(os.path.join(proc, entry, 'comm')) as f:
+                    if f.read().strip() == name:
+                        pids.append(int(entry))
+            except OSError:
+                pass
+    return sorted(pids)
+targets = []
+for spec in sys.argv[4:]:
+    name, _, pids = spec.partition('=')
+    targets.append((name, [int(p) for p in pids.split(',') if p] or resolve(name)))
+def read(pid):
+    try:
+        with open(os.path.join(proc, str(pid), 'stat')) as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        counters = {'utime': int(fields[11]), 'stime': int(fields[12]),
+                    'threads': int(fields[17]), 'rss_kb': int(fields[21]) * page_kb}
+        with open(os.path.join(proc, str(pid), 'status')) as f:
+            for line in f:
+                if line.startswith('voluntary_ctxt_switches:'):
+                    counters['cswch'] = int(line.split()[1])
+                elif line.startswith('nonvoluntary_ctxt_switches:'):
+                    counters['nvcswch'] = int(line.split()[1])
+        return counters
+    except (OSError, IndexError, ValueError):
+        return None
+out = sys.stdout
+out.write(json.dumps({'hz': hz, 'interval': interval, 'targets': targets}) + '\n')
+out.flush()
+deadline = time.monotonic()
+sent = 0
+while count <= 0 or sent < count:
+    sample = {'t': time.time(), 'procs': []}
+    for name, pids in targets:
+        for pid in pids:
+            counters = read(pid)
+            if counters is not None:
+                counters.update(name=name, pid=pid)
+                sample['procs'].append(counters)
+    out.write(json.dumps(sample) + '\n')
+    out.flush()
+    sent += 1
+    deadline += interval
+    delay = deadline - time.monotonic()
+    if delay > 0:
+        time.sleep(delay)
+'''
+
+HEADERS = ['Timestamp', 'Process', 'PID', 'usr', 'sys', 'cpu', 'rss_kb', 'threads', 'cswch/s', 'nvcswch/s']
+
+
+def agent_args(targets, interval, count, proc='/proc'):
+    """
+    Command line arguments of the agent
+
+    Args:
+    targets (dict): Process name -> list of pids (empty to resolve by name)
+    """
+    specs = [f"{name}={','.join(str(pid) for pid in pids)}" if pids else name
+             for name, pids in targets.items()]
+    return [proc, str(interval), str(count)] + specs
+
+
+def iter_rows(stream, clock=None, on_sample=None, stop=None):
+    """
+    Turn the agent's cumulative samples into per-interval rows
+
+    CPU columns are percentages of one core, like pidstat. With a clock
+    estimate every row ends with the client 'epoch' of its sample. on_sample
+    is called for every frame read, including the first one and frames
+    without any process, which yield no rows. A set stop Event ends it
+    after the rows of the next frame.
+    """
+    header = json.loads(stream.readline().decode())
+    hz = header['hz']
+    previous = {}
+    previous_time = None
+    for line in stream:
+        sample = json.loads(line.decode())
+        if on_sample is not None:
+            on_sample()
+        current = {(proc['name'], proc['pid']): proc for proc in sample['procs']}
+        if previous_time is not None:
+            elapsed = sample['t'] - previous_time
+            timestamp = datetime.fromtimestamp(sample['t']).strftime('%H:%M:%S.%f')[:-3]
+            epoch = epoch_column(sample['t'], clock)
+            for key, proc in current.items():
+                before = previous.get(key)
+                if before is None or elapsed <= 0:
+                    continue
+                usr = 100.0 * (proc['utime'] - before['utime']) / hz / elapsed
+                sys_ = 100.0 * (proc['stime'] - before['stime']) / hz / elapsed
+                yield [timestamp, proc['name'], proc['pid'], round(usr, 2), round(sys_, 2),
+                       round(usr + sys_, 2), proc['rss_kb'], proc['threads'],
+                       round((proc.get('cswch', 0) - before.get('cswch', 0)) / elapsed, 1),
+                       round((proc.get('nvcswch', 0) - before.get('nvcswch', 0)) / elapsed, 1)] + epoch
+        previous = current
+        previous_time = sample['t']
+        if stop is not None and stop.is_set():
+            break
+
+
+def summarize(rows):
+    """
+    Per-process summary: mean/max CPU, max RSS and threads, mean context switch rates
+
+    A process name can match several pids (named workers, dnsfw threads):
+    their rows are summed per timestamp first, so the figures describe the
+    whole process group sample by sample.
+    """
+    totals = {}
+    pids = {}
+    for row in rows:
+        name = row[1]
+        pids.setdefault(name, set()).add(row[2])
+        total = totals.setdefault(name, {}).setdefault(row[0], [0.0] * 7)
+        for index, value in enumerate(row[3:10]):
+            total[index] += value
+    result = {}
+    for name, samples in totals.items():
+        # Columns: usr, sys, cpu, rss_kb, threads, cswch/s, nvcswch/s
+        usr, sys_, cpu, rss_kb, threads, cswch, nvcswch = zip(*samples.values())
+        count = len(samples)
+        result[name] = {
+            'pids': sorted(pids[name]),
+            'usr_mean': round(sum(usr) / count, 2),
+            'sys_mean': round(sum(sys_) / count, 2),
+            'cpu_mean': round(sum(cpu) / count, 2),
+            'cpu_max': round(max(cpu), 2),
+            'rss_kb_max': int(max(rss_kb)),
+            'threads_max': int(max(threads)),
+            'cswch_per_s': round(sum(cswch) / count, 1),
+            'nvcswch_per_s': round(sum(nvcswch) / count, 1),
+        }
+    return result
+
+
+class PidCollector:
+    """Write per-process rows to CSV in a background thread and keep the summary"""
+
+    def __init__(self, stream, csv_file, clock=None):
+        self.stream = stream
+        self.csv_file = csv_file
+        self.clock = clock
+        self.summary = {}
+        self.error = None
+        self.first_sample = threading.Event()
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def _run(self):
+        rows = []
+        try:
+            with open(self.csv_file, 'w', newline='') as f:
+                csv_writer = csv.writer(f)
+                csv_writer.writerow(HEADERS + (['epoch'] if self.clock is not None else []))
+                for row in iter_rows(self.stream, self.clock, self.first_sample.set, self.stopping):
+                    csv_writer.writerow(row)
+                    f.flush()
+                    rows.append(row)
+        except Exception as e:
+            self.error = e
+            print(f"Error while sampling processes: {e}")
+        if self.stopping.is_set():
+            close_agent(self.stream)
+        self.summary = summarize(rows)
+
+    def stop(self):
+        """End sampling after the next sample and close the agent"""
+        self.stopping.set()
+
+    def join(self, timeout=None):
+        """Wait for the agent to finish; True when it ended without errors"""
+        self.thread.join(timeout)
+        return not self.thread.is_alive() and self.error is None
+
+
+def start_remote_pid_sampler(ssh, results_dir, file_suffix, targets, interval=1.0, duration=60, clock=None):
+    """Sample the given processes into results_dir/pidstat_{file_suffix}.csv"""
+    stream = start_agent_remote(ssh, AGENT_SOURCE, agent_args(targets, interval, int(duration / interval)))
+    return PidCollector(stream, os.path.join(results_dir, f'pidstat_{file_suffix}.csv'), clock).start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-process CPU, RSS, context switch and thread sampler')
+    parser.add_argument('processes', nargs='*', default=DEFAULT_PROCESSES,
+                        help='Process names, or name=pid[,pid] (default: named dnsfw)')
+    parser.add_argument('-i', '--interval', type=float, default=1.0, help='Sampling interval in seconds')
+    parser.add_argument('-n', '--count', type=int, default=10, help='Number of samples')
+    parser.add_argument('--proc', default='/proc', help='proc filesystem root to read')
+    parser.add_argument('-o', '--output', default='pidstat_local.csv', help='Output CSV file')
+    args = parser.parse_args()
+
+    targets = {}
+    for spec in args.processes:
+        name, _, pids = spec.partition('=')
+        targets[name] = [int(pid) for pid in pids.split(',') if pid]
+
+    stream = start_agent_local(AGENT_SOURCE, agent_args(targets, args.interval, args.count, args.proc))
+    collector = PidCollector(stream, args.output).start()
+    collector.join()
+    print(json.dumps(collector.summary, indent=2))
+    print(f"Process samples saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
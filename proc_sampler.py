@@ -0,0 +1,286 @@
+import os
+import csv
+import sys
+import json
+import struct
+import shlex
+import argparse
+import threading
+import subprocess
+from datetime import datetime
+
+from clock_sync import to_client_time
+from sar_parse import HEADERS
+
+# Agent executed on the DNS server with `python3 -c`. It reads /proc/stat,
+# /proc/softirqs and /proc/interrupts every interval and writes one JSON
+# header line followed by fixed-size binary frames of counter deltas:
+# little-endian double epoch timestamp, then per row (aggregate 'cpu' first,
+# then cpu0..N) 10 /proc/stat jiffy deltas, one delta per softirq type and
+# the interrupt delta, all uint32.
+AGENT_SOURCE = r'''
+import os, sys, json, time, struct
+proc, interval, count = sys.argv[1], float(sys.argv[2]), int(sys.argv[3])
+def read_stat():
+    rows = []
+    with open(os.path.join(proc, 'stat')) as f:
+        for line in f:
+            if not line.startswith('cpu'):
+                break
+            fields = line.split()
+            rows.append((fields[0], [int(v) for v in fields[1:11]] + [0] * (11 - len(fields))))
+    return rows
+def read_table(name, cpus):
+    table = {}
+    try:
+        with open(os.path.join(proc, name)) as f:
+            f.readline()
+            for line in f:
+                fields = line.split()
+                if len(fields) < cpus + 1 or not fields[0].endswith(':'):
+                    continue
+                try:
+                    table[fields[0][:-1]] = [int(v) for v in fields[1:cpus + 1]]
+                except ValueError:
+                    continue
+    except OSError:
+        pass
+    return table
+def snapshot(cpus, soft_names):
+    stat = [values for _, values in read_stat()]
+    soft = read_table('softirqs', cpus)
+    irqs = read_table('interrupts', cpus)
+    irq_total = [sum(values[cpu] for values in irqs.values()) for cpu in range(cpus)]
+    rows = [stat[0] + [sum(soft[name]) for name in soft_names] + [sum(irq_total)]]
+    for cpu in range(cpus):
+        rows.append(stat[cpu + 1] + [soft[name][cpu] for name in soft_names] + [irq_total[cpu]])
+    return [value for row in rows for value in row]
+names = [name for name, _ in read_stat()]
+cpus = len(names) - 1
+soft_names = list(read_table('softirqs', cpus))
+out = sys.stdout.buffer
+header = {'cpus': [name[3:] for name in names[1:]], 'softirqs': soft_names,
+          'interval': interval, 'hz': os.sysconf('SC_CLK_TCK')}
+out.write((json.dumps(header) + '\n').encode())
+out.flush()
+previous = snapshot(cpus, soft_names)
+frame = struct.Struct('<d%dI' % len(previous))
+deadline = time.monotonic()
+sent = 0
+while count <= 0 or sent < count:
+    deadline += interval
+    delay = deadline - time.monotonic()
+    if delay > 0:
+        time.sleep(delay)
+    current = snapshot(cpus, soft_names)
+    deltas = [max(0, now - before) & 0xFFFFFFFF for now, before in zip(current, previous)]
+    out.write(frame.pack(time.time(), *deltas))
+    out.flush()
+    previous = current
+    sent += 1
+'''
+
+STAT_FIELDS = ['user', 'nice', 'system', 'idle', 'iowait', 'irq', 'softirq', 'steal', 'guest', 'guest_nice']
+
+
+def agent_args(interval, count, proc='/proc'):
+    """Command line arguments of the sampler agent"""
+    return [proc, str(interval), str(count)]
+
+
+def decode_stream(stream):
+    """
+    Decode the agent output into samples
+
+    Args:
+    stream (file): Binary file-like object with the agent stdout
+
+    Yields dicts with the epoch 'time', the agent 'header' and a 'rows' list
+    of (cpu, stat deltas, softirq deltas, interrupt delta), 'all' first.
+    """
+    header = json.loads(stream.readline().decode())
+    cpus = ['all'] + header['cpus']
+    softirqs = header['softirqs']
+    width = len(STAT_FIELDS) + len(softirqs) + 1
+    frame = struct.Struct('<d%dI' % (width * len(cpus)))
+    while True:
+        data = stream.read(frame.size)
+        if len(data) < frame.size:
+            return
+        values = frame.unpack(data)
+        rows = []
+        for index, cpu in enumerate(cpus):
+            base = 1 + index * width
+            stat = values[base:base + len(STAT_FIELDS)]
+            soft = values[base + len(STAT_FIELDS):base + width - 1]
+            rows.append((cpu, stat, soft, values[base + width - 1]))
+        yield {'time': values[0], 'rows': rows, 'header': header}
+
+
+def cpu_percentages(stat):
+    """Convert jiffy deltas to the sar %usr..%idle columns"""
+    user, nice, system, idle, iowait, irq, softirq, steal, guest, guest_nice = stat
+    # /proc/stat user and nice include guest time, sar reports them separately
+    total = user + nice + system + idle + iowait + irq + softirq + steal
+    if not total:
+        return [0.0] * 10
+    usr = max(user - guest, 0)
+    nic = max(nice - guest_nice, 0)
+    return [round(100.0 * value / total, 2)
+            for value in (usr, nic, system, iowait, steal, irq, softirq, guest, guest_nice, idle)]
+
+
+def format_time(epoch):
+    return datetime.fromtimestamp(epoch).strftime('%H:%M:%S.%f')[:-3]
+
+
+def epoch_column(epoch, clock):
+    """The 'epoch' cell of a row, the server time rebased onto the client clock, or nothing without a clock"""
+    return [round(to_client_time(epoch, clock), 3)] if clock is not None else []
+
+
+def sample_rows(sample, clock=None):
+    """Rows in the sar CSV schema (Timestamp, CPU, usr ... idle, and epoch with a clock) for one sample"""
+    timestamp = format_time(sample['time'])
+    epoch = epoch_column(sample['time'], clock)
+    return [[timestamp, cpu] + cpu_percentages(stat) + epoch for cpu, stat, _, _ in sample['rows']]
+
+
+def interrupt_rows(sample, clock=None):
+    """Per-CPU softirq and interrupt rates per second for one sample"""
+    timestamp = format_time(sample['time'])
+    epoch = epoch_column(sample['time'], clock)
+    interval = sample['header']['interval']
+    return [[timestamp, cpu] + [round(value / interval, 1) for value in soft] + [round(irqs / interval, 1)] + epoch
+            for cpu, _, soft, irqs in sample['rows']]
+
+
+def collect(stream, csv_file, irq_csv_file=None, on_sample=None, clock=None, stop=None):
+    """
+    Write decoded samples to a sar-schema CSV and optionally a softirq/interrupt CSV
+
+    on_sample is called after every sample is flushed. With a clock estimate
+    from clock_sync.estimate_clock both CSVs get an 'epoch' column on the
+    client timeline, like SarCollector. A set stop Event ends it after the
+    next sample. Returns the number of samples written.
+    """
+    count = 0
+    irq_out = None
+    extra = ['epoch'] if clock is not None else []
+    with open(csv_file, 'w', newline='') as f:
+        cpu_writer = csv.writer(f)
+        cpu_writer.writerow(HEADERS + extra)
+        try:
+            for sample in decode_stream(stream):
+                if irq_csv_file and irq_out is None:
+                    irq_out = open(irq_csv_file, 'w', newline='')
+                    irq_writer = csv.writer(irq_out)
+                    irq_writer.writerow(['Timestamp', 'CPU'] + sample['header']['softirqs'] + ['interrupts'] + extra)
+                cpu_writer.writerows(sample_rows(sample, clock))
+                f.flush()
+                if irq_out is not None:
+                    irq_writer.writerows(interrupt_rows(sample, clock))
+                    irq_out.flush()
+                count += 1
+                if on_sample is not None:
+                    on_sample()
+                if stop is not None and stop.is_set():
+                    break
+        finally:
+            if irq_out is not None:
+                irq_out.close()
+    return count
+
+
+class ProcCollector:
+    """Run collect() on an agent stream in a background thread"""
+
+    def __init__(self, stream, csv_file, irq_csv_file=None, clock=None):
+        self.stream = stream
+        self.csv_file = csv_file
+        self.irq_csv_file = irq_csv_file
+        self.clock = clock
+        self.samples = 0
+        self.error = None
+        self.first_sample = threading.Event()
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def _run(self):
+        try:
+            self.samples = collect(self.stream, self.csv_file, self.irq_csv_file, self.first_sample.set, self.clock,
+                                   self.stopping)
+        except Exception as e:
+            self.error = e
+            print(f"Error while sampling /proc: {e}")
+        if self.stopping.is_set():
+            close_agent(self.stream)
+
+    def stop(self):
+        """End sampling after the next sample and close the agent"""
+        self.stopping.set()
+
+    def join(self, timeout=None):
+        """Wait for the agent to finish; True when it ended without errors"""
+        self.thread.join(timeout)
+        return not self.thread.is_alive() and self.error is None
+
+
+def start_remote_proc_sampler(ssh, results_dir, file_suffix, interval=0.1, duration=60, clock=None):
+    """Sample the remote /proc into results_dir/proc_output_{file_suffix}.csv and proc_irq_{file_suffix}.csv"""
+    stream = start_agent_remote(ssh, AGENT_SOURCE, agent_args(interval, int(duration / interval)))
+    return ProcCollector(stream, os.path.join(results_dir, f'proc_output_{file_suffix}.csv'),
+                         os.path.join(results_dir, f'proc_irq_{file_suffix}.csv'), clock).start()
+
+
+def start_agent_remote(ssh, source, args, python='python3', sudo=False):
+    """
+    Run Python agent source on the remote host over an exec channel and return its binary stdout
+
+    With sudo the agent runs as root through the SSHSession's `sudo -S`, the
+    password going to the channel's stdin (the agents never read it).
+    """
+    command = ' '.join(shlex.quote(arg) for arg in [python, '-c', source] + args)
+    if sudo:
+        command = ssh.sudo_command(command)
+    channel = ssh.get_transport().open_session()
+    channel.exec_command(command)
+    if sudo:
+        stdin = channel.makefile_stdin('wb')
+        stdin.write((ssh.password + '\n').encode())
+        stdin.flush()
+    return channel.makefile('rb')
+
+
+def close_agent(stream):
+    """Close an agent's channel (or local pipe) so its next write fails and it exits early"""
+    channel = getattr(stream, 'channel', None)
+    (channel if channel is not None else stream).close()
+
+
+def start_agent_local(source, args):
+    """Run Python agent source as a local process (stand-in for the remote host) and return its binary stdout"""
+    process = subprocess.Popen([sys.executable, '-c', source] + args, stdout=subprocess.PIPE)
+    return process.stdout
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sub-second /proc CPU, softirq and interrupt sampler')
+    parser.add_argument('-i', '--interval', type=float, default=0.1, help='Sampling interval in seconds')
+    parser.add_argument('-n', '--count', type=int, default=100, help='Number of samples (0 = forever)')
+    parser.add_argument('--proc', default='/proc', help='proc filesystem root to read')
+    parser.add_argument('-o', '--output', default='proc_output_local.csv', help='CPU CSV (sar schema)')
+    parser.add_argument('--irq-output', help='Per-CPU softirq/interrupt rate CSV')
+    args = parser.parse_args()
+
+    stream = start_agent_local(AGENT_SOURCE, agent_args(args.interval, args.count, args.proc))
+    samples = collect(stream, args.output, args.irq_output)
+    print(f"Sampled {samples} intervals of {args.interval * 1000:.0f}ms, saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
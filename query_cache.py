@@ -0,0 +1,207 @@
+import socket
+import struct
+import time
+import argparse
+from array import array
+
+from dns_wire import EDNS_BUFSIZE, QTYPE_A, build_query, parse_qtype
+
+QUERY_ID = struct.Struct('!H')
+
+
+class QueryCache:
+    """
+    DNS queries precompiled to wire format in one contiguous buffer
+
+    Every packet is encoded once; sending only patches the 16-bit transaction
+    id in place and hands out a memoryview slice of the buffer.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.offsets = array('I')
+        self.lengths = array('H')
+        self.view = None
+
+    @classmethod
+    def from_queries(cls, queries):
+        """
+        Build the cache from (name, qtype) pairs
+
+        Args:
+        queries (iterable): Pairs of domain name and numeric qtype, optionally
+                            followed by the EDNS bufsize and DO flag as
+                            yielded by read_query_file
+        """
+        cache = cls()
+        for name, qtype, *edns in queries:
+            packet = build_query(name, 0, qtype, *edns)
+            cache.offsets.append(len(cache.buffer))
+            cache.lengths.append(len(packet))
+            cache.buffer += packet
+        cache.view = memoryview(cache.buffer)
+        return cache
+
+    @classmethod
+    def from_file(cls, input_file):
+        """
+        Build the cache from a domain file
+
+        Args:
+        input_file (str): One name per line, optionally followed by a qtype
+                          column as in query_file.txt ("computerweekly.com A")
+                          and dig-style EDNS options (+bufsize=1232, +dnssec)
+        """
+        return cls.from_queries(read_query_file(input_file))
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getstate__(self):
+        return {'buffer': self.buffer, 'offsets': self.offsets, 'lengths': self.lengths}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.view = memoryview(self.buffer)
+
+    def packet(self, index, query_id):
+        """Return packet `index` with its transaction id set to `query_id`"""
+        offset = self.offsets[index]
+        QUERY_ID.pack_into(self.buffer, offset, query_id)
+        return self.view[offset:offset + self.lengths[index]]
+
+    def shard(self, worker, workers):
+        """Return a new cache holding every `workers`-th packet starting at `worker`"""
+        cache = QueryCache()
+        for index in range(worker, len(self), workers):
+            offset = self.offsets[index]
+            cache.offsets.append(len(cache.buffer))
+            cache.lengths.append(self.lengths[index])
+            cache.buffer += self.view[offset:offset + self.lengths[index]]
+        cache.view = memoryview(cache.buffer)
+        return cache
+
+    def send_batch(self, sock, start, count, first_id):
+        """
+        Send `count` consecutive packets starting at `start` on a connected socket
+
+        Returns the number of packets the socket accepted.
+        """
+        total = len(self.offsets)
+        sent = 0
+        for step in range(count):
+            try:
+                sock.send(self.packet((start + step) % total, (first_id + step) & 0xFFFF))
+            except (BlockingIOError, InterruptedError):
+                break
+            sent += 1
+        return sent
+
+
+def parse_edns(options):
+    """
+    (bufsize, dnssec) of dig-style query options
+
+    +bufsize=N adds EDNS0 with that UDP payload size and +dnssec sets the DO
+    bit; +edns or +dnssec alone use EDNS_BUFSIZE. bufsize 0 means no EDNS.
+    """
+    bufsize = 0
+    dnssec = False
+    for option in options:
+        key, _, value = option.lstrip('+').lower().partition('=')
+        if key == 'bufsize':
+            bufsize = int(value)
+        elif key == 'dnssec':
+            dnssec = True
+        elif key != 'edns':
+            raise ValueError(f"Unknown query option: {option}")
+        bufsize = bufsize or EDNS_BUFSIZE
+    return bufsize, dnssec
+
+
+def read_query_file(input_file):
+    """Yield (name, qtype, bufsize, dnssec) tuples from a domain or query file"""
+    with open(input_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            fields = line.split()
+            if not fields or fields[0].startswith('#'):
+                continue
+            qtype = parse_qtype(fields[1]) if len(fields) > 1 else QTYPE_A
+            yield (fields[0], qtype) + parse_edns(fields[2:])
+
+
+def _open_sink():
+    """Bind a local UDP sink and return a non-blocking socket connected to it"""
+    sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sink.bind(('127.0.0.1', 0))
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sender.connect(sink.getsockname())
+    sender.setblocking(False)
+    return sink, sender
+
+
+def benchmark(input_file, seconds=3.0, batch=256):
+    """
+    Measure packets/second on one core with and without the query cache
+
+    Packets go to a local sink socket that never reads, so the kernel drops
+    them once its buffer is full and only the sending cost is measured.
+    """
+    queries = list(read_query_file(input_file))
+    cache = QueryCache.from_queries(queries)
+    sink, sender = _open_sink()
+    results = {}
+    try:
+        # Before: encode every query at send time
+        position = 0
+        sent = 0
+        start = time.perf_counter()
+        deadline = start + seconds
+        while time.perf_counter() < deadline:
+            for _ in range(batch):
+                name, qtype, bufsize, dnssec = queries[position % len(queries)]
+                try:
+                    sender.send(build_query(name, position & 0xFFFF, qtype, bufsize, dnssec))
+                    sent += 1
+                except (BlockingIOError, InterruptedError):
+                    pass
+                position += 1
+        results['encode_per_send'] = sent / (time.perf_counter() - start)
+
+        # After: patch the id in the precompiled buffer
+        position = 0
+        sent = 0
+        start = time.perf_counter()
+        deadline = start + seconds
+        while time.perf_counter() < deadline:
+            sent += cache.send_batch(sender, position, batch, position)
+            position += batch
+        results['query_cache'] = sent / (time.perf_counter() - start)
+    finally:
+        sender.close()
+        sink.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompile DNS queries to wire format')
+    parser.add_argument('input_file', help='Domain file (output/domain_*.txt or query_file.txt)')
+    parser.add_argument('--bench', action='store_true',
+                        help='Benchmark packets/second against a local sink socket')
+    parser.add_argument('--seconds', type=float, default=3.0, help='Benchmark time per variant')
+    args = parser.parse_args()
+
+    cache = QueryCache.from_file(args.input_file)
+    print(f"Compiled {len(cache)} queries into {len(cache.buffer)} bytes")
+
+    if args.bench:
+        results = benchmark(args.input_file, args.seconds)
+        before = results['encode_per_send']
+        after = results['query_cache']
+        print(f"Encode per send: {before:,.0f} packets/s per core")
+        print(f"Query cache:     {after:,.0f} packets/s per core")
+        print(f"Speedup:         {after / before:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
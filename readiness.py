@@ -0,0 +1,87 @@
+import time
+import asyncio
+import argparse
+
+from dns_load import wait_for_dns
+
+# UDP socket tables read on the DNS server to see whether the load has drained
+UDP_TABLES = ('/proc/net/udp', '/proc/net/udp6')
+
+
+async def wait_for_samples(collectors, timeout=15.0, interval=0.05):
+    """
+    Readiness probe: wait until every collector has written its first sample
+
+    Collectors are any objects with a `first_sample` Event and a `thread`;
+    one whose thread already ended is not waited for. Returns True when all
+    of them sampled within `timeout`.
+    """
+    pending = [collector for collector in collectors if collector is not None]
+    deadline = time.monotonic() + timeout
+    while pending:
+        pending = [collector for collector in pending
+                   if not collector.first_sample.is_set() and collector.thread.is_alive()]
+        if not pending:
+            break
+        if time.monotonic() > deadline:
+            return False
+        await asyncio.sleep(interval)
+    return True
+
+
+def udp_queue_depth(table, port=53):
+    """
+    Bytes waiting in the receive queues of the UDP sockets bound to a port
+
+    Args:
+    table (str): Contents of /proc/net/udp and/or /proc/net/udp6
+    """
+    depth = 0
+    for line in table.splitlines():
+        fields = line.split()
+        if len(fields) < 5 or ':' not in fields[1] or ':' not in fields[4]:
+            continue
+        try:
+            local_port = int(fields[1].rsplit(':', 1)[1], 16)
+            rx_queue = int(fields[4].split(':')[1], 16)
+        except ValueError:
+            continue
+        if local_port == port:
+            depth += rx_queue
+    return depth
+
+
+async def wait_for_drain(ssh, port=53, timeout=10.0, interval=0.2):
+    """
+    Readiness probe: wait until the server's UDP receive queues on `port` are empty
+
+    Returns the seconds waited, or None if they were still busy after `timeout`.
+    """
+    command = 'cat ' + ' '.join(UDP_TABLES) + ' 2>/dev/null'
+    start = time.monotonic()
+    while True:
+        result = await asyncio.to_thread(ssh.run, command)
+        if udp_queue_depth(result.stdout, port) == 0:
+            return time.monotonic() - start
+        if time.monotonic() - start > timeout:
+            return None
+        await asyncio.sleep(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Wait until a DNS server answers a canary query')
+    parser.add_argument('--server', default='192.168.0.72', help='DNS server')
+    parser.add_argument('--port', type=int, default=53, help='DNS server port')
+    parser.add_argument('--name', default='localhost', help='Canary query name')
+    parser.add_argument('--timeout', type=float, default=30.0, help='Seconds to wait')
+    args = parser.parse_args()
+
+    waited = asyncio.run(wait_for_dns(args.server, args.port, args.name, args.timeout))
+    if waited is None:
+        print(f"{args.server}:{args.port} did not answer within {args.timeout}s")
+        raise SystemExit(1)
+    print(f"{args.server}:{args.port} answered after {waited * 1000:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
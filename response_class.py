@@ -0,0 +1,185 @@
+import os
+import json
+import struct
+import argparse
+from array import array
+
+from dnsfw_emulator import normalize_name
+from latency_hist import LatencyHistogram
+
+# Verdict of one query. NXDOMAIN and NODATA are the two forms an RPZ rewrite
+# takes on the wire; XDP drops look like timeouts.
+CLASSES = ['answered', 'nodata', 'nxdomain', 'servfail', 'truncated', 'other', 'timeout']
+ANSWERED, NODATA, NXDOMAIN, SERVFAIL, TRUNCATED, OTHER, TIMEOUT = range(len(CLASSES))
+FLAG_TC = 0x0200
+# Only the flags and ANCOUNT words of the header are read
+FLAGS_ANCOUNT = struct.Struct('!2xH2xH')
+# (TC bit | rcode) of the flags -> class; NOERROR maps to NODATA and becomes
+# ANSWERED when there are answer records
+FLAG_CLASSES = [OTHER] * (FLAG_TC | 0x000F) + [OTHER]
+for _flags in range(len(FLAG_CLASSES)):
+    if _flags & FLAG_TC:
+        FLAG_CLASSES[_flags] = TRUNCATED
+FLAG_CLASSES[0] = NODATA
+FLAG_CLASSES[2] = SERVFAIL
+FLAG_CLASSES[3] = NXDOMAIN
+SOURCES = ['benign', 'blocked']
+ALL_SOURCES = ['all']
+
+
+def classify(data, _unpack=FLAGS_ANCOUNT.unpack_from, _classes=FLAG_CLASSES):
+    """
+    Class of a reply from its header only, without decoding the message
+
+    TC wins over the rcode (a truncated reply says nothing about the answer);
+    NOERROR is 'answered' with answer records and 'nodata' without.
+    """
+    flags, ancount = _unpack(data)
+    klass = _classes[flags & 0x020F]
+    return ANSWERED if klass == NODATA and ancount else klass
+
+
+def label_queries(names, blocklist):
+    """
+    Source list of each query: 1 when its name is blocked, 0 when benign
+
+    Args:
+    names (iterable): Query names in QueryCache order
+    blocklist (Blocklist): dnsfw_emulator.Blocklist of the blocked names
+    """
+    return array('B', (1 if normalize_name(name) in blocklist else 0 for name in names))
+
+
+def label_index_path(domain_file):
+    """Label index written next to a domain file by make_domainfile (domain_30.txt -> domain_30.labels)"""
+    return os.path.splitext(domain_file)[0] + '.labels'
+
+
+def read_label_index(domain_file, count):
+    """
+    Precomputed source list of a domain file, one byte per query
+
+    Returns None when there is no index or it does not have `count` entries
+    (the domain file was edited or regenerated without it).
+    """
+    path = label_index_path(domain_file)
+    if not os.path.exists(path) or os.path.getsize(path) != count:
+        return None
+    labels = array('B')
+    with open(path, 'rb') as f:
+        labels.frombytes(f.read())
+    return labels
+
+
+class ResponseStats:
+    """
+    Counts and latency histograms per source list and response class
+
+    Each reply is recorded in the histogram of its class only, so classifying
+    adds no second latency record per reply; combined() merges them into the
+    run's overall histogram. Histograms are created on first use; timeouts
+    are only counted.
+
+    Args:
+    sources (list): Source list names, indexed by the labels passed to record()
+    """
+
+    def __init__(self, sources=ALL_SOURCES):
+        self.sources = list(sources)
+        self.counts = [[0] * len(CLASSES) for _ in self.sources]
+        self.latency = [[None] * len(CLASSES) for _ in self.sources]
+
+    def record(self, source, data, seconds):
+        """Classify one reply and record its latency; returns the class"""
+        klass = classify(data)
+        self.counts[source][klass] += 1
+        histogram = self.latency[source][klass]
+        if histogram is None:
+            histogram = self.latency[source][klass] = LatencyHistogram()
+        histogram.record(seconds)
+        return klass
+
+    def combined(self):
+        """One histogram of every recorded reply"""
+        histogram = LatencyHistogram()
+        for row in self.latency:
+            for class_histogram in row:
+                if class_histogram is not None:
+                    histogram.merge(class_histogram)
+        return histogram
+
+    def timeout(self, source, count=1):
+        self.counts[source][TIMEOUT] += count
+
+    def merge(self, other):
+        """Fold the stats of another worker into this one"""
+        if other.sources != self.sources:
+            raise ValueError("Cannot merge response stats with different source lists")
+        for source in range(len(self.sources)):
+            for klass in range(len(CLASSES)):
+                self.counts[source][klass] += other.counts[source][klass]
+                histogram = other.latency[source][klass]
+                if histogram is not None:
+                    if self.latency[source][klass] is None:
+                        self.latency[source][klass] = LatencyHistogram()
+                    self.latency[source][klass].merge(histogram)
+        return self
+
+    def as_dict(self):
+        """{source: {class: {'count', 'share', 'latency'}}} with empty classes left out"""
+        result = {}
+        for source, name in enumerate(self.sources):
+            total = sum(self.counts[source])
+            classes = {}
+            for klass, class_name in enumerate(CLASSES):
+                count = self.counts[source][klass]
+                if not count:
+                    continue
+                histogram = self.latency[source][klass]
+                classes[class_name] = {
+                    'count': count,
+                    'share': round(count / total, 6),
+                    'latency': histogram.percentiles() if histogram is not None else None,
+                }
+            result[name] = {'total': total, 'classes': classes}
+        return result
+
+    def summary(self):
+        lines = []
+        for source, name in enumerate(self.sources):
+            total = sum(self.counts[source])
+            if not total:
+                continue
+            parts = []
+            for klass, class_name in enumerate(CLASSES):
+                count = self.counts[source][klass]
+                if count:
+                    histogram = self.latency[source][klass]
+                    p99 = f" p99 {histogram.percentile(99) * 1000:.3f}ms" if histogram is not None else ''
+                    parts.append(f"{class_name} {count} ({count / total:.1%}{p99})")
+            lines.append(f"{name}: " + '  '.join(parts))
+        return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Response classes per source list of a saved native load run')
+    parser.add_argument('inputs', nargs='+', help='load_*.json files written by dns_load / dns_test')
+    args = parser.parse_args()
+
+    for input_file in args.inputs:
+        with open(input_file) as f:
+            responses = json.load(f).get('responses')
+        if not responses:
+            print(f"{input_file}: no response classes recorded")
+            continue
+        print(input_file)
+        for source, data in responses.items():
+            print(f"  {source} ({data['total']} queries)")
+            for class_name, values in data['classes'].items():
+                latency = values['latency']
+                p99 = f"  p99 {latency['p99'] * 1000:.3f}ms" if latency else ''
+                print(f"    {class_name:<10}{values['count']:>10}{values['share']:>9.2%}{p99}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+import os
+import re
+import csv
+import glob
+import json
+import time
+import argparse
+
+import numpy as np
+
+from sar_parse import HEADERS
+
+TEST_TYPES = ['dnsfw_no', 'dnsfw_rpz', 'dnsfw_xdp']
+METRICS = HEADERS[2:]
+CACHE_DIR = '.results_cache'
+CACHE_VERSION = 1
+# results_YYYYMMDD/sar_output_{test_type}[_{percent}][_q{rate}][_r{repetition}].csv
+RUN_NAME = re.compile(r'^sar_output_(dnsfw_[a-z]+)(?:_(\d+))?(?:_q(\d+))?(?:_r(\d+))?\.csv$')
+
+
+def parse_run_name(path):
+    """
+    Run attributes from a sar CSV path, or None when it is not a run file
+
+    Old runs without a percentage get percent 0; runs outside a campaign get
+    rate 0 and repetition 1.
+    """
+    match = RUN_NAME.match(os.path.basename(path))
+    directory = os.path.basename(os.path.dirname(os.path.abspath(path)))
+    if not match or match.group(1) not in TEST_TYPES or not re.match(r'^results_\d{8}$', directory):
+        return None
+    test_type, percent, rate, repetition = match.groups()
+    return {
+        'date': int(directory[len('results_'):]),
+        'test_type': test_type,
+        'percent': int(percent or 0),
+        'rate': int(rate or 0),
+        'repetition': int(repetition or 1),
+    }
+
+
+def seconds_of_day(timestamp):
+    """'HH:MM:SS' or 'HH:MM:SS.fff' to seconds since midnight"""
+    hours, minutes, seconds = timestamp.split(':')
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def read_sar_csv(path, time_column='Timestamp'):
+    """
+    Columns of one sar-schema CSV: time, cpu (-1 = all) and one float array per metric
+
+    time is seconds of day from 'Timestamp', or the client epoch with
+    time_column='epoch' for CSVs streamed with a clock estimate.
+    """
+    times = []
+    cpus = []
+    values = []
+    with open(path, newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        time_index = header.index(time_column) if time_column != 'Timestamp' else 0
+        for row in reader:
+            if len(row) < len(HEADERS):
+                continue
+            try:
+                # Older CSVs also carry the sar summary (Média:) rows, which have no time
+                row_time = seconds_of_day(row[0]) if time_index == 0 else float(row[time_index])
+                row_values = [float(value) for value in row[2:len(HEADERS)]]
+            except ValueError:
+                continue
+            times.append(row_time)
+            values.append(row_values)
+            cpus.append(-1 if row[1] == 'all' else int(row[1]))
+    return (np.array(times, dtype=np.float64), np.array(cpus, dtype=np.int16),
+            np.array(values, dtype=np.float32).reshape(-1, len(METRICS)))
+
+
+class ResultsStore:
+    """
+    Every sar CSV under results_YYYYMMDD directories as columnar NumPy arrays
+
+    Rows of all runs are concatenated into one array per column ('run', 'time',
+    'cpu' and one per sar metric) saved as .npy files in the cache directory
+    and memory-mapped on load. index.json records each file's mtime and size;
+    when files change, only those are reparsed and the cache is rewritten.
+    Run attributes live in per-run arrays (date, test_type code, percent,
+    rate, repetition) that are broadcast to rows through the 'run' column.
+
+    Args:
+    root (str): Directory holding the results_* directories
+    cache_dir (str): Cache location (default: root/.results_cache)
+    """
+
+    def __init__(self, root='.', cache_dir=None):
+        self.root = root
+        self.cache_dir = cache_dir or os.path.join(root, CACHE_DIR)
+        self.runs = []
+        self.columns = {}
+        self.reparsed = 0
+
+    def discover(self):
+        files = {}
+        for path in sorted(glob.glob(os.path.join(self.root, 'results_*', 'sar_output_*.csv'))):
+            attributes = parse_run_name(path)
+            if attributes is not None:
+                stat = os.stat(path)
+                files[os.path.relpath(path, self.root)] = dict(attributes, mtime=stat.st_mtime_ns,
+                                                               size=stat.st_size)
+        return files
+
+    def _cached_index(self):
+        path = os.path.join(self.cache_dir, 'index.json')
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            index = json.load(f)
+        return index if index.get('version') == CACHE_VERSION else None
+
+    def _map_columns(self):
+        return {name: np.load(os.path.join(self.cache_dir, f'{name}.npy'), mmap_mode='r')
+                for name in ['run', 'time', 'cpu'] + METRICS}
+
+    def load(self, rebuild=False):
+        """Map the cache, reparsing only CSVs added or changed since it was written"""
+        files = self.discover()
+        index = None if rebuild else self._cached_index()
+        if index is not None:
+            cached = {run['path']: run for run in index['runs']}
+            if all(path in cached and cached[path]['mtime'] == info['mtime'] and cached[path]['size'] == info['size']
+                   for path, info in files.items()) and len(cached) == len(files):
+                self.runs = index['runs']
+                self.columns = self._map_columns()
+                self._build_run_arrays()
+                return self
+        self._rebuild(files, index)
+        return self
+
+    def _rebuild(self, files, index):
+        old_runs = {}
+        old_columns = None
+        if index is not None:
+            old_runs = {run['path']: run for run in index['runs']}
+            old_columns = self._map_columns()
+        parts = {name: [] for name in ['run', 'time', 'cpu'] + METRICS}
+        runs = []
+        offset = 0
+        self.reparsed = 0
+        for number, (path, info) in enumerate(files.items()):
+            old = old_runs.get(path)
+            if old is not None and old['mtime'] == info['mtime'] and old['size'] == info['size']:
+                rows = slice(old['offset'], old['offset'] + old['rows'])
+                # Copy out of the mapping, the cache files are rewritten below
+                times = np.array(old_columns['time'][rows])
+                cpus = np.array(old_columns['cpu'][rows])
+                values = np.stack([np.array(old_columns[name][rows]) for name in METRICS], axis=1)
+            else:
+                times, cpus, values = read_sar_csv(os.path.join(self.root, path))
+                self.reparsed += 1
+            count = len(times)
+            parts['run'].append(np.full(count, number, dtype=np.int32))
+            parts['time'].append(times)
+            parts['cpu'].append(cpus)
+            for column, name in enumerate(METRICS):
+                parts[name].append(values[:, column].astype(np.float32))
+            runs.append(dict(info, path=path, offset=offset, rows=count))
+            offset += count
+        old_columns = None
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        index_file = os.path.join(self.cache_dir, 'index.json')
+        if os.path.exists(index_file):
+            os.remove(index_file)
+        empty = {'run': np.int32, 'time': np.float64, 'cpu': np.int16}
+        for name, arrays in parts.items():
+            array = np.concatenate(arrays) if arrays else np.zeros(0, dtype=empty.get(name, np.float32))
+            np.save(os.path.join(self.cache_dir, f'{name}.npy'), array)
+        # Write the index last, so an interrupted rebuild is detected and redone
+        with open(index_file, 'w') as f:
+            json.dump({'version': CACHE_VERSION, 'runs': runs}, f)
+        self.runs = runs
+        self.columns = self._map_columns()
+        self._build_run_arrays()
+
+    def _build_run_arrays(self):
+        self.run_attributes = {
+            'date': np.array([run['date'] for run in self.runs], dtype=np.int32),
+            'test_type': np.array([TEST_TYPES.index(run['test_type']) for run in self.runs], dtype=np.int8),
+            'percent': np.array([run['percent'] for run in self.runs], dtype=np.int16),
+            'rate': np.array([run['rate'] for run in self.runs], dtype=np.int32),
+            'repetition': np.array([run['repetition'] for run in self.runs], dtype=np.int16),
+        }
+
+    def __len__(self):
+        return len(self.columns.get('run', ()))
+
+    def column(self, name):
+        """A row-aligned array: a sar metric, 'time', 'cpu', 'run' or a run attribute"""
+        if name in self.columns:
+            return self.columns[name]
+        return self.run_attributes[name][self.columns['run']]
+
+    def mask(self, **filters):
+        """
+        Boolean row mask for equality filters
+
+        Values may be a single value or a list; test_type takes names and cpu
+        takes 'all' for the aggregate row.
+        """
+        selected = np.ones(len(self), dtype=bool)
+        for name, value in filters.items():
+            values = value if isinstance(value, (list, tuple)) else [value]
+            if name == 'test_type':
+                values = [TEST_TYPES.index(v) for v in values]
+            elif name == 'cpu':
+                values = [-1 if v == 'all' else int(v) for v in values]
+            selected &= np.isin(self.column(name), values)
+        return selected
+
+    def group_mean(self, metric, by=('test_type', 'percent', 'cpu'), **filters):
+        """
+        Mean of a metric grouped by columns, over every matching row
+
+        Returns a list of (key tuple, mean, rows) sorted by key, with test_type
+        names and 'all' in place of their codes.
+        """
+        selected = self.mask(**filters) if filters else slice(None)
+        keys = np.stack([np.asarray(self.column(name)[selected], dtype=np.int64) for name in by], axis=1)
+        values = np.asarray(self.columns[metric][selected], dtype=np.float64)
+        if not len(values):
+            return []
+        groups, inverse = np.unique(keys, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        sums = np.bincount(inverse, weights=values, minlength=len(groups))
+        counts = np.bincount(inverse, minlength=len(groups))
+        result = []
+        for group, total, count in zip(groups, sums, counts):
+            key = tuple(self._label(name, int(value)) for name, value in zip(by, group))
+            result.append((key, total / count, int(count)))
+        return result
+
+    def _label(self, name, value):
+        if name == 'test_type':
+            return TEST_TYPES[value]
+        if name == 'cpu' and value == -1:
+            return 'all'
+        return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query every sar CSV under results_YYYYMMDD directories')
+    parser.add_argument('--root', default='.', help='Directory holding results_* (default: .)')
+    parser.add_argument('--metric', choices=METRICS, default='soft', help='sar metric (default: soft)')
+    parser.add_argument('--by', nargs='+', default=['test_type', 'percent', 'cpu'],
+                        choices=['date', 'test_type', 'percent', 'rate', 'repetition', 'cpu', 'run'],
+                        help='Group-by columns (default: test_type percent cpu)')
+    parser.add_argument('--test-type', nargs='+', choices=TEST_TYPES, help='Only these test types')
+    parser.add_argument('--percent', nargs='+', type=int, help='Only these percentages')
+    parser.add_argument('--date', nargs='+', type=int, help='Only these dates (YYYYMMDD)')
+    parser.add_argument('--cpu', nargs='+', help="Only these CPUs ('all' for the aggregate)")
+    parser.add_argument('--rebuild', action='store_true', help='Ignore the cache and reparse every CSV')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    store = ResultsStore(args.root).load(rebuild=args.rebuild)
+    loaded = time.perf_counter()
+    filters = {name: value for name, value in (('test_type', args.test_type), ('percent', args.percent),
+                                               ('date', args.date), ('cpu', args.cpu)) if value}
+    rows = store.group_mean(args.metric, args.by, **filters)
+    done = time.perf_counter()
+
+    print(''.join(f"{name:>12}" for name in args.by) + f"{'%' + args.metric:>10}{'rows':>8}")
+    for key, mean, count in rows:
+        print(''.join(f"{str(value):>12}" for value in key) + f"{mean:>10.2f}{count:>8}")
+    print(f"\n{len(store.runs)} runs, {len(store)} rows ({store.reparsed} CSVs parsed); "
+          f"load {(loaded - start) * 1000:.1f}ms, query {(done - loaded) * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,84 +1,188 @@
-import re
 import csv
+import time
 import argparse
 import os.path
 
-def parse_sar_log(input_file, output_file):
+HEADERS = ['Timestamp', 'CPU', 'usr', 'nice', 'sys', 'iowait', 'steal', 'irq', 'soft', 'guest', 'gnice', 'idle']
+# Summary lines at the end of a sar run (pt_BR and C locales)
+SUMMARY_PREFIXES = ('Média:', 'Media:', 'Average:')
+
+
+def iter_lines(f, follow=False, poll_interval=0.2, idle_timeout=None):
     """
-    Parse SAR log file and convert to CSV
-    
+    Yield lines from an open file, optionally following it as it grows
+
     Args:
-    input_file (str): Path to the input SAR log file
-    output_file (str): Path to the output CSV file
+    f (file): Open text file
+    follow (bool): Keep waiting for new lines instead of stopping at EOF
+    poll_interval (float): Seconds between checks for new data when following
+    idle_timeout (float): Stop following after this many seconds without new data
+
+    Following also stops when sar prints its summary (Média:/Average:) lines.
     """
-    # Read the input file and replace special character
-    with open(input_file, 'r', encoding='utf-8') as f:
-        content = [line.replace('é', 'e') for line in f.readlines()]
-    
-    # Prepare CSV rows
-    csv_rows = []
-    headers = ['Timestamp', 'CPU', 'usr', 'nice', 'sys', 'iowait', 'steal', 'irq', 'soft', 'guest', 'gnice', 'idle']
-    
-    # Track the current timestamp
-    current_timestamp = None
-    
-    # Parse the log file
-    for line in content:
-        # Skip lines with Linux header or other metadata
-        if 'CPU' in line or 'Media:' in line:
-            continue
-        
-        # Match timestamp lines
-        timestamp_match = re.match(r'(\d{2}:\d{2}:\d{2})\s+CPU', line)
-        if timestamp_match:
-            current_timestamp = timestamp_match.group(1)
+    pending = ''
+    idle_since = time.monotonic()
+    while True:
+        line = f.readline()
+        if line:
+            if not line.endswith('\n') and follow:
+                # Partial line still being written
+                pending += line
+                continue
+            line = pending + line
+            pending = ''
+            idle_since = time.monotonic()
+            yield line
+            if follow and line.startswith(SUMMARY_PREFIXES):
+                return
             continue
-        
-        elements = line.split()
-        if len(elements) < 2:
-#           print("The input line does not contain enough data.")
-            print(".")
-        else:
-            # Output the results
-            row = [
-                elements[0],  # Timestamp
-                elements[1],  # CPU identifier
-                float(elements[2].replace(',','.')),  # usr
-                float(elements[3].replace(',','.')),  # nice
-                float(elements[4].replace(',','.')),  # sys
-                float(elements[5].replace(',','.')),  # iowait
-                float(elements[6].replace(',','.')),  # steal
-                float(elements[7].replace(',','.')),  # irq
-                float(elements[8].replace(',','.')),  # soft
-                float(elements[9].replace(',','.')),  # guest
-                float(elements[10].replace(',','.')),  # gnice
-                float(elements[11].replace(',','.'))  # idle
-            ]
-            csv_rows.append(row)
-    
-    # Write to CSV
+        if not follow:
+            if pending:
+                yield pending
+            return
+        if idle_timeout is not None and time.monotonic() - idle_since > idle_timeout:
+            return
+        time.sleep(poll_interval)
+
+
+def parse_sar_line(line):
+    """
+    Parse one line of `sar -u ALL -P ALL` output into a CSV row
+
+    Returns None for headers, summaries, blank lines and anything else that is
+    not a per-CPU sample.
+    """
+    if 'CPU' in line or line.startswith(SUMMARY_PREFIXES):
+        return None
+    elements = line.split()
+    if len(elements) < 12:
+        return None
+    try:
+        return [elements[0], elements[1]] + [float(value.replace(',', '.')) for value in elements[2:12]]
+    except ValueError:
+        return None
+
+
+def parse_sar_lines(lines):
+    """Generator turning sar output lines into CSV rows as they arrive"""
+    for line in lines:
+        row = parse_sar_line(line)
+        if row is not None:
+            yield row
+
+
+def iter_seconds(rows):
+    """Group consecutive rows by timestamp, yielding (timestamp, rows) once a second is complete"""
+    current = None
+    group = []
+    for row in rows:
+        if row[0] != current and group:
+            yield current, group
+            group = []
+        current = row[0]
+        group.append(row)
+    if group:
+        yield current, group
+
+
+def second_summary(timestamp, group):
+    """One-line aggregate for a second of samples, based on the 'all' row"""
+    total = next((row for row in group if row[1] == 'all'), None)
+    if total is None:
+        return f"{timestamp}  {len(group)} CPUs"
+    busy = 100.0 - total[11]
+    return (f"{timestamp}  busy {busy:6.2f}%  usr {total[2]:6.2f}%  sys {total[4]:6.2f}%  "
+            f"irq {total[7]:6.2f}%  soft {total[8]:6.2f}%")
+
+
+def write_csv_rows(rows, output_file, flush=False, on_second=None, headers=HEADERS):
+    """
+    Write rows to CSV as they arrive
+
+    Args:
+    rows (iterable): CSV rows from parse_sar_lines
+    output_file (str): Path to the output CSV file
+    flush (bool): Flush after every second so readers see rows immediately
+    on_second (callable): Called with (timestamp, rows) for every complete second
+    headers (list): CSV header, for rows carrying extra columns
+
+    Returns the number of rows written.
+    """
+    count = 0
     with open(output_file, 'w', newline='') as f:
         csv_writer = csv.writer(f)
         csv_writer.writerow(headers)
-        csv_writer.writerows(csv_rows)
-    
+        for timestamp, group in iter_seconds(rows):
+            csv_writer.writerows(group)
+            count += len(group)
+            if flush:
+                f.flush()
+            if on_second is not None:
+                on_second(timestamp, group)
+    return count
+
+
+def parse_sar_log(input_file, output_file, follow=False, idle_timeout=None):
+    """
+    Parse SAR log file and convert to CSV
+
+    Args:
+    input_file (str): Path to the input SAR log file
+    output_file (str): Path to the output CSV file
+    follow (bool): Tail a growing file and print per-second aggregates
+    idle_timeout (float): Stop following after this many seconds without new data
+    """
+    on_second = None
+    if follow:
+        on_second = lambda timestamp, group: print(second_summary(timestamp, group))
+    with open(input_file, 'r', encoding='utf-8', errors='replace') as f:
+        lines = iter_lines(f, follow=follow, idle_timeout=idle_timeout)
+        count = write_csv_rows(parse_sar_lines(lines), output_file, flush=follow, on_second=on_second)
+
     print(f"Parsed SAR log saved to {output_file}")
-    print(f"Total rows parsed: {len(csv_rows)}")
+    print(f"Total rows parsed: {count}")
+    return count
+
+
+def benchmark(input_file, repeat=200):
+    """Measure parser throughput in lines/second over an in-memory copy of the file"""
+    with open(input_file, 'r', encoding='utf-8', errors='replace') as f:
+        lines = f.readlines()
+    total = len(lines) * repeat
+    start = time.perf_counter()
+    rows = 0
+    for _ in range(repeat):
+        for _ in parse_sar_lines(lines):
+            rows += 1
+    elapsed = time.perf_counter() - start
+    print(f"Parsed {total} lines ({rows} rows) in {elapsed:.3f}s: {total / elapsed:,.0f} lines/s")
+    return total / elapsed
+
 
 def main():
     # Configure argument parser
     parser = argparse.ArgumentParser(description='Parse SAR log file and convert to CSV')
     parser.add_argument('input_file', help='Path to the input SAR log file')
     parser.add_argument('-o', '--output', help='Path to the output CSV file (optional)')
-    
+    parser.add_argument('-f', '--follow', action='store_true',
+                        help='Tail a growing SAR file, writing rows and per-second aggregates live')
+    parser.add_argument('--idle-timeout', type=float, default=None,
+                        help='Stop following after this many seconds without new data')
+    parser.add_argument('--bench', action='store_true',
+                        help='Measure parser throughput in lines/second')
+
     # Parse arguments
     args = parser.parse_args()
-    
+
     # Validate input file
     if not os.path.exists(args.input_file):
         print(f"Error: Input file '{args.input_file}' does not exist")
         return
-    
+
+    if args.bench:
+        benchmark(args.input_file)
+        return
+
     # Generate output filename if not provided
     if args.output:
         output_file = args.output
@@ -86,9 +190,9 @@ def main():
         # Use input filename with .csv extension
         base_name = os.path.splitext(args.input_file)[0]
         output_file = f"{base_name}.csv"
-    
+
     # Process the file
-    parse_sar_log(args.input_file, output_file)
+    parse_sar_log(args.input_file, output_file, follow=args.follow, idle_timeout=args.idle_timeout)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
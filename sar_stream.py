@@ -0,0 +1,167 @@
+import os
+import threading
+import subprocess
+import argparse
+
+from clock_sync import SarTimeline, parse_sar_date
+from sar_parse import HEADERS, parse_sar_lines, write_csv_rows, second_summary
+
+# ISO dates in the header, so the run date is unambiguous in any locale
+SAR_COMMAND = 'S_TIME_FORMAT=ISO sar -u ALL -P ALL 1 -t {count}'
+
+
+def ssh_lines(ssh, command):
+    """
+    Run a command on an exec channel and yield its stdout lines as they arrive
+
+    Args:
+    ssh (paramiko.SSHClient): Connected SSH client
+    command (str): Remote command
+    """
+    stdin, stdout, stderr = ssh.exec_command(command, bufsize=1)
+    stdin.close()
+    try:
+        for line in stdout:
+            yield line
+    except GeneratorExit:
+        # Closed early: without its channel the command fails on its next write
+        stdout.channel.close()
+        raise
+    status = stdout.channel.recv_exit_status()
+    if status != 0:
+        print(f"Remote command '{command}' exited with status {status}: {stderr.read().decode().strip()}")
+
+
+def process_lines(command):
+    """Run a local command (stand-in for the remote host) and yield its stdout lines"""
+    process = subprocess.Popen(
+        command,
+        shell=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        encoding='utf-8',
+        errors='replace',
+        bufsize=1
+    )
+    try:
+        for line in process.stdout:
+            yield line
+    finally:
+        process.stdout.close()
+        if process.wait() != 0:
+            print(f"Local command '{command}' exited with status {process.returncode}: {process.stderr.read().strip()}")
+        process.stderr.close()
+
+
+class SarCollector:
+    """
+    Parse streamed sar output in a background thread
+
+    Rows go to the CSV as each second completes and the raw text is kept next
+    to it, so no temporary file, chmod, SFTP copy or parser process is needed.
+
+    Args:
+    lines (iterable): sar stdout lines, from ssh_lines or process_lines
+    csv_file (str): Output CSV path
+    raw_file (str): Optional path for the raw sar text
+    verbose (bool): Print the per-second aggregate of every sample
+    clock (dict): Clock estimate from clock_sync.estimate_clock; when given,
+        every row gets an 'epoch' column on the client timeline
+    """
+
+    def __init__(self, lines, csv_file, raw_file=None, verbose=False, clock=None):
+        self.lines = lines
+        self.csv_file = csv_file
+        self.raw_file = raw_file
+        self.verbose = verbose
+        self.clock = clock
+        self.date = None
+        self.timeline = None
+        self.rows = 0
+        self.seconds = 0
+        self.error = None
+        self.first_sample = threading.Event()
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def _tee(self, raw):
+        for line in self.lines:
+            if raw is not None:
+                raw.write(line)
+            if self.date is None:
+                self.date = parse_sar_date(line)
+                if self.date is not None and self.clock is not None:
+                    self.timeline = SarTimeline(self.date, self.clock)
+            yield line
+            # sar ends each interval with a blank line, so stopping there keeps whole seconds
+            if self.stopping.is_set() and not line.strip():
+                break
+
+    def _stamp(self, rows):
+        for row in rows:
+            yield row + [round(self.timeline.epoch(row[0]), 3) if self.timeline else '']
+
+    def _on_second(self, timestamp, group):
+        self.seconds += 1
+        self.first_sample.set()
+        if self.verbose:
+            print(second_summary(timestamp, group))
+
+    def _run(self):
+        raw = None
+        try:
+            if self.raw_file:
+                raw = open(self.raw_file, 'w', encoding='utf-8')
+            rows = parse_sar_lines(self._tee(raw))
+            headers = HEADERS
+            if self.clock is not None:
+                rows = self._stamp(rows)
+                headers = HEADERS + ['epoch']
+            self.rows = write_csv_rows(rows, self.csv_file, flush=True, on_second=self._on_second,
+                                       headers=headers)
+        except Exception as e:
+            self.error = e
+            print(f"Error while streaming SAR output: {e}")
+        finally:
+            if raw is not None:
+                raw.close()
+            if self.stopping.is_set() and hasattr(self.lines, 'close'):
+                self.lines.close()
+
+    def stop(self):
+        """End the stream after the current interval and close the sar channel"""
+        self.stopping.set()
+
+    def join(self, timeout=None):
+        """Wait for the stream to end; True when it finished without errors"""
+        self.thread.join(timeout)
+        return not self.thread.is_alive() and self.error is None
+
+
+def start_remote_sar(ssh, results_dir, file_suffix, count=60, verbose=False, clock=None):
+    """Start sar on the remote host and stream it into results_dir/sar_output_{file_suffix}.txt/.csv"""
+    base_name = os.path.join(results_dir, f'sar_output_{file_suffix}')
+    lines = ssh_lines(ssh, SAR_COMMAND.format(count=count))
+    return SarCollector(lines, f'{base_name}.csv', f'{base_name}.txt', verbose, clock).start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stream sar output from a local command into CSV')
+    parser.add_argument('command', nargs='?', default=SAR_COMMAND.format(count=10),
+                        help='Command producing sar output (default: local sar for 10s)')
+    parser.add_argument('-o', '--output', default='sar_output_local.csv', help='Output CSV file')
+    parser.add_argument('--raw', help='Also keep the raw sar text in this file')
+    args = parser.parse_args()
+
+    collector = SarCollector(process_lines(args.command), args.output, args.raw, verbose=True).start()
+    collector.join()
+    print(f"Streamed SAR output saved to {args.output}")
+    print(f"Total rows parsed: {collector.rows}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+import sys
+import shlex
+import argparse
+import threading
+import subprocess
+from collections import namedtuple
+
+CommandResult = namedtuple('CommandResult', ['status', 'stdout', 'stderr'])
+
+
+class SSHSession:
+    """
+    One authenticated SSH connection reused for a whole test sweep
+
+    Every command runs on its own exec channel, so it gets a real exit status
+    instead of text typed into an interactive `sudo su -` shell. Root commands
+    go through `sudo -S` with the password on the channel's stdin. When the
+    transport dies the session reconnects and retries the command once.
+
+    The session also exposes exec_command() and get_transport(), so it can be
+    passed anywhere a paramiko.SSHClient is expected (sar_stream, samplers).
+
+    Args:
+    hostname, username, password: Server credentials
+    port (int): SSH port
+    timeout (float): Connect timeout in seconds
+    client_factory (callable): Returns an unconnected client; defaults to a
+        paramiko.SSHClient, LocalClient runs everything on this machine
+    """
+
+    def __init__(self, hostname, username, password, port=22, timeout=10, client_factory=None):
+        self.hostname = hostname
+        self.username = username
+        self.password = password
+        self.port = port
+        self.timeout = timeout
+        self.client_factory = client_factory or paramiko_client
+        self.client = None
+        self.connects = 0
+        self.lock = threading.Lock()
+
+    def active(self):
+        if self.client is None:
+            return False
+        transport = self.client.get_transport()
+        return transport is not None and transport.is_active()
+
+    def connect(self):
+        """Connect if needed and return the underlying client"""
+        with self.lock:
+            if not self.active():
+                self.close()
+                print(f"Connecting to {self.hostname}...")
+                client = self.client_factory()
+                client.connect(hostname=self.hostname, port=self.port, username=self.username,
+                               password=self.password, timeout=self.timeout)
+                self.client = client
+                self.connects += 1
+                print("Successfully connected!")
+            return self.client
+
+    def close(self):
+        if self.client is not None:
+            try:
+                self.client.close()
+            except Exception:
+                pass
+            self.client = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _retry(self, action):
+        """Run action(client), reconnecting once if the transport went away"""
+        try:
+            return action(self.connect())
+        except Exception:
+            if self.active():
+                raise
+            print(f"Connection to {self.hostname} lost, reconnecting...")
+            return action(self.connect())
+
+    def sudo_command(self, command):
+        return f"sudo -S -p '' sh -c {shlex.quote(command)}"
+
+    def exec_command(self, command, bufsize=-1, sudo=False):
+        """paramiko-compatible exec_command on a fresh channel, optionally as root"""
+        if sudo:
+            command = self.sudo_command(command)
+
+        def action(client):
+            stdin, stdout, stderr = client.exec_command(command, bufsize=bufsize)
+            if sudo:
+                stdin.write(self.password + '\n')
+                stdin.flush()
+            return stdin, stdout, stderr
+        return self._retry(action)
+
+    def get_transport(self):
+        return self.connect().get_transport()
+
+    def run(self, command, sudo=False):
+        """
+        Run a command to completion
+
+        Returns a CommandResult with the exit status and decoded stdout/stderr.
+        """
+        def action(client):
+            stdin, stdout, stderr = client.exec_command(self.sudo_command(command) if sudo else command)
+            if sudo:
+                stdin.write(self.password + '\n')
+                stdin.flush()
+            stdin.close()
+            output = stdout.read().decode(errors='replace')
+            error = stderr.read().decode(errors='replace')
+            return CommandResult(stdout.channel.recv_exit_status(), output, error)
+        return self._retry(action)
+
+
+def paramiko_client():
+    import paramiko
+    client = paramiko.SSHClient()
+    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    return client
+
+
+class LocalChannel:
+    """paramiko Channel stand-in backed by a local shell process"""
+
+    def __init__(self):
+        self.process = None
+
+    def exec_command(self, command):
+        self.process = subprocess.Popen(command, shell=True, stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def makefile(self, mode='rb', bufsize=-1):
+        return self.process.stdout
+
+    def makefile_stderr(self, mode='rb', bufsize=-1):
+        return self.process.stderr
+
+    def makefile_stdin(self, mode='wb', bufsize=-1):
+        return LocalStdin(self.process.stdin)
+
+    def recv_exit_status(self):
+        return self.process.wait()
+
+    def close(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.kill()
+
+
+class LocalStdin:
+    """Text-accepting wrapper over a process stdin pipe, like paramiko's ChannelFile"""
+
+    def __init__(self, pipe):
+        self.pipe = pipe
+
+    def write(self, data):
+        self.pipe.write(data.encode() if isinstance(data, str) else data)
+
+    def flush(self):
+        self.pipe.flush()
+
+    def close(self):
+        self.pipe.close()
+
+
+class LocalStdout:
+    """stdout pipe with the .channel attribute paramiko's ChannelFile has"""
+
+    def __init__(self, channel, pipe):
+        self.channel = channel
+        self.pipe = pipe
+
+    def read(self, size=-1):
+        return self.pipe.read(size)
+
+    def readline(self):
+        return self.pipe.readline()
+
+    def __iter__(self):
+        for line in self.pipe:
+            yield line.decode(errors='replace')
+
+
+class LocalTransport:
+    def __init__(self):
+        self.alive = True
+        self.channels = 0
+
+    def is_active(self):
+        return self.alive
+
+    def open_session(self):
+        self.channels += 1
+        return LocalChannel()
+
+
+class LocalClient:
+    """
+    In-process stand-in for paramiko.SSHClient running commands on this machine
+
+    Used to exercise SSHSession and the collectors without an SSH server;
+    setting transport.alive = False simulates a dropped connection.
+    """
+
+    def __init__(self):
+        self.transport = None
+
+    def connect(self, **kwargs):
+        self.transport = LocalTransport()
+
+    def get_transport(self):
+        return self.transport
+
+    def exec_command(self, command, bufsize=-1):
+        if self.transport is None or not self.transport.alive:
+            raise EOFError('transport closed')
+        channel = self.transport.open_session()
+        channel.exec_command(command)
+        return (channel.makefile_stdin(), LocalStdout(channel, channel.process.stdout),
+                LocalStdout(channel, channel.process.stderr))
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.alive = False
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run commands over one persistent SSH session')
+    parser.add_argument('commands', nargs='+', help='Commands to run, each on its own exec channel')
+    parser.add_argument('--host', default='192.168.0.72', help='SSH server')
+    parser.add_argument('--user', default='user', help='SSH user')
+    parser.add_argument('--password', default='pass', help='SSH and sudo password')
+    parser.add_argument('--sudo', action='store_true', help='Run the commands as root')
+    parser.add_argument('--local', action='store_true', help='Run on this machine instead of over SSH')
+    args = parser.parse_args()
+
+    with SSHSession(args.host, args.user, args.password,
+                    client_factory=LocalClient if args.local else None) as session:
+        status = 0
+        for command in args.commands:
+            result = session.run(command, sudo=args.sudo)
+            sys.stdout.write(result.stdout)
+            sys.stderr.write(result.stderr)
+            print(f"[{command}] exit status {result.status}")
+            status = status or result.status
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+import os
+import sys
+import json
+import argparse
+
+import numpy as np
+
+from cpu_cost import client_series, has_epoch
+from results_store import METRICS, read_sar_csv
+
+SUMMARY_FIELDS = ['usr', 'sys', 'irq', 'soft', 'idle']
+
+
+def steady_window(values, window=5, tolerance=0.1, sigmas=3.0, spread=2.0):
+    """
+    Steady-state part of a time series by rolling mean and variance against its loaded level
+
+    The loaded level is the median of the middle half of the series and its
+    noise sigma = 1.4826 * MAD there. A rolling window of `window` samples is
+    steady when its mean is within level +- max(sigmas * sigma / sqrt(window),
+    tolerance * level), so it catches ramps and spikes above the level as
+    well as idle samples below it, and its standard deviation is at most
+    `spread` times the median one of the middle half, so windows straddling
+    a transition fail too. The window runs from the first to the last steady
+    rolling window, tightened to the first and last of their samples within
+    one sigma of the level (at least tolerance * level).
+
+    Returns (start, end) indexes (end exclusive), or None when the series is
+    shorter than two windows or never settles.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) < 2 * window:
+        return None
+    middle = values[len(values) // 4:len(values) - len(values) // 4]
+    level = np.median(middle)
+    sigma = 1.4826 * np.median(np.abs(middle - level))
+    kernel = np.ones(window) / window
+    means = np.convolve(values, kernel, mode='valid')
+    deviations = np.sqrt(np.maximum(np.convolve(values * values, kernel, mode='valid') - means * means, 0.0))
+    band = max(sigmas * sigma / np.sqrt(window), tolerance * abs(level), 1e-9)
+    typical = np.median(deviations[len(deviations) // 4:len(deviations) - len(deviations) // 4])
+    steady = np.flatnonzero((np.abs(means - level) <= band) & (deviations <= max(spread * typical, 1e-9)))
+    if not len(steady):
+        return None
+    start, end = int(steady[0]), int(steady[-1]) + window
+    # Drop the idle or ramp samples the boundary windows still hold
+    near = max(sigma, tolerance * abs(level), 1e-9)
+    head = np.flatnonzero(np.abs(values[start:start + window] - level) <= near)
+    tail = np.flatnonzero(np.abs(values[end - window:end] - level) <= near)
+    if len(head):
+        start += int(head[0])
+    if len(tail):
+        end += int(tail[-1]) + 1 - window
+    return start, end
+
+
+def synthetic_run(seed=0):
+    """
+    Busy series of a typical run with known boundaries, for checking steady_window
+
+    10 idle samples, a 3 sample restart spike, a 40 sample plateau and a
+    7 sample drain. Returns (values, (start, end)) with the plateau bounds.
+    """
+    rng = np.random.default_rng(seed)
+    values = np.concatenate([rng.normal(1.0, 0.3, 10), [60.0, 55.0, 50.0], rng.normal(30.0, 2.0, 40),
+                             [12.0, 4.0], rng.normal(1.0, 0.3, 5)])
+    return values, (13, 53)
+
+
+def run_series(results_dir, suffix):
+    """
+    CPU and QPS per second of a run on one time base
+
+    Returns (time_base, (cpu times, all-row metrics), (qps seconds, answered)
+    or None); the time base is 'epoch' for clock-stamped sar CSVs, otherwise
+    'time_of_day'.
+    """
+    sar_file = os.path.join(results_dir, f'sar_output_{suffix}.csv')
+    epoch = has_epoch(sar_file)
+    times, cpus, values = read_sar_csv(sar_file, 'epoch' if epoch else 'Timestamp')
+    aggregate = cpus == -1
+    load_file = os.path.join(results_dir, f'load_{suffix}.json')
+    qps = client_series(load_file, epoch) if os.path.exists(load_file) else None
+    return 'epoch' if epoch else 'time_of_day', (times[aggregate], values[aggregate]), qps
+
+
+def metadata_file(results_dir, suffix):
+    """The run's results JSON: load_ for native runs, process_ otherwise"""
+    for name in (f'load_{suffix}.json', f'process_{suffix}.json'):
+        path = os.path.join(results_dir, name)
+        if os.path.exists(path):
+            return path
+    return os.path.join(results_dir, f'steady_{suffix}.json')
+
+
+def detect_run(results_dir, suffix, window=5, tolerance=0.1):
+    """
+    Steady window of a run: the intersection of the CPU and QPS steady windows
+
+    Returns the metadata dict with the boundaries, the trimmed warm-up and
+    cool-down lengths and the CPU/QPS summaries over the steady window only,
+    or None when no steady window was found.
+    """
+    time_base, (times, values), qps = run_series(results_dir, suffix)
+    if not len(times):
+        return None
+    busy = 100.0 - values[:, METRICS.index('idle')]
+    cpu_window = steady_window(busy, window, tolerance)
+    if cpu_window is None:
+        return None
+    start, end = times[cpu_window[0]], times[cpu_window[1] - 1]
+    result = {'time_base': time_base, 'window': window, 'tolerance': tolerance,
+              'cpu': [float(start), float(end)]}
+    if qps is not None:
+        seconds, answered = qps
+        qps_window = steady_window(answered, window, tolerance)
+        if qps_window is not None:
+            result['qps'] = [float(seconds[qps_window[0]]), float(seconds[qps_window[1] - 1])]
+            start = max(start, seconds[qps_window[0]])
+            end = min(end, seconds[qps_window[1] - 1])
+    if end < start:
+        return None
+    result['start'] = float(start)
+    result['end'] = float(end)
+    result['warmup_seconds'] = round(float(start - times[0]), 3)
+    result['cooldown_seconds'] = round(float(times[-1] - end), 3)
+
+    steady = in_window(times, result)
+    result['samples'] = int(steady.sum())
+    result['summary'] = {field: round(float(values[steady, METRICS.index(field)].mean()), 2)
+                         for field in SUMMARY_FIELDS}
+    result['summary']['busy'] = round(float(busy[steady].mean()), 2)
+    if qps is not None:
+        seconds, answered = qps
+        selected = in_window(seconds, result)
+        if selected.any():
+            result['summary']['qps'] = round(float(answered[selected].mean()), 1)
+    return result
+
+
+def record_run(results_dir, suffix, window=5, tolerance=0.1):
+    """Detect the steady window of a run and store it as 'steady_state' in the run's results JSON"""
+    steady = detect_run(results_dir, suffix, window, tolerance)
+    path = metadata_file(results_dir, suffix)
+    data = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            data = json.load(f)
+    data['steady_state'] = steady
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+    return steady
+
+
+def load_window(results_dir, suffix):
+    """The recorded steady window of a run, or None"""
+    path = metadata_file(results_dir, suffix)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f).get('steady_state')
+
+
+def in_window(times, steady):
+    """Boolean mask of the times inside a steady window (all True without one)"""
+    times = np.asarray(times)
+    if not steady:
+        return np.ones(len(times), dtype=bool)
+    return (times >= steady['start']) & (times <= steady['end'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Detect and record the steady-state window of runs')
+    parser.add_argument('results_dir', nargs='?', help='Results directory (e.g. results_20250416)')
+    parser.add_argument('suffixes', nargs='*', help='Run suffixes (default: every sar_output_*.csv)')
+    parser.add_argument('--window', type=int, default=5, help='Rolling window in samples (default: 5)')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='Minimum band around the loaded level, relative (default: 0.1)')
+    parser.add_argument('--dry-run', action='store_true', help='Only print, do not write the results JSON')
+    parser.add_argument('--synthetic', action='store_true',
+                        help='Check the detector on a synthetic idle/spike/plateau/drain series and exit')
+    args = parser.parse_args()
+
+    if args.synthetic:
+        values, expected = synthetic_run()
+        found = steady_window(values, args.window, args.tolerance)
+        print(f"Synthetic run: expected {expected}, found {found}")
+        sys.exit(0 if found == expected else 1)
+    if not args.results_dir:
+        parser.error('results_dir is required')
+
+    suffixes = args.suffixes or sorted(name[len('sar_output_'):-len('.csv')]
+                                       for name in os.listdir(args.results_dir)
+                                       if name.startswith('sar_output_') and name.endswith('.csv'))
+    for suffix in suffixes:
+        if args.dry_run:
+            steady = detect_run(args.results_dir, suffix, args.window, args.tolerance)
+        else:
+            steady = record_run(args.results_dir, suffix, args.window, args.tolerance)
+        if steady is None:
+            print(f"{suffix}: no steady state found")
+            continue
+        summary = steady['summary']
+        print(f"{suffix}: warm-up {steady['warmup_seconds']:g}s  cool-down {steady['cooldown_seconds']:g}s  "
+              f"{steady['samples']} steady samples  busy {summary['busy']}%  soft {summary['soft']}%"
+              + (f"  qps {summary['qps']}" if 'qps' in summary else ''))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,15 @@
 import paramiko
 import time
-import subprocess
 from datetime import datetime
 import os
 import sys
 import argparse
 
+from dns_load import run_native_load, save_stats
+from sar_stream import start_remote_sar
+from tool_output import DnspyreParser, RequestLogMonitor, save_record, stream_command
+from workload import check_spec, prepare
+
 def parse_arguments():
     """Parse command line arguments"""
     parser = argparse.ArgumentParser(description='Execute DNS performance tests.')
@@ -13,6 +17,14 @@ def parse_arguments():
                        help='Type of test to be executed')
     parser.add_argument('malicious_percent', type=int, choices=[10, 20, 30, 40, 50, 60, 70, 80, 90],
                        help='Percentage of malicious domains in the test (10, 30, or 50)')
+    parser.add_argument('--engine', choices=['native', 'dnspyre'], default='native',
+                       help='Load generator to use (default: native)')
+    parser.add_argument('--max-error-rate', type=float, default=None,
+                       help='Abort dnspyre runs whose failure rate exceeds this (e.g. 0.2); enables its request log')
+    parser.add_argument('--server', default='192.168.0.72',
+                       help='DNS server under test, also reached over SSH (default: 192.168.0.72)')
+    parser.add_argument('--workload', default=None,
+                       help='Workload spec (JSON, see workload.py) for the qtype, EDNS and repeated-name mix')
     return parser.parse_args()
 
 def get_process_pid(ssh, process_name):
@@ -21,41 +33,23 @@ def get_process_pid(ssh, process_name):
     pid = stdout.read().decode().strip()
     return pid if pid else None
 
-def execute_local_command(command):
-    """Execute command on local machine with better encoding handling"""
+def execute_local_command(command, output_file=None, parser=None, monitor=None):
+    """Execute command on local machine, streaming its output to a file, a parser and an abort monitor"""
     try:
-        process = subprocess.Popen(
-            command,
-            shell=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            encoding='latin-1'
-        )
-        stdout, stderr = process.communicate()
-        if process.returncode != 0:
-            print(f"Error executing local command: {stderr}")
+        result = stream_command(command, output_file, parser, monitor)
+        if result.aborted:
+            print(f"Aborted local command: {result.aborted}")
+            return False
+        if result.status != 0:
+            print("Error executing local command: " + "\n".join(result.tail[-5:]))
             return False
         return True
     except Exception as e:
         print(f"Error executing local command: {e}")
         return False
 
-def parse_sar_file(results_dir, sar_filename, output_suffix):
-    """Execute SAR parser script on the downloaded file"""
-    try:
-        sar_input = os.path.join(results_dir, sar_filename)
-        sar_output = os.path.join(results_dir, f'sar_output_{output_suffix}.csv')
-        parser_cmd = f'python3 sar_parse.py {sar_input} -o {sar_output}'
-        
-        print("\nExecuting SAR parser...")
-        if execute_local_command(parser_cmd):
-            print(f"SAR parsing completed successfully. CSV output saved to {sar_output}")
-        else:
-            print("Failed to parse SAR output")
-    except Exception as e:
-        print(f"Error during SAR parsing: {e}")
-
-def execute_ssh_commands(hostname, username, password, test_type, malicious_percent):
+def execute_ssh_commands(hostname, username, password, test_type, malicious_percent, engine='native',
+                         max_error_rate=None, workload=None):
     try:
         # Initialize SSH client
         ssh = paramiko.SSHClient()
@@ -103,55 +97,56 @@ def execute_ssh_commands(hostname, username, password, test_type, malicious_perc
         channel.send(f'/usr/bin/systemctl restart named \n')
         time.sleep(2)
 
-        # Execute SAR command in background - with unique filename
-        sar_output = f'/tmp/sar_output_{file_suffix}.txt'
+        # Stream SAR output over an exec channel straight into the results directory
         print("Executing SAR command...")
-        channel.send(f'sar -u ALL -P ALL 1 -t 60 > {sar_output} &\n')
+        sar_collector = start_remote_sar(ssh, local_results_dir, file_suffix, count=60)
         time.sleep(1)
 
-        # Start local dnspyre command
-        print("Starting local dnspyre command...")
-        try:
-            dnspyre_cmd = f'dnspyre -d 60s -c 40000 --server 192.168.0.72 --request-delay="1ms" --separate-worker-connections @output/domain_{malicious_percent}.txt'
-            if not execute_local_command(dnspyre_cmd):
-                print("Failed to execute dnspyre command")
-        except Exception as e:
-            print(f"Error during dnspyre execution: {e}")
+        # Queries of the run: the domain file as is, or the workload mix built from it
+        domain_file = f'output/domain_{malicious_percent}.txt'
+        tool_options = ''
+        if workload:
+            domain_file, tool_options = prepare(workload, domain_file, local_results_dir, file_suffix, engine)
 
-        time.sleep(1)
-       
-        # Change permissions of output files
-        channel.send(f'chmod 644 {sar_output}\n')
-        time.sleep(1)
-        
-        # Use SCP to copy files from remote to local
-        print("\nCopying result files from remote host...")
-        
-        # Create SFTP client
-        sftp = ssh.open_sftp()
-        
-        # List of files to copy with new names including test type
-        remote_files = [
-            (sar_output, f'{local_results_dir}/sar_output_{file_suffix}.txt')
-        ]
-        
-        # Copy each file
-        for remote_path, local_path in remote_files:
+        # Start local load generator
+        if engine == 'native':
+            print("Starting native load generator...")
             try:
-                sftp.get(remote_path, local_path)
-                print(f"Successfully copied {remote_path} to {local_path}")
+                load_stats = run_native_load(hostname, domain_file, duration=60, concurrency=40000)
+                print(load_stats.summary())
+                save_stats(load_stats, f'{local_results_dir}/load_{file_suffix}.json')
             except Exception as e:
-                print(f"Error copying {remote_path}: {e}")
-        
-        # Close SFTP client
-        sftp.close()
-        
-        # Clean up remote temporary files
-        print("\nCleaning up remote temporary files...")
-        channel.send(f'rm -f {sar_output}\n')
-        
-        # Execute SAR parser on the downloaded file
-        parse_sar_file(local_results_dir, f'sar_output_{file_suffix}.txt', file_suffix)
+                print(f"Error during native load execution: {e}")
+        else:
+            print("Starting local dnspyre command...")
+            try:
+                request_log = f'requests_c_{file_suffix}.log'
+                log_requests = f' --log-requests --log-requests-path="{request_log}"' if max_error_rate is not None else ''
+                dnspyre_cmd = f'dnspyre -d 60s -c 40000 --server {hostname} --request-delay="1ms"{log_requests} --separate-worker-connections{tool_options} @{domain_file}'
+                dnspyre_parser = DnspyreParser()
+                monitor = None
+                if max_error_rate is not None:
+                    expected = malicious_percent / 100 if test_type == 'dnsfw_xdp' else 0.0
+                    monitor = RequestLogMonitor(request_log, max_error_rate, expected=expected)
+                dnspyre_ok = execute_local_command(dnspyre_cmd, f'{local_results_dir}/dnspyre_{file_suffix}.txt',
+                                                   dnspyre_parser, monitor)
+                save_record(f'{local_results_dir}/dnspyre_{file_suffix}.json', dnspyre_cmd,
+                            dnspyre_ok, dnspyre_parser, monitor)
+                if os.path.exists(request_log):
+                    os.replace(request_log, f'{local_results_dir}/{request_log}')
+                if not dnspyre_ok:
+                    print("Failed to execute dnspyre command")
+            except Exception as e:
+                print(f"Error during dnspyre execution: {e}")
+
+        time.sleep(1)
+       
+        # Wait for the SAR stream to finish
+        print("\nWaiting for SAR output...")
+        if sar_collector.join(timeout=90):
+            print(f"SAR streaming completed. CSV output saved to {sar_collector.csv_file}")
+        else:
+            print("Failed to stream SAR output")
         
         print("\nAll commands executed successfully!")
         print(f"Results have been saved in the '{local_results_dir}' directory")
@@ -173,8 +168,13 @@ if __name__ == "__main__":
     args = parse_arguments()
     
     # Connection parameters
-    hostname = "192.168.0.72" # DNS Server
+    hostname = args.server # DNS Server
     username = "user" 
     password = "pass"  
     
-    execute_ssh_commands(hostname, username, password, args.test_type, args.malicious_percent)
\ No newline at end of file
+    error = check_spec(args.workload, args.engine) if args.workload else None
+    if error:
+        print(f"Error: workload {args.workload}: {error}")
+        sys.exit(1)
+    execute_ssh_commands(hostname, username, password, args.test_type, args.malicious_percent, args.engine,
+                         args.max_error_rate, args.workload)
\ No newline at end of file
@@ -1,15 +1,32 @@
 import paramiko
 import time
-import subprocess
 from datetime import datetime
 import os
 import sys
 import argparse
 
+from dns_load import run_latency_probe, run_native_load, save_stats
+from latency_hist import import_request_log
+from sar_stream import start_remote_sar
+from tool_output import DnspyreParser, RequestLogMonitor, save_record, stream_command
+from workload import check_spec, prepare
+
 def parse_arguments():
     parser = argparse.ArgumentParser(description='Execute DNS performance tests.')
     parser.add_argument('test_type', choices=['dnsfw_no', 'dnsfw_rpz', 'dnsfw_xdp'],
                        help='Type of test to be executed')
+    parser.add_argument('--engine', choices=['native', 'dnspyre'], default='native',
+                       help='Latency client to use (default: native)')
+    parser.add_argument('--open-loop', action='store_true',
+                       help='Native open-loop run at the same 5 QPS, with coordinated-omission-corrected latency')
+    parser.add_argument('--log-requests', action='store_true',
+                       help='Keep the raw dnspyre request log (implies --engine dnspyre)')
+    parser.add_argument('--max-error-rate', type=float, default=None,
+                       help='Abort the dnspyre probe when its failure rate exceeds this (e.g. 0.2)')
+    parser.add_argument('--server', default='192.168.0.72',
+                       help='DNS server under test, also reached over SSH (default: 192.168.0.72)')
+    parser.add_argument('--workload', default=None,
+                       help='Workload spec (JSON, see workload.py) for the qtype, EDNS and repeated-name mix')
     return parser.parse_args()
 
 def get_process_pid(ssh, process_name):
@@ -18,41 +35,23 @@ def get_process_pid(ssh, process_name):
     pid = stdout.read().decode().strip()
     return pid if pid else None
 
-def execute_local_command(command):
-    """Execute command on local machine with better encoding handling"""
+def execute_local_command(command, output_file=None, parser=None, monitor=None):
+    """Execute command on local machine, streaming its output to a file, a parser and an abort monitor"""
     try:
-        process = subprocess.Popen(
-            command,
-            shell=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            encoding='latin-1'
-        )
-        stdout, stderr = process.communicate()
-        if process.returncode != 0:
-            print(f"Error executing local command: {stderr}")
+        result = stream_command(command, output_file, parser, monitor)
+        if result.aborted:
+            print(f"Aborted local command: {result.aborted}")
+            return False
+        if result.status != 0:
+            print("Error executing local command: " + "\n".join(result.tail[-5:]))
             return False
         return True
     except Exception as e:
         print(f"Error executing local command: {e}")
         return False
 
-def parse_sar_file(results_dir, sar_filename, output_suffix):
-    """Execute SAR parser script on the downloaded file"""
-    try:
-        sar_input = os.path.join(results_dir, sar_filename)
-        sar_output = os.path.join(results_dir, f'sar_output_{output_suffix}.csv')
-        parser_cmd = f'python3 sar_parse.py {sar_input} -o {sar_output}'
-        
-        print("\nExecuting SAR parser...")
-        if execute_local_command(parser_cmd):
-            print(f"SAR parsing completed successfully. CSV output saved to {sar_output}")
-        else:
-            print("Failed to parse SAR output")
-    except Exception as e:
-        print(f"Error during SAR parsing: {e}")
-
-def execute_ssh_commands(hostname, username, password, test_type):
+def execute_ssh_commands(hostname, username, password, test_type, engine='native', log_requests=False, open_loop=False,
+                         max_error_rate=None, workload=None):
     try:
         # Initialize SSH client
         ssh = paramiko.SSHClient()
@@ -92,82 +91,88 @@ def execute_ssh_commands(hostname, username, password, test_type):
         # Start local dnspyre command
         print("Executing dig command...")
         try:
-            dig_cmd = f'dig @192.168.0.72 sicredi.com.br'
+            dig_cmd = f'dig @{hostname} sicredi.com.br'
             if not execute_local_command(dig_cmd):
                 print("Failed to execute dig command")
         except Exception as e:
             print(f"Error during dig execution: {e}")
 
-        # Start local dnspyre command
-        print("Starting local dnspyre command...latency")
-        try:
-            #dnspyre_cmd = f'dnspyre -d 60s -c 100 --server 192.168.0.51 --request-delay="0s" --separate-worker-connections --log-requests --log-requests-path="requests_{test_type}.log" @domains.txt'
-            dnspyre_cmd = f'dnspyre -n 200 -c 5 --server 192.168.0.72 --request-delay="1s" --log-requests --log-requests-path="requests_l_{test_type}.log" @domains.txt'
-            if not execute_local_command(dnspyre_cmd):
-                print("Failed to execute dnspyre command")
-        except Exception as e:
-            print(f"Error during dnspyre execution: {e}")
+        # Queries of the probe: domains.txt as is, or the workload mix built from it
+        domain_file = 'domains.txt'
+        tool_options = ''
+        if workload:
+            domain_file, tool_options = prepare(workload, domain_file, local_results_dir, f'l_{test_type}', engine)
+
+        # Start local latency client
+        if engine == 'native':
+            print("Starting native latency probe...latency")
+            try:
+                if open_loop:
+                    # Same offered load as 5 workers x 200 requests with 1s delay
+                    load_stats = run_native_load(hostname, domain_file, qps=5, duration=200,
+                                                 concurrency=1000, sockets=5, open_loop=True)
+                else:
+                    load_stats = run_latency_probe(hostname, domain_file, workers=5, requests=200, delay=1.0)
+                print(load_stats.summary())
+                save_stats(load_stats, f'{local_results_dir}/latency_l_{test_type}.json')
+            except Exception as e:
+                print(f"Error during native latency probe: {e}")
+        else:
+            print("Starting local dnspyre command...latency")
+            try:
+                #dnspyre_cmd = f'dnspyre -d 60s -c 100 --server 192.168.0.51 --request-delay="0s" --separate-worker-connections --log-requests --log-requests-path="requests_{test_type}.log" @domains.txt'
+                dnspyre_cmd = f'dnspyre -n 200 -c 5 --server {hostname} --request-delay="1s" --log-requests --log-requests-path="requests_l_{test_type}.log"{tool_options} @{domain_file}'
+                # The probe already logs every request, so it can be stopped once it keeps failing
+                dnspyre_parser = DnspyreParser()
+                monitor = None
+                if max_error_rate is not None:
+                    monitor = RequestLogMonitor(f'requests_l_{test_type}.log', max_error_rate, min_requests=5)
+                dnspyre_ok = execute_local_command(dnspyre_cmd, f'{local_results_dir}/dnspyre_l_{test_type}.txt',
+                                                   dnspyre_parser, monitor)
+                save_record(f'{local_results_dir}/dnspyre_l_{test_type}.json', dnspyre_cmd,
+                            dnspyre_ok, dnspyre_parser, monitor)
+                if not dnspyre_ok:
+                    print("Failed to execute dnspyre command")
+            except Exception as e:
+                print(f"Error during dnspyre execution: {e}")
 
         time.sleep(1)
 
-        #Execute SAR command in background - with unique filename
-        sar_output = f'/tmp/sar_output_{test_type}.txt'
+        # Stream SAR output over an exec channel straight into the results directory
         print("Executing SAR command...")
-        channel.send(f'sar -u ALL -P ALL 1 -t 30 > {sar_output} &\n')
+        sar_collector = start_remote_sar(ssh, local_results_dir, test_type, count=30)
         time.sleep(1)
 
-        # Move requests.log to directory
-        print("Moving requests.log latency to directory...")
-        try:
-            # Move to results directory 
-            if not os.path.exists(local_results_dir):
-                os.makedirs(local_results_dir)
-            if not execute_local_command(f'mv requests_l_{test_type}.log {local_results_dir}/'):
-                print(f"Failed to move requests.log to {local_results_dir}")
-        except Exception as e:
-            print(f"Error moving requests.log: {e}")
+        if engine != 'native':
+            # Import the request log into a latency histogram
+            print("Importing requests.log latency into histogram...")
+            request_log = f'requests_l_{test_type}.log'
+            try:
+                histogram = import_request_log(request_log)
+                histogram.save(f'{local_results_dir}/latency_l_{test_type}.hdr')
+                print(f"Latency {histogram.summary()}")
+            except Exception as e:
+                print(f"Error importing requests.log: {e}")
 
-        time.sleep(1)          
-    
-        # Change permissions of output files to allow copying
-        if test_type == 'dnsfw_xdp':
-        #    channel.send(f'chmod 644 {sar_output} {pidstat_named_output} {pidstat_dnsfw_output}\n')
-            channel.send(f'chmod 644 {sar_output}\n')
-        else:
-            channel.send(f'chmod 644 {sar_output} \n')
-        time.sleep(1)
-        
-        # Use SCP to copy files from remote to local
-        print("\nCopying result files from remote host...")
-        
-        # Create SFTP client
-        sftp = ssh.open_sftp()
-        
-        # List of files to copy with new names including test type
-        remote_files = [
-            (sar_output, f'{local_results_dir}/sar_output_{test_type}.txt')
-        ]
-               
-        # Copy each file
-        for remote_path, local_path in remote_files:
+            # Move requests.log to directory, or drop it when the raw log is not wanted
             try:
-                sftp.get(remote_path, local_path)
-                print(f"Successfully copied {remote_path} to {local_path}")
+                if log_requests:
+                    print("Moving requests.log latency to directory...")
+                    if not execute_local_command(f'mv {request_log} {local_results_dir}/'):
+                        print(f"Failed to move requests.log to {local_results_dir}")
+                elif os.path.exists(request_log):
+                    os.remove(request_log)
             except Exception as e:
-                print(f"Error copying {remote_path}: {e}")
-        
-        # Close SFTP client
-        sftp.close()
-        
-        # Clean up remote temporary files
-        print("\nCleaning up remote temporary files...")
-        if test_type == 'dnsfw_xdp':
-            channel.send(f'rm -f {sar_output} \n')
+                print(f"Error moving requests.log: {e}")
+
+        time.sleep(1)          
+    
+        # Wait for the SAR stream to finish
+        print("\nWaiting for SAR output...")
+        if sar_collector.join(timeout=60):
+            print(f"SAR streaming completed. CSV output saved to {sar_collector.csv_file}")
         else:
-            channel.send(f'rm -f {sar_output} \n')
-        
-        # Execute SAR parser on the downloaded file
-        parse_sar_file(local_results_dir, f'sar_output_{test_type}.txt', test_type)
+            print("Failed to stream SAR output")
         
         print("\nAll commands executed successfully!")
         print(f"Results have been saved in the '{local_results_dir}' directory")
@@ -189,8 +194,14 @@ if __name__ == "__main__":
     args = parse_arguments()
     
     # Connection parameters
-    hostname = "192.168.0.72" ## DNS Server
+    hostname = args.server ## DNS Server
     username = "user" 
     password = "pass"  
     
-    execute_ssh_commands(hostname, username, password, args.test_type)
\ No newline at end of file
+    engine = 'dnspyre' if args.log_requests else args.engine
+    error = check_spec(args.workload, engine) if args.workload else None
+    if error:
+        print(f"Error: workload {args.workload}: {error}")
+        sys.exit(1)
+    execute_ssh_commands(hostname, username, password, args.test_type, engine, args.log_requests, args.open_loop,
+                         args.max_error_rate, args.workload)
\ No newline at end of file
@@ -1,16 +1,40 @@
 import paramiko
 import time
-import subprocess
 from datetime import datetime
 import os
 import sys
 import argparse
+import math
+
+from capacity_search import plan_seconds, search_domain_file, save_capacity
+from dnsfw_emulator import Blocklist
+from response_class import label_index_path
+from sar_stream import start_remote_sar
+from tool_output import ResperfParser, save_record, stream_command
+from workload import check_spec, prepare
+
+QUERY_FILE = 'query_file.txt'
+# Capacity search plan: start rate, upper bound, seconds per step, band tolerance, query timeout
+SEARCH = {'low': 5000, 'high': 400000, 'step_duration': 5, 'tolerance': 0.05, 'timeout': 1.0}
 
 def parse_arguments():
     parser = argparse.ArgumentParser(description='Execute DNS performance tests.')
     parser.add_argument('test_type', choices=['dnsfw_no', 'dnsfw_rpz', 'dnsfw_xdp'],
                        help='Type of test to be executed')
-    return parser.parse_args()
+    parser.add_argument('--engine', choices=['native', 'resperf'], default='native',
+                       help='Throughput test to use: native capacity search or resperf-report (default: native)')
+    parser.add_argument('--server', default='192.168.0.72',
+                       help='DNS server under test, also reached over SSH (default: 192.168.0.72)')
+    parser.add_argument('--workload', default=None,
+                       help='Workload spec (JSON, see workload.py) for the qtype, EDNS and repeated-name mix')
+    parser.add_argument('--blocklist', default=None,
+                       help='Blocked names (domain list or RPZ zone) so dnsfw_xdp drops are not counted as loss')
+    args = parser.parse_args()
+    # query_file.txt has no malicious share to discount: the native search needs source labels
+    if (args.test_type == 'dnsfw_xdp' and args.engine == 'native' and not args.blocklist
+            and not os.path.exists(label_index_path(QUERY_FILE))):
+        parser.error('dnsfw_xdp with the native engine needs --blocklist, or its intended drops count as loss')
+    return args
 
 def get_process_pid(ssh, process_name):
     """Get PID of a process using pgrep"""
@@ -18,40 +42,22 @@ def get_process_pid(ssh, process_name):
     pid = stdout.read().decode().strip()
     return pid if pid else None
 
-def execute_local_command(command):
+def execute_local_command(command, output_file=None, parser=None, monitor=None):
+    """Execute command on local machine, streaming its output to a file, a parser and an abort monitor"""
     try:
-        process = subprocess.Popen(
-            command,
-            shell=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            encoding='latin-1'
-        )
-        stdout, stderr = process.communicate()
-        if process.returncode != 0:
-            print(f"Error executing local command: {stderr}")
+        result = stream_command(command, output_file, parser, monitor)
+        if result.aborted:
+            print(f"Aborted local command: {result.aborted}")
+            return False
+        if result.status != 0:
+            print("Error executing local command: " + "\n".join(result.tail[-5:]))
             return False
         return True
     except Exception as e:
         print(f"Error executing local command: {e}")
         return False
 
-def parse_sar_file(results_dir, sar_filename, output_suffix):
-    """Execute SAR parser script on the downloaded file"""
-    try:
-        sar_input = os.path.join(results_dir, sar_filename)
-        sar_output = os.path.join(results_dir, f'sar_output_{output_suffix}.csv')
-        parser_cmd = f'python3 sar_parse.py {sar_input} -o {sar_output}'
-        
-        print("\nExecuting SAR parser...")
-        if execute_local_command(parser_cmd):
-            print(f"SAR parsing completed successfully. CSV output saved to {sar_output}")
-        else:
-            print("Failed to parse SAR output")
-    except Exception as e:
-        print(f"Error during SAR parsing: {e}")
-
-def execute_ssh_commands(hostname, username, password, test_type):
+def execute_ssh_commands(hostname, username, password, test_type, engine='native', workload=None, blocklist=None):
     try:
         # Initialize SSH client
         ssh = paramiko.SSHClient()
@@ -88,62 +94,65 @@ def execute_ssh_commands(hostname, username, password, test_type):
         channel.send(password + '\n')
         time.sleep(2)
 
-        #Execute SAR command in background - with unique filename
-        sar_output = f'/tmp/sar_output_{test_type}.txt'
+        # Stream SAR output over an exec channel straight into the results directory,
+        # long enough to cover the whole capacity search
         print("Executing SAR command...")
-        channel.send(f'sar -u ALL -P ALL 1 -t 60 > {sar_output} &\n')
+        sar_count = math.ceil(plan_seconds(**SEARCH)) + 10 if engine == 'native' else 60
+        sar_collector = start_remote_sar(ssh, local_results_dir, test_type, count=sar_count)
         time.sleep(3)
 
-        #Start local resperf command
-        print("Starting local resperf command...throughput")
-        try:
-            resperf_cmd = f'resperf-report -R -s 192.168.0.72 -d query_file.txt -vv'
-            if not execute_local_command(resperf_cmd):
-                print("Failed to execute resperf command")
-        except Exception as e:
-            print(f"Error during resperf execution: {e}")
+        # Queries of the run: query_file.txt as is, or the workload mix built from it
+        query_file = QUERY_FILE
+        tool_options = ''
+        if workload:
+            query_file, tool_options = prepare(workload, query_file, local_results_dir, test_type, engine)
 
-        time.sleep(5)
-   
-        # Change permissions of output files to allow copying
-        if test_type == 'dnsfw_xdp':
-            channel.send(f'chmod 644 {sar_output}\n')
+        if engine == 'native':
+            # Search the highest QPS that keeps loss and p99 under the thresholds
+            print("Starting native capacity search...throughput")
+            try:
+                start = time.time()
+                result = search_domain_file(hostname, query_file, SEARCH['low'], SEARCH['high'],
+                                            SEARCH['step_duration'], max_loss=0.01, max_p99=0.1,
+                                            tolerance=SEARCH['tolerance'], timeout=SEARCH['timeout'],
+                                            drops_blocked=test_type == 'dnsfw_xdp', blocklist=blocklist)
+                print(f"Capacity: {result['capacity']} QPS  band [{result['band_low']}, {result['band_high']}]")
+                if result['client_bound']:
+                    print("Client-bound: the load generator could not keep up, so this is its limit, not the server's")
+                save_capacity([{'test_type': test_type, 'percent': 'query_file',
+                                'capacity_qps': result['capacity'], 'band_low': result['band_low'],
+                                'band_high': result['band_high'], 'steps': len(result['steps']),
+                                'client_bound': result['client_bound'],
+                                'elapsed': round(time.time() - start, 1)}],
+                              f'{local_results_dir}/capacity_{test_type}.csv')
+            except Exception as e:
+                print(f"Error during capacity search: {e}")
         else:
-            channel.send(f'chmod 644 {sar_output} \n')
-        time.sleep(1)
-        
-        # Use SCP to copy files from remote to local
-        print("\nCopying result files from remote host...")
-        
-        # Create SFTP client
-        sftp = ssh.open_sftp()
-        
-        # List of files to copy with new names including test type
-        remote_files = [
-            (sar_output, f'{local_results_dir}/sar_output_{test_type}.txt')
-        ]
-          
-        # Copy each file
-        for remote_path, local_path in remote_files:
+            #Start local resperf command
+            print("Starting local resperf command...throughput")
             try:
-                sftp.get(remote_path, local_path)
-                print(f"Successfully copied {remote_path} to {local_path}")
+                resperf_cmd = f'resperf-report -R -s {hostname} -d {query_file}{tool_options} -vv'
+                # Keep the console output and its statistics next to the sar CSV
+                resperf_parser = ResperfParser()
+                resperf_ok = execute_local_command(resperf_cmd, f'{local_results_dir}/resperf_{test_type}.txt',
+                                                   resperf_parser)
+                summary = save_record(f'{local_results_dir}/resperf_{test_type}.json', resperf_cmd,
+                                      resperf_ok, resperf_parser)['summary']
+                print(f"resperf: maximum throughput {summary.get('qps')} QPS  "
+                      f"lost {summary.get('queries_lost')}/{summary.get('queries_sent')}")
+                if not resperf_ok:
+                    print("Failed to execute resperf command")
             except Exception as e:
-                print(f"Error copying {remote_path}: {e}")
-        
-        # Close SFTP client
-        sftp.close()
-        
-        # Clean up remote temporary files
-        print("\nCleaning up remote temporary files...")
-        if test_type == 'dnsfw_xdp':
-            channel.send(f'rm -f {sar_output} \n')
+                print(f"Error during resperf execution: {e}")
+
+        time.sleep(5)
+   
+        # Wait for the SAR stream to finish
+        print("\nWaiting for SAR output...")
+        if sar_collector.join(timeout=sar_count + 30):
+            print(f"SAR streaming completed. CSV output saved to {sar_collector.csv_file}")
         else:
-            #channel.send(f'rm -f {sar_output} {pidstat_named_output}\n')
-            channel.send(f'rm -f {sar_output} \n')
-        
-        # Execute SAR parser on the downloaded file
-        parse_sar_file(local_results_dir, f'sar_output_{test_type}.txt', test_type)
+            print("Failed to stream SAR output")
         
         print("\nAll commands executed successfully!")
         print(f"Results have been saved in the '{local_results_dir}' directory")
@@ -165,8 +174,13 @@ if __name__ == "__main__":
     args = parse_arguments()
     
     # Connection parameters
-    hostname = "192.168.0.72" # DNS Server
+    hostname = args.server # DNS Server
     username = "user"
     password = "pass"  
     
-    execute_ssh_commands(hostname, username, password, args.test_type)
\ No newline at end of file
+    error = check_spec(args.workload, args.engine) if args.workload else None
+    if error:
+        print(f"Error: workload {args.workload}: {error}")
+        sys.exit(1)
+    blocklist = Blocklist.from_file(args.blocklist) if args.blocklist else None
+    execute_ssh_commands(hostname, username, password, args.test_type, args.engine, args.workload, blocklist)
\ No newline at end of file
@@ -0,0 +1,334 @@
+import os
+import re
+import sys
+import json
+import time
+import signal
+import argparse
+import threading
+import subprocess
+from collections import deque, namedtuple
+
+# Go durations as printed by dnspyre: 850µs, 1.2ms, 60.01s, 1m0.5s
+GO_DURATION = re.compile(r'([0-9]*\.?[0-9]+)(ns|us|µs|ms|s|m|h)')
+GO_UNITS = {'ns': 1e-9, 'us': 1e-6, 'µs': 1e-6, 'ms': 1e-3, 's': 1.0, 'm': 60.0, 'h': 3600.0}
+SUMMARY_LINE = re.compile(r'^\s*([A-Za-z[][A-Za-z0-9/+\-\[\]() ]*?):\s*(.*?)\s*$')
+NUMBER = re.compile(r'^[-+]?[0-9]*\.?[0-9]+')
+# dnspyre --log-requests line fields
+REQUEST_RCODE = re.compile(r'(?:respcode|rcode):\[?\s*([A-Z]*)')
+REQUEST_ERROR = re.compile(r'err(?:or)?:\[([^\]]*)\]')
+NO_ERROR = ('', '<nil>', 'nil')
+OK_RCODES = ('NOERROR', 'NXDOMAIN')
+
+
+class CommandOutput(namedtuple('CommandOutput', ['status', 'aborted', 'lines', 'tail'])):
+    """Outcome of stream_command: exit status, abort reason (or None), line count and last lines"""
+
+    @property
+    def ok(self):
+        return self.status == 0 and not self.aborted
+
+
+def _key(label):
+    return re.sub(r'[^a-z0-9]+', '_', label.lower()).strip('_')
+
+
+def _number(text):
+    match = NUMBER.match(text)
+    if not match:
+        return None
+    value = float(match.group(0))
+    return int(value) if value.is_integer() and '.' not in match.group(0) else value
+
+
+def parse_duration(text):
+    """Seconds of a Go duration string (e.g. '1m0.5s', '850µs'), or None"""
+    parts = GO_DURATION.findall(text.strip())
+    if not parts or GO_DURATION.sub('', text.strip()):
+        return None
+    return sum(float(value) * GO_UNITS[unit] for value, unit in parts)
+
+
+class DnspyreParser:
+    """
+    Structured record of a dnspyre run from its console summary
+
+    Summary counters keep dnspyre's labels as snake_case keys (total_requests,
+    dns_success_responses, questions_per_second, ...); 'timings' holds the
+    latency percentiles in seconds and 'response_codes' / 'question_types'
+    the per-code counts. Lines may be fed one at a time while the run streams.
+    """
+
+    tool = 'dnspyre'
+
+    def __init__(self):
+        self.record = {'response_codes': {}, 'question_types': {}, 'timings': {}}
+        self.section = None
+
+    def feed(self, line):
+        line = line.rstrip('\r\n')
+        stripped = line.strip()
+        if not stripped:
+            return
+        lowered = stripped.lower()
+        if lowered.startswith('dns timings'):
+            self.section = 'timings'
+            self.record['timing_datapoints'] = _number(stripped.split(',')[-1].strip())
+            return
+        if lowered.startswith('dns distribution'):
+            self.section = 'distribution'
+            return
+        if lowered.startswith('dns response codes'):
+            self.section = 'response_codes'
+            return
+        if lowered.startswith('dns question types'):
+            self.section = 'question_types'
+            return
+        match = SUMMARY_LINE.match(line)
+        if self.section in ('response_codes', 'question_types', 'timings') and match and line[:1].isspace():
+            label, value = match.groups()
+            if self.section == 'timings':
+                seconds = parse_duration(value)
+                if seconds is not None:
+                    self.record['timings'][_key(label) or 'sd'] = seconds
+            elif _number(value) is not None:
+                self.record[self.section][label.strip()] = _number(value)
+            return
+        if self.section == 'distribution' and line[:1].isspace():
+            return
+        self.section = None
+        if match:
+            label, value = match.groups()
+            seconds = parse_duration(value)
+            if seconds is not None and not NUMBER.fullmatch(value):
+                self.record[_key(label)] = seconds
+            elif _number(value) is not None:
+                self.record[_key(label)] = _number(value)
+
+    def summary(self):
+        """The record plus derived qps and error_rate (failed / total requests)"""
+        record = dict(self.record)
+        total = record.get('total_requests')
+        answered = sum(value for code, value in record['response_codes'].items() if code in OK_RCODES)
+        if 'questions_per_second' in record:
+            record['qps'] = record['questions_per_second']
+        if total:
+            record['error_rate'] = round(1.0 - answered / total, 6)
+        return record
+
+
+class ResperfParser:
+    """
+    Structured record of a resperf or resperf-report run from its statistics block
+
+    Keys are resperf's labels in snake_case (queries_sent, queries_completed,
+    queries_lost, maximum_throughput, lost_at_that_point, run_time_s, ...);
+    'response_codes' holds the per-code counts and 'timeouts' the
+    '[Timeout]' lines printed in verbose mode.
+    """
+
+    tool = 'resperf'
+
+    def __init__(self):
+        self.record = {'response_codes': {}, 'timeouts': 0}
+
+    def feed(self, line):
+        stripped = line.strip()
+        if stripped.startswith('[Timeout]'):
+            self.record['timeouts'] += 1
+            return
+        if stripped.startswith('['):
+            return
+        match = SUMMARY_LINE.match(stripped)
+        if not match:
+            return
+        label, value = match.groups()
+        if _key(label) == 'response_codes':
+            for code, count in re.findall(r'([A-Z]+)\s+(\d+)', value):
+                self.record['response_codes'][code] = int(count)
+        elif _number(value) is not None:
+            self.record[_key(label)] = _number(value)
+
+    def summary(self):
+        """The record plus derived qps (maximum throughput) and loss_rate (lost / sent)"""
+        record = dict(self.record)
+        if 'maximum_throughput' in record:
+            record['qps'] = record['maximum_throughput']
+        if record.get('queries_sent'):
+            record['loss_rate'] = round(record.get('queries_lost', 0) / record['queries_sent'], 6)
+        return record
+
+
+PARSERS = {'dnspyre': DnspyreParser, 'resperf': ResperfParser}
+
+
+class RequestLogMonitor:
+    """
+    Early-abort check on a dnspyre --log-requests file tailed while it is written
+
+    Each check() reads the lines appended since the previous one and counts
+    failed requests (an error such as an i/o timeout, or an rcode other than
+    NOERROR/NXDOMAIN). Once `grace` seconds have passed, an interval with at
+    least `min_requests` requests whose failure rate exceeds the threshold
+    aborts the run. `expected` is the share of queries meant to go unanswered
+    (dnsfw_xdp drops blocked names): the threshold applies to the remainder.
+
+    Args:
+    path (str): Request log being written by dnspyre
+    max_error_rate (float): Maximum failure rate (0.2 = 20%)
+    min_requests (int): Minimum requests in an interval to judge it
+    grace (float): Seconds ignored at the start (socket setup, cold cache)
+    expected (float): Expected unanswered share, 0-1
+    """
+
+    def __init__(self, path, max_error_rate, min_requests=500, grace=5.0, expected=0.0):
+        self.path = path
+        self.threshold = expected + (1.0 - expected) * max_error_rate
+        self.min_requests = min_requests
+        self.grace = grace
+        self.started = time.monotonic()
+        self.file = None
+        self.partial = ''
+        self.totals = {'requests': 0, 'errors': 0, 'timeouts': 0}
+        self.reason = None
+
+    def _read(self):
+        if self.file is None:
+            if not os.path.exists(self.path):
+                return []
+            self.file = open(self.path, 'r', encoding='utf-8', errors='replace')
+        data = self.partial + self.file.read()
+        lines = data.split('\n')
+        self.partial = lines.pop()
+        return lines
+
+    def count(self):
+        """Tally the lines appended since the last call; returns (requests, errors) among them"""
+        requests = errors = 0
+        for line in self._read():
+            if not line.strip():
+                continue
+            requests += 1
+            error = REQUEST_ERROR.search(line)
+            rcode = REQUEST_RCODE.search(line)
+            if error and error.group(1).strip() not in NO_ERROR:
+                errors += 1
+                if 'timeout' in error.group(1).lower():
+                    self.totals['timeouts'] += 1
+            elif rcode and rcode.group(1) and rcode.group(1) not in OK_RCODES:
+                errors += 1
+        self.totals['requests'] += requests
+        self.totals['errors'] += errors
+        return requests, errors
+
+    def check(self):
+        """Count the new lines; returns the abort reason or None"""
+        requests, errors = self.count()
+        if time.monotonic() - self.started < self.grace or requests < self.min_requests:
+            return None
+        if errors / requests > self.threshold:
+            self.reason = (f"error rate {errors / requests:.1%} over the last {requests} requests "
+                           f"exceeds {self.threshold:.1%}")
+        return self.reason
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def _stop(process):
+    """Terminate the command's whole process group (shell=True runs it under sh)"""
+    for sig, wait in ((signal.SIGTERM, 5), (signal.SIGKILL, None)):
+        try:
+            os.killpg(process.pid, sig)
+        except ProcessLookupError:
+            return
+        try:
+            process.wait(timeout=wait)
+            return
+        except subprocess.TimeoutExpired:
+            continue
+
+
+def stream_command(command, output_file=None, parser=None, monitor=None, interval=1.0, echo=False):
+    """
+    Run a local shell command, streaming its output line by line
+
+    stdout and stderr are merged and read as they are written: every line is
+    appended to output_file, fed to the parser and optionally echoed. Every
+    `interval` seconds monitor.check() is called; when it returns a reason
+    the command is stopped.
+    Returns a CommandOutput.
+    """
+    process = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                               encoding='utf-8', errors='replace', start_new_session=True)
+    tail = deque(maxlen=20)
+    count = [0]
+
+    def read():
+        output = open(output_file, 'w', encoding='utf-8') if output_file else None
+        try:
+            # Text mode splits on '\r' too, so progress bars arrive as separate lines
+            for line in process.stdout:
+                count[0] += 1
+                tail.append(line.rstrip('\n'))
+                if output:
+                    output.write(line)
+                if parser:
+                    parser.feed(line)
+                if echo:
+                    sys.stdout.write(line)
+        finally:
+            if output:
+                output.close()
+
+    reader = threading.Thread(target=read, daemon=True)
+    reader.start()
+    aborted = None
+    while True:
+        try:
+            process.wait(timeout=interval)
+            break
+        except subprocess.TimeoutExpired:
+            pass
+        if monitor is not None:
+            aborted = monitor.check()
+            if aborted:
+                _stop(process)
+                break
+    reader.join()
+    if monitor is not None:
+        if not aborted:
+            monitor.count()
+        monitor.close()
+    return CommandOutput(process.returncode, aborted, count[0], list(tail))
+
+
+def save_record(path, command, completed, parser, monitor=None):
+    """Write the parsed summary of a run, whether it completed and why it was aborted, as JSON"""
+    record = {'tool': parser.tool, 'command': command, 'completed': bool(completed),
+              'aborted': monitor.reason if monitor is not None else None, 'summary': parser.summary()}
+    if monitor is not None:
+        record['request_log'] = dict(monitor.totals)
+    with open(path, 'w') as f:
+        json.dump(record, f, indent=2)
+    return record
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parse saved dnspyre or resperf console output into JSON')
+    parser.add_argument('inputs', nargs='+', help='Captured output files (e.g. dnspyre_dnsfw_rpz_30.txt)')
+    parser.add_argument('--tool', choices=sorted(PARSERS), default='dnspyre', help='Tool that wrote the output')
+    args = parser.parse_args()
+
+    for input_file in args.inputs:
+        tool_parser = PARSERS[args.tool]()
+        with open(input_file, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                tool_parser.feed(line)
+        print(json.dumps({'file': input_file, 'summary': tool_parser.summary()}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
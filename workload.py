@@ -0,0 +1,234 @@
+import os
+import json
+import argparse
+
+import numpy as np
+
+from dns_wire import parse_qtype, qtype_name
+from query_cache import read_query_file
+from response_class import label_index_path, read_label_index
+
+TOOLS = ['native', 'resperf', 'dnspyre']
+
+
+class Workload:
+    """
+    Declarative query mix shared by the throughput, CPU and latency tests
+
+    A spec is a JSON object; every key is optional:
+
+        {"queries": 100000,
+         "unique": 0.3,
+         "qtypes": {"A": 60, "AAAA": 25, "HTTPS": 10, "MX": 3, "TXT": 2},
+         "edns": {"share": 0.9, "dnssec": 0.3, "bufsize": {"1232": 80, "4096": 20}},
+         "seed": 0}
+
+    queries is the length of the generated query file (default: one per source
+    name); unique the share of queries asking a name for the first time, the
+    rest repeating a name already asked (1.0, the default, never repeats while
+    the source lasts); qtypes the weights of the query types (default: the
+    type of each source line); edns the share of queries with an OPT record,
+    the share of those with the DO bit and the weights of the advertised UDP
+    payload sizes (default: no EDNS).
+    """
+
+    def __init__(self, queries=None, unique=1.0, qtypes=None, edns=None, seed=0):
+        if not 0 < unique <= 1:
+            raise ValueError("unique must be in (0, 1]")
+        self.queries = queries
+        self.unique = unique
+        self.qtypes = {name.upper(): float(weight) for name, weight in (qtypes or {}).items()}
+        for name in self.qtypes:
+            parse_qtype(name)
+        edns = edns or {}
+        self.edns_share = float(edns.get('share', 1.0 if edns else 0.0))
+        self.dnssec = float(edns.get('dnssec', 0.0))
+        self.bufsizes = {int(size): float(weight) for size, weight in edns.get('bufsize', {'1232': 1}).items()}
+        self.seed = seed
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path) as f:
+            spec = json.load(f)
+        return cls(spec.get('queries'), spec.get('unique', 1.0), spec.get('qtypes'), spec.get('edns'),
+                   spec.get('seed', 0))
+
+    def as_dict(self):
+        return {'queries': self.queries, 'unique': self.unique, 'qtypes': self.qtypes,
+                'edns': {'share': self.edns_share, 'dnssec': self.dnssec,
+                         'bufsize': {str(size): weight for size, weight in self.bufsizes.items()}},
+                'seed': self.seed}
+
+    def check(self, tool):
+        """
+        Raise ValueError when the tool cannot send this mix
+
+        resperf and dnspyre only switch EDNS and the DO bit for a whole run,
+        and dnspyre sends every name once per -t type with one payload size,
+        so partial shares and uneven type weights are rejected rather than
+        approximated.
+        """
+        if tool not in TOOLS:
+            raise ValueError(f"Unknown tool: {tool}")
+        if tool == 'native':
+            return
+        if self.edns_share not in (0.0, 1.0) or (self.edns_share and self.dnssec not in (0.0, 1.0)):
+            raise ValueError(f"{tool} applies EDNS and DNSSEC OK to every query or none: "
+                             f"use an edns share and dnssec of 0 or 1")
+        if tool == 'dnspyre':
+            weights = {weight for weight in self.qtypes.values() if weight > 0}
+            if len(weights) > 1:
+                raise ValueError("dnspyre sends every name once per type: give the qtypes equal weights")
+            if self.edns_share and len([weight for weight in self.bufsizes.values() if weight > 0]) > 1:
+                raise ValueError("dnspyre advertises a single EDNS payload size: give one bufsize")
+
+    def _weighted(self, rng, choices, count):
+        values = list(choices)
+        weights = np.array([choices[value] for value in values], dtype=np.float64)
+        return np.array(values)[rng.choice(len(values), count, p=weights / weights.sum())]
+
+    def build(self, names_file, output_file, tool='native'):
+        """
+        Write the query file of this workload from the names of a domain or query file
+
+        The native engine reads every option of the mix; resperf takes the
+        'name TYPE' lines but EDNS only for the whole run (resperf_options),
+        and dnspyre reads bare names, types and EDNS coming from its flags
+        (dnspyre_options). When the source has a make_domainfile label index,
+        a matching one is written for the output. Returns the mix the tool
+        will send; mixes it cannot send raise ValueError (check).
+        """
+        self.check(tool)
+        source = list(read_query_file(names_file))
+        if not source:
+            raise ValueError(f"No names in {names_file}")
+        count = self.queries or len(source)
+        rng = np.random.default_rng(self.seed)
+
+        # First-time names are taken from the source in a seeded random order;
+        # repeats pick uniformly among the names asked so far
+        first = rng.random(count) < self.unique
+        first[0] = True
+        asked = np.cumsum(first)
+        repeat = (rng.random(count) * asked).astype(np.int64)
+        ordinal = np.where(first, asked - 1, repeat)
+        index = rng.permutation(len(source))[ordinal % len(source)]
+
+        if tool == 'dnspyre':
+            # Bare names: the types come from -t, each name sent once per type (A by default)
+            qtypes = np.repeat([parse_qtype(name) for name, weight in self.qtypes.items() if weight > 0] or
+                               [parse_qtype('A')], count)
+        elif self.qtypes:
+            qtypes = self._weighted(rng, {parse_qtype(name): weight for name, weight in self.qtypes.items()}, count)
+        else:
+            qtypes = np.array([query[1] for query in source])[index]
+        if tool == 'native':
+            edns = rng.random(count) < self.edns_share
+            bufsizes = np.where(edns, self._weighted(rng, self.bufsizes, count), 0)
+            dnssec = edns & (rng.random(count) < self.dnssec)
+        else:
+            # The tool flags switch EDNS and DO for the whole run
+            edns = np.full(len(qtypes), self.edns_share == 1.0)
+            bufsizes = np.zeros(count, dtype=np.int64)
+            dnssec = edns & (self.dnssec == 1.0)
+
+        with open(output_file, 'w', encoding='utf-8') as f:
+            lines = []
+            for position, query in enumerate(index.tolist()):
+                line = source[query][0]
+                if tool != 'dnspyre':
+                    line += ' ' + qtype_name(int(qtypes[position]))
+                if tool == 'native' and bufsizes[position]:
+                    line += f" +bufsize={bufsizes[position]}" + (' +dnssec' if dnssec[position] else '')
+                lines.append(line)
+                if len(lines) == 65536:
+                    f.write('\n'.join(lines) + '\n')
+                    lines = []
+            if lines:
+                f.write('\n'.join(lines) + '\n')
+
+        labels = read_label_index(names_file, len(source))
+        if labels is not None:
+            np.frombuffer(labels, dtype=np.uint8)[index].tofile(label_index_path(output_file))
+        codes, counts = np.unique(qtypes, return_counts=True)
+        return {'queries': len(qtypes), 'unique_names': int(len(np.unique(index))),
+                'repeated': round(1.0 - float(first.mean()), 6),
+                'qtypes': {qtype_name(int(code)): int(total) for code, total in zip(codes, counts)},
+                'edns': int(edns.sum()), 'dnssec': int(dnssec.sum())}
+
+    def resperf_options(self):
+        """resperf flags for the EDNS part of the mix, which resperf applies to every query or none"""
+        if not self.edns_share:
+            return ''
+        return ' -e -D' if self.dnssec else ' -e'
+
+    def dnspyre_options(self):
+        """
+        dnspyre flags for the mix
+
+        dnspyre repeats every name once per -t type and applies EDNS to every
+        query or none, which check() makes sure the mix asks for.
+        """
+        options = ''.join(f' -t {name}' for name, weight in self.qtypes.items() if weight > 0)
+        if self.edns_share:
+            options += f' --edns0={max(self.bufsizes, key=self.bufsizes.get)}'
+            if self.dnssec:
+                options += ' --dnssec'
+        return options
+
+
+def check_spec(spec_file, tool):
+    """
+    Validate a workload spec for a tool before a run starts
+
+    Returns the error message, or None when the tool can send the mix.
+    """
+    try:
+        Workload.from_file(spec_file).check(tool)
+    except (OSError, ValueError) as e:
+        return str(e)
+    return None
+
+
+def prepare(spec_file, names_file, results_dir, suffix, tool='native'):
+    """
+    Build a test's query file from a workload spec inside its results directory
+
+    Returns (query file, extra tool flags); the spec and the achieved mix are
+    saved next to it as workload_{suffix}.json.
+    """
+    workload = Workload.from_file(spec_file)
+    output_file = os.path.join(results_dir, f'workload_{suffix}.txt')
+    achieved = workload.build(names_file, output_file, tool)
+    with open(os.path.join(results_dir, f'workload_{suffix}.json'), 'w') as f:
+        json.dump({'spec': workload.as_dict(), 'source': names_file, 'tool': tool, 'achieved': achieved}, f, indent=2)
+    print(f"Workload {spec_file}: {achieved['queries']} queries, {achieved['unique_names']} names "
+          f"({achieved['repeated']:.0%} repeated), {achieved['edns']} with EDNS")
+    options = {'native': '', 'resperf': workload.resperf_options(), 'dnspyre': workload.dnspyre_options()}
+    return output_file, options[tool]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a query file from a declarative workload spec')
+    parser.add_argument('spec', help='Workload spec (JSON)')
+    parser.add_argument('names_file', help='Source names (output/domain_*.txt, query_file.txt, domains.txt)')
+    parser.add_argument('-o', '--output', default='workload.txt', help='Query file to write (default: workload.txt)')
+    parser.add_argument('--tool', choices=TOOLS, default='native',
+                        help='Client that will read the file (default: native)')
+    args = parser.parse_args()
+
+    workload = Workload.from_file(args.spec)
+    try:
+        workload.check(args.tool)
+    except ValueError as e:
+        parser.error(str(e))
+    print(json.dumps(workload.build(args.names_file, args.output, args.tool), indent=2))
+    if args.tool == 'resperf':
+        print(f"resperf flags:{workload.resperf_options() or ' (none)'}")
+    elif args.tool == 'dnspyre':
+        print(f"dnspyre flags:{workload.dnspyre_options() or ' (none)'}")
+    print(f"Query file saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()